@@ -1,8 +1,9 @@
-from typing import TypedDict, Annotated, Sequence, List, Dict
+from typing import TypedDict, Annotated, Sequence, List, Dict, Tuple
 from langchain_core.tools import tool 
 from langgraph.graph.message import add_messages
-from get_sub import list_available_languages, fetch_youtube_srt
+from get_sub import list_available_languages, fetch_youtube_srt, _extract_video_id
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
 from dotenv import load_dotenv
 import logging
 
@@ -13,32 +14,96 @@ logging.basicConfig(level=logging.INFO,
 logger = logging.getLogger(__name__)
 from langchain_core.messages import BaseMessage, AIMessage, ToolMessage, HumanMessage, SystemMessage
 from langgraph.prebuilt import ToolNode
-from langchain_openai import ChatOpenAI
 import os
 import re 
+import queue
+import asyncio
+import contextlib
+import operator
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from prompts import (
     SUBTITLE_EXTRACTION_SYSTEM_PROMPT,
     TRANSLATION_CONTEXT_SYSTEM_PROMPT,
     TRANSLATION_CONTEXT_HUMAN_PROMPT,
+    TRANSLATION_CONTEXT_SECTION_SYSTEM_PROMPT,
+    TRANSLATION_CONTEXT_SECTION_HUMAN_PROMPT,
+    TRANSLATION_CONTEXT_MERGE_SYSTEM_PROMPT,
+    TRANSLATION_CONTEXT_MERGE_HUMAN_PROMPT,
     CHUNK_TRANSLATION_SYSTEM_PROMPT,
-    CHUNK_TRANSLATION_HUMAN_PROMPT
+    CHUNK_TRANSLATION_HUMAN_PROMPT,
+    LINE_REPAIR_SYSTEM_PROMPT,
+    LINE_REPAIR_HUMAN_PROMPT,
+    TRANSLATION_MEMORY_SECTION,
+    CHUNK_GLOSSARY_SECTION,
+    CHUNK_TRANSLATION_TAIL_HUMAN_PROMPT,
+    LINE_REPAIR_TAIL_HUMAN_PROMPT,
+    SOURCE_ANALYSIS_SYSTEM_PROMPT,
+    SOURCE_ANALYSIS_HUMAN_PROMPT,
+    SOURCE_ANALYSIS_MERGE_SYSTEM_PROMPT,
+    SOURCE_ANALYSIS_MERGE_HUMAN_PROMPT,
+    TRANSLATION_CONTEXT_LOCALIZE_SYSTEM_PROMPT,
+    TRANSLATION_CONTEXT_LOCALIZE_HUMAN_PROMPT,
+    PROMPT_VERSION
 )
+from chunk_planner import CHUNK_TOKEN_BUDGET, plan_chunks, summarize_chunk_sizes, count_tokens
+from translation_cache import get_translation_cache, hash_sub_list, invalidate_translation_memory
+from checkpoints import get_checkpoint_store
+from translation_memory import MEMORY_INJECTION, memory_for_chunk
+from subtitles import SubtitleTrack, SubtitleChunks, format_srt_block
+from subtitle_io import read_track, write_srt
+from usage_tracker import UsageTracker, append_run_log
+from tracing import start_trace, span, traced, set_span_attributes, submit_in_context, export_trace
+from llm_clients import LLMClients, get_chat_model
+from rate_limiter import (invoke_with_rate_limit, ainvoke_with_rate_limit, stream_with_rate_limit, astream_with_rate_limit,
+                          get_rate_limit_utilisation, _model_name)
 
 load_dotenv()
 
 # Constants
-# Load CHUNK_SIZE from environment variable, default to 50
+# Load CHUNK_SIZE from environment variable, default to 50 (upper bound on entries per chunk when AGENT_CHUNK_TOKEN_BUDGET is set)
 CHUNK_SIZE = int(os.environ.get("AGENT_CHUNK_SIZE", "50"))
 # Load MAX_TRANSLATION_RETRIES from environment variable, default to 2
 MAX_TRANSLATION_RETRIES = int(os.environ.get("AGENT_MAX_TRANSLATION_RETRIES", "2"))
+# Load MAX_REPAIR_ATTEMPTS from environment variable, default to 2 (follow-up calls for missing or malformed lines per chunk)
+MAX_REPAIR_ATTEMPTS = int(os.environ.get("AGENT_MAX_REPAIR_ATTEMPTS", "2"))
+# Number of neighbouring lines sent as context with each line to repair
+REPAIR_CONTEXT_LINES = 2
+# Load MAX_CONCURRENT_CHUNKS from environment variable, default to 4 (1 translates chunks one after another)
+MAX_CONCURRENT_CHUNKS = int(os.environ.get("AGENT_MAX_CONCURRENT_CHUNKS", "4"))
+# Whether identical subtitle lines are translated once and reused for every occurrence, default to true
+DEDUPLICATE_LINES = os.environ.get("AGENT_DEDUPLICATE_LINES", "true").strip().lower() in ("1", "true", "yes")
+# Whether chunk translations are streamed and parsed line by line as tokens arrive, default to false
+STREAM_TRANSLATION = os.environ.get("AGENT_STREAM_TRANSLATION", "false").strip().lower() in ("1", "true", "yes")
+# Chunk request layout: "prefix_cache" keeps instructions + translation memory as a byte-stable system message shared by
+# every chunk and puts the chunk and retry notes last, so provider-side prompt caching applies; "classic" is the original layout
+PROMPT_LAYOUT = os.environ.get("AGENT_PROMPT_LAYOUT", "prefix_cache").strip().lower()
+# Load CONTEXT_SECTION_CHARS from environment variable, default to 60000.
+# Transcripts longer than this build the translation memory section by section (map-reduce); 0 always uses a single call.
+CONTEXT_SECTION_CHARS = int(os.environ.get("AGENT_CONTEXT_SECTION_CHARS", "60000"))
 
 DEFAULT_EXTRACTION_MODEL = "o3-mini"
 DEFAULT_TRANSLATION_MODEL = "o3-mini"
 EXTRACTION_MODEL_NAME = os.environ.get("EXTRACTION_MODEL", DEFAULT_EXTRACTION_MODEL)
 TRANSLATION_MODEL_NAME = os.environ.get("TRANSLATION_MODEL", DEFAULT_TRANSLATION_MODEL)
+# Cheap model that translates every chunk first; chunks it fails on are escalated to TRANSLATION_MODEL (empty disables the cascade)
+CASCADE_MODEL_NAME = os.environ.get("CASCADE_MODEL", "").strip()
 # Default transcript output directory, can be overridden by environment variable
 DEFAULT_TRANSCRIPT_OUTPUT_DIR = "transcripts"
+# How the original subtitles are fetched: "direct" calls fetch_youtube_srt deterministically,
+# "llm" lets the extraction model decide on the tool call (the original behaviour)
+EXTRACTION_MODE = os.environ.get("AGENT_EXTRACTION_MODE", "direct").strip().lower()
+# State kept when a job is persisted (checkpoints, batch jobs) so another process can continue it
+PERSISTED_STATE_KEYS = (
+    "video_link", "chosen_language_code", "original_language", "target_language", "original_srt_path",
+    "sub_list", "sub_chunks_list", "chunk_stats", "duplicate_index_map", "dedup_stats", "translation_memory"
+)
+# A "N. text" line of a translated chunk
+NUMBERED_LINE_PATTERN = re.compile(r"(\d+)\.\s*(.*)")
+# Target language under which the language-independent source analysis is stored in the translation memory table
+SOURCE_ANALYSIS_LANGUAGE_KEY = ""
 
 class AgentState(TypedDict):
     video_link: str # URL of the YouTube video to be translated.
@@ -47,62 +112,45 @@ class AgentState(TypedDict):
     
     available_languages: List[Dict[str, any]] | None # Stores list of {'name': str, 'code': str, 'is_generated': bool}
     chosen_language_code: str | None # The language code selected by the user from available_languages
+    extraction_mode: str | None # "direct" or "llm" subtitle extraction for this job (AGENT_EXTRACTION_MODE if not set).
     original_srt_path: str | None # File path to the downloaded original SRT subtitles.
     
-    sub_list: List[Dict[str, str]] | None # List of dictionaries representing original subtitle entries. 
-    sub_chunks_list: List[str] | None # Original subtitles divided into processable text chunks. 
+    sub_list: SubtitleTrack | None # Columnar store of the original subtitle cues, shared by chunking and finalizing.
+    sub_chunks_list: Sequence[str] | None # Original subtitles divided into processable text chunks (rendered from sub_list on access).
+    chunk_stats: Dict[str, float] | None # Token and entry size distribution of the planned chunks.
+    duplicate_index_map: Dict[str, str] | None # Maps the index of a repeated subtitle line to the index of its first occurrence.
+    dedup_stats: Dict[str, int] | None # Number of entries and tokens saved by translating repeated lines only once.
     current_chunk_index: int # Index of the current subtitle chunk being processed. 
     translation_memory: str | None # Contextual information or glossary for consistent translation.
+    refresh_translation_memory: bool # Regenerate the translation memory even if a stored one matches the transcript.
+    source_analysis: str | None # Target-language independent analysis of the transcript, shared by multi-language jobs.
     translated_chunks_list: List[str] | None # List of translated subtitle text chunks. 
-    translated_sub_list: List[Dict[str, str]] | None # List of dictionaries representing translated subtitle entries. 
+    completed_chunks: Dict[int, str] | None # Aggregated texts of chunks finished by an earlier run, merged instead of translated.
+    precomputed_translations: Dict[int, str] | None # Responses that replace the first LLM call of a chunk (e.g. from a batch job).
+    chunk_results: Annotated[List[Dict[str, object]], operator.add] # Index, aggregated text, parsed lines, escalation and usage of every chunk branch.
+    translated_texts: List[str] | None # Translated text of every cue of sub_list (original text until its chunk is merged).
+    positions_by_index: Dict[str, List[int]] | None # Track positions of every translated index, including its repeated lines.
+    translated_sub_list: SubtitleTrack | None # Translated cues, a view sharing the cue numbers and timing of sub_list.
     final_srt_path: str | None # File path to the final translated SRT subtitles. 
     
     current_chunk_original_text: str | None # Text of the original subtitle chunk currently being translated. 
     current_chunk_translated_text: str | None # Text of the translated subtitle chunk. 
     current_chunk_validation_status: str | None # Status of the current chunk's translation validation (e.g., 'valid', 'invalid'). 
     current_chunk_retry_count: int # Number of retry attempts for the current translation chunk. 
+    current_chunk_cache_hit: bool | None # Whether the current chunk's translation was served from the translation cache.
+    current_chunk_repaired_lines: int # Number of lines of the current chunk re-requested by the repair pass.
+    current_chunk_escalated: bool # Whether the current chunk was escalated from the cascade model to the translation model.
+    cascade_stats: Dict[str, float] | None # Number and share of chunks escalated from the cascade model in this run.
+    current_chunk_usage: Dict[str, int] | None # Requests, input, cached input and output tokens spent on the current chunk.
+    prompt_cache_stats: Dict[str, object] | None # Provider prompt cache hits (cached input tokens) per chunk and in total.
+    streamed_line_events: queue.Queue | None # Receives (chunk index, line index, text) for every streamed line as it arrives.
+    chunk_slots: asyncio.Semaphore | None # Limits how many async chunk branches translate at once (async job graph only).
+    llm_clients: LLMClients | None # Chat models of the job (translation, cascade, extraction) from the shared client registry.
+    usage_tracker: UsageTracker | None # Records the tokens and latency of every LLM call of the job, per node and chunk.
     
     messages: Annotated[Sequence[BaseMessage], add_messages] # History of messages in the LangGraph agent execution.
 
 
-def _parse_srt_to_list(srt_content: str) -> List[Dict[str, str]]:
-    """Parses SRT formatted string content into a list of subtitle dictionaries."""
-    subs = []
-    if not srt_content:
-        return subs
-    pattern = re.compile(
-        r'(\d+)\s*\n'
-        r'(\d{2}:\d{2}:\d{2},\d{3})\s*-->\s*'
-        r'(\d{2}:\d{2}:\d{2},\d{3})\s*\n'
-        r'((?:.+\n?)+)', 
-        re.MULTILINE
-    )
-    for match in pattern.finditer(srt_content):
-        index = match.group(1)
-        start_time = match.group(2)
-        end_time = match.group(3)
-        text_lines = match.group(4).strip().splitlines()
-        single_line_text = " ".join(line.strip() for line in text_lines if line.strip())
-        
-        subs.append({
-            'index': index,
-            'start_time': start_time,
-            'end_time': end_time,
-            'text': single_line_text # Store as single line
-        })
-    return subs
-
-def _list_to_srt_str(sub_list_data: List[Dict[str, str]]) -> str:
-    """Converts a list of subtitle dictionaries back into an SRT formatted string."""
-    srt_output = []
-    for item in sub_list_data:
-        srt_output.append(item['index'])
-        srt_output.append(f"{item['start_time']} --> {item['end_time']}")
-        # Ensures SRT compliance, allowing multi-line text if reintroduced by LLM.
-        srt_output.append(item['text']) 
-        srt_output.append("")
-    return "\n".join(srt_output)
-
 def _clean_llm_output(text: str) -> str:
     """Cleans LLM output by removing markdown code blocks and surrounding quotes."""
     cleaned = text.strip()
@@ -115,6 +163,7 @@ def _clean_llm_output(text: str) -> str:
     return cleaned
 
 
+@traced()
 def get_video_link_node(state: AgentState) -> AgentState:
     """Prompts the user to input a YouTube video link and updates the state."""
     logger.info("Entering node: get_video_link_node")
@@ -122,6 +171,7 @@ def get_video_link_node(state: AgentState) -> AgentState:
     logger.info(f"User provided video link: {video_link}")
     return {"video_link": video_link, "messages": [HumanMessage(content=f"Video link provided: {video_link}")]}
 
+@traced()
 def display_available_languages_node(state: AgentState) -> AgentState:
     """Fetches and displays available subtitle languages for the video, then updates the state."""
     logger.info("Entering node: display_available_languages_node")
@@ -161,6 +211,7 @@ def decide_after_displaying_languages(state: AgentState) -> str:
         logger.warning("No available languages, or error occurred. Ending process.")
         return END
 
+@traced()
 def get_language_choices_node(state: AgentState) -> AgentState:
     """Prompts user for original and target language choices, then prepares state for subtitle extraction."""
     logger.info("Entering node: get_language_choices_node")
@@ -215,7 +266,9 @@ def get_language_choices_node(state: AgentState) -> AgentState:
         "current_chunk_index": 0,
         "current_chunk_retry_count": 0,
         "translated_chunks_list": [],
-        "translated_sub_list": [],
+        "translated_texts": None,
+        "positions_by_index": None,
+        "translated_sub_list": None,
         "original_srt_path": None,
         "sub_list": None,
         "sub_chunks_list": None,
@@ -223,22 +276,77 @@ def get_language_choices_node(state: AgentState) -> AgentState:
         "current_chunk_original_text": None,
         "current_chunk_translated_text": None,
         "current_chunk_validation_status": None,
+        "current_chunk_cache_hit": None,
         "final_srt_path": None
     }
 
+def _source_language_update(state: AgentState, available_languages: List[dict]) -> dict:
+    """Checks that the requested source language is among the available ones and returns the state update."""
+    video_url, source_language_code = state['video_link'], state.get('chosen_language_code')
+    source_lang_info = next((lang for lang in available_languages if lang['code'] == source_language_code), None)
+    if not source_lang_info:
+        raise ValueError(f"Source language '{source_language_code}' not available for this video")
+
+    update = {"available_languages": available_languages, "original_language": source_lang_info['name']}
+    if decide_extraction_mode(state) == "llm_extraction":
+        update["messages"] = [
+            SystemMessage(content=SUBTITLE_EXTRACTION_SYSTEM_PROMPT),
+            HumanMessage(content=f"Please fetch subtitles for the video: {video_url}. "
+                                 f"The chosen original language code is '{source_language_code}'.")
+        ]
+    return update
+
+@traced()
+def select_source_language_node(state: AgentState) -> dict:
+    """Checks that the requested source language is available for the video (the non-interactive counterpart of the language prompts)."""
+    available_languages = list_available_languages.invoke({"video_url": state['video_link']})
+    return _source_language_update(state, available_languages)
+
+@traced()
+async def aselect_source_language_node(state: AgentState) -> dict:
+    """Async counterpart of select_source_language_node; the listing runs on the YouTube fetch executor."""
+    available_languages = await list_available_languages.ainvoke({"video_url": state['video_link']})
+    return _source_language_update(state, available_languages)
+
 # Tools for the subtitle extraction agent (get_sub_node). Only fetch_youtube_srt is needed now.
 extraction_tools = [fetch_youtube_srt]
-llm = ChatOpenAI(model=EXTRACTION_MODEL_NAME).bind_tools(extraction_tools)
-translation_llm = ChatOpenAI(model=TRANSLATION_MODEL_NAME) 
 
-def get_sub_node(state: AgentState) -> AgentState:
-    """Invokes the LLM to extract subtitles using the chosen language and video link."""
-    logger.info("Entering node: get_sub_node")
-    
-    current_messages = state.get('messages', [])
-    # Preserve existing original_srt_path if it was already set by a previous run or a different logic path
-    new_original_srt_path = state.get('original_srt_path') 
+def create_llm_clients(translation_model_name: str = None, cascade_model_name: str = None,
+                       extraction_model_name: str = None, extraction_mode: str = None) -> LLMClients:
+    """
+    Returns the chat models of a job, taken from the shared client registry so their connections outlive the job.
+
+    Models that are not given default to TRANSLATION_MODEL, CASCADE_MODEL and EXTRACTION_MODEL. The cascade is
+    disabled when its model is "" or the translation model itself, and the extraction model is only created in
+    "llm" extraction mode (extraction_mode, defaulting to AGENT_EXTRACTION_MODE).
+    """
+    translation_model_name = translation_model_name or TRANSLATION_MODEL_NAME
+    cascade_model_name = CASCADE_MODEL_NAME if cascade_model_name is None else cascade_model_name
+    use_cascade = cascade_model_name and cascade_model_name != translation_model_name
+    use_extraction_llm = (extraction_mode or EXTRACTION_MODE).strip().lower() == "llm"
+    return LLMClients(
+        translation=get_chat_model(translation_model_name),
+        cascade=get_chat_model(cascade_model_name) if use_cascade else None,
+        extraction=get_chat_model(extraction_model_name or EXTRACTION_MODEL_NAME).bind_tools(extraction_tools) if use_extraction_llm else None
+    )
 
+def _llm_clients(state: AgentState) -> LLMClients:
+    """Returns the chat models of the job, which every job passes in the state (see create_llm_clients)."""
+    llm_clients = state.get('llm_clients')
+    if llm_clients is None:
+        raise ValueError("The job state carries no 'llm_clients'; create them with create_llm_clients().")
+    return llm_clients
+
+def _extraction_llm(state: AgentState):
+    """Returns the tool-calling extraction model of the job, which only exists in "llm" extraction mode."""
+    extraction_llm = _llm_clients(state).extraction
+    if extraction_llm is None:
+        raise ValueError("The job's LLM clients have no extraction model; create them with extraction_mode='llm'.")
+    return extraction_llm
+
+def _srt_path_from_tool_message(state: AgentState) -> dict | None:
+    """Returns the get_sub update if the last message is the fetch_youtube_srt result, so no LLM call is needed."""
+    current_messages = state.get('messages', [])
     # Check if the last message is a ToolMessage, potentially from fetch_youtube_srt
     if current_messages and isinstance(current_messages[-1], ToolMessage):
         last_tool_message = current_messages[-1]
@@ -248,11 +356,36 @@ def get_sub_node(state: AgentState) -> AgentState:
             logger.info(f"Extracted original_srt_path from ToolMessage: {new_original_srt_path}")
             # If path is successfully extracted from ToolMessage, no need to call LLM again for this cycle.
             return {"messages": current_messages, "original_srt_path": new_original_srt_path}
-
     # If no valid path from ToolMessage, proceed to call LLM for decision/tool invocation
     logger.info(f"No valid SRT path from ToolMessage, invoking LLM with messages: {current_messages}")
-    response = llm.invoke(current_messages) 
+    return None
+
+@traced()
+def get_sub_node(state: AgentState) -> AgentState:
+    """Invokes the LLM to extract subtitles using the chosen language and video link."""
+    logger.info("Entering node: get_sub_node")
+    update = _srt_path_from_tool_message(state)
+    if update is not None:
+        return update
+    response, _ = _invoke_llm(_extraction_llm(state), state.get('messages', []), state.get('usage_tracker'), "get_sub")
+    return _extraction_response_update(state, response)
+
+@traced()
+async def aget_sub_node(state: AgentState) -> AgentState:
+    """Async counterpart of get_sub_node, awaiting the extraction LLM."""
+    logger.info("Entering node: aget_sub_node")
+    update = _srt_path_from_tool_message(state)
+    if update is not None:
+        return update
+    response, _ = await _ainvoke_llm(_extraction_llm(state), state.get('messages', []), state.get('usage_tracker'), "get_sub")
+    return _extraction_response_update(state, response)
+
+def _extraction_response_update(state: AgentState, response: AIMessage) -> AgentState:
+    """Points fetch_youtube_srt calls of the extraction LLM at the transcript directory, or reads the SRT path from its final answer."""
     logger.info(f"LLM response: {response}")
+    current_messages = state.get('messages', [])
+    # Preserve existing original_srt_path if it was already set by a previous run or a different logic path
+    new_original_srt_path = state.get('original_srt_path') 
 
     # Modify tool call arguments if fetch_youtube_srt is called by the LLM
     if isinstance(response, AIMessage) and response.tool_calls:
@@ -306,6 +439,67 @@ def get_sub_node(state: AgentState) -> AgentState:
         "original_srt_path": new_original_srt_path
     }
 
+def _direct_extraction_args(state: AgentState) -> dict:
+    """Returns the fetch_youtube_srt arguments that save the chosen subtitles as <video_id>_<language>.srt in the transcript directory."""
+    video_url = state.get('video_link')
+    language_code = state.get('chosen_language_code')
+    video_id = _extract_video_id(video_url)
+    base_output_dir = os.environ.get("TRANSCRIPT_OUTPUT_DIR", DEFAULT_TRANSCRIPT_OUTPUT_DIR)
+    if not os.path.exists(base_output_dir):
+        logger.info(f"Creating base output directory for transcripts: {base_output_dir}")
+        os.makedirs(base_output_dir, exist_ok=True)
+    return {
+        "video_url": video_url,
+        "language_code": language_code,
+        "output_srt_path": os.path.join(base_output_dir, f"{video_id}_{language_code}.srt")
+    }
+
+def _direct_extraction_update(original_srt_path: str = None, error: Exception = None) -> AgentState:
+    """Returns the state update of a direct subtitle download."""
+    if error is not None:
+        logger.error(f"Error fetching subtitles directly: {error}", exc_info=error)
+        return {"original_srt_path": None, "messages": [SystemMessage(content=f"Error fetching subtitles: {error}")]}
+    logger.info(f"direct_extraction_node: Original subtitles saved to: {original_srt_path}")
+    return {"original_srt_path": original_srt_path,
+            "messages": [SystemMessage(content=f"Original subtitles saved to {original_srt_path}")]}
+
+def _missing_extraction_input(state: AgentState) -> AgentState | None:
+    """Returns the error update if the video link or the chosen language code is missing."""
+    if state.get('video_link') and state.get('chosen_language_code'):
+        return None
+    logger.error("Video link or chosen language code is missing.")
+    return {"original_srt_path": None, "messages": [SystemMessage(content="Error: Video link or language code is missing.")]}
+
+@traced()
+def direct_extraction_node(state: AgentState) -> AgentState:
+    """Downloads the original subtitles by calling fetch_youtube_srt directly, without an extraction LLM round trip."""
+    logger.info("Entering node: direct_extraction_node")
+    missing_input = _missing_extraction_input(state)
+    if missing_input is not None:
+        return missing_input
+    try:
+        original_srt_path = fetch_youtube_srt.invoke(_direct_extraction_args(state))
+    except Exception as e:
+        return _direct_extraction_update(error=e)
+    return _direct_extraction_update(original_srt_path)
+
+@traced()
+async def adirect_extraction_node(state: AgentState) -> AgentState:
+    """Async counterpart of direct_extraction_node; the download runs on the YouTube fetch executor."""
+    logger.info("Entering node: adirect_extraction_node")
+    missing_input = _missing_extraction_input(state)
+    if missing_input is not None:
+        return missing_input
+    try:
+        original_srt_path = await fetch_youtube_srt.ainvoke(_direct_extraction_args(state))
+    except Exception as e:
+        return _direct_extraction_update(error=e)
+    return _direct_extraction_update(original_srt_path)
+
+def decide_extraction_mode(state: AgentState) -> str:
+    """Chooses between deterministic subtitle extraction and the LLM-driven tool-calling path."""
+    return "llm_extraction" if (state.get('extraction_mode') or EXTRACTION_MODE) == "llm" else "direct_extraction"
+
 def should_continue_extraction(state: AgentState) -> str:
     """Determines if subtitle extraction requires a tool call, or can proceed to translation/end."""
     if state.get("original_srt_path") is not None:
@@ -317,6 +511,35 @@ def should_continue_extraction(state: AgentState) -> str:
         return "continue_extraction"
     return "end_process"
 
+def _deduplicate_sub_list(sub_list: SubtitleTrack) -> Tuple[List[int], Dict[str, str], Dict[str, int]]:
+    """
+    Collapses subtitle cues with identical text (e.g. "[Music]", repeated chorus lines) to their first occurrence.
+
+    Returns the positions of the unique cues in original order, a map from each repeated cue's index to the index of
+    its representative, and statistics on how many entries and tokens the deduplication saves.
+    """
+    representative_by_text: Dict[str, str] = {}
+    duplicate_index_map: Dict[str, str] = {}
+    unique_positions = []
+    tokens_saved = 0
+    for position, text in enumerate(sub_list.texts):
+        representative_index = representative_by_text.get(text)
+        if representative_index is None:
+            representative_by_text[text] = sub_list.index_at(position)
+            unique_positions.append(position)
+        else:
+            duplicate_index_map[sub_list.index_at(position)] = representative_index
+            tokens_saved += count_tokens(sub_list.numbered_line(position)) + 1
+    dedup_stats = {
+        "entries": len(sub_list),
+        "unique_entries": len(unique_positions),
+        "duplicate_entries": len(duplicate_index_map),
+        "tokens_saved": tokens_saved
+    }
+    logger.info(f"Deduplicated subtitle lines: {dedup_stats}")
+    return unique_positions, duplicate_index_map, dedup_stats
+
+@traced()
 def prepare_translation_node(state: AgentState) -> dict:
     """Loads original subtitles, parses them, and divides them into text chunks for translation."""
     logger.info("Preparing translation...")
@@ -324,67 +547,649 @@ def prepare_translation_node(state: AgentState) -> dict:
     if not original_srt_path or not os.path.exists(original_srt_path):
         logger.error(f"Error reading SRT file {original_srt_path}: File not found")
         return {"messages": [SystemMessage(content=f"Error: Original SRT file not found. Cannot proceed.")]}
-    with open(original_srt_path, 'r', encoding='utf-8') as f: srt_content = f.read()
-    
-    sub_list = _parse_srt_to_list(srt_content) 
+    # Read and parsed in a single pass over the file
+    with span("read_srt", path=original_srt_path):
+        sub_list = read_track(original_srt_path)
+
+    # Only the first occurrence of each distinct text is translated; finalize fans it out to the repeats
+    if DEDUPLICATE_LINES:
+        unique_positions, duplicate_index_map, dedup_stats = _deduplicate_sub_list(sub_list)
+    else:
+        unique_positions, duplicate_index_map, dedup_stats = range(len(sub_list)), {}, None
     
-    numbered_texts_for_chunking = [f"{item['index']}. {item['text']}" for item in sub_list]
+    numbered_texts_for_chunking = [sub_list.numbered_line(position) for position in unique_positions]
     
-    sub_chunks_list = ["\n".join(numbered_texts_for_chunking[i:i + CHUNK_SIZE]) 
-                       for i in range(0, len(numbered_texts_for_chunking), CHUNK_SIZE)]
-    logger.info(f"Created {len(sub_chunks_list)} chunks of size {CHUNK_SIZE}.")
+    if CHUNK_TOKEN_BUDGET > 0:
+        # Pack entries up to the token budget, preferring to break at pauses in the speech
+        chunk_ranges, chunk_token_counts = plan_chunks([sub_list.start_ms[position] for position in unique_positions],
+                                                       [sub_list.end_ms[position] for position in unique_positions],
+                                                       numbered_texts_for_chunking, CHUNK_TOKEN_BUDGET, CHUNK_SIZE)
+    else:
+        chunk_ranges = [(i, min(i + CHUNK_SIZE, len(numbered_texts_for_chunking)))
+                        for i in range(0, len(numbered_texts_for_chunking), CHUNK_SIZE)]
+        chunk_token_counts = [sum(count_tokens(line) + 1 for line in numbered_texts_for_chunking[start:end])
+                              for start, end in chunk_ranges]
+    # Chunks reference the track instead of holding a second copy of the transcript
+    sub_chunks_list = SubtitleChunks(sub_list, unique_positions, [start for start, _ in chunk_ranges] + [len(numbered_texts_for_chunking)])
+    chunk_stats = summarize_chunk_sizes(chunk_token_counts, [end - start for start, end in chunk_ranges])
+    logger.info(f"Created {len(sub_chunks_list)} chunks (token budget {CHUNK_TOKEN_BUDGET or 'off'}, max {CHUNK_SIZE} entries). Size distribution: {chunk_stats}")
     return {
-        "sub_list": sub_list, "sub_chunks_list": sub_chunks_list, 
+        "sub_list": sub_list, "sub_chunks_list": sub_chunks_list, "chunk_stats": chunk_stats,
+        "duplicate_index_map": duplicate_index_map, "dedup_stats": dedup_stats,
         "current_chunk_index": 0, "translated_chunks_list": [], 
+        "translated_texts": None, "positions_by_index": None,
         "current_chunk_retry_count": 0 
     }
 
-def generate_translation_context_node(state: AgentState) -> dict:
-    """Generates a contextual translation memory from the full subtitle text using an LLM."""
+def _group_texts_by_size(texts: List[str], max_chars: int, separator: str, min_items: int = 1) -> List[str]:
+    """Joins consecutive texts into groups of at most max_chars characters, each holding at least min_items texts."""
+    groups: List[List[str]] = []
+    current_group: List[str] = []
+    current_size = 0
+    for text in texts:
+        if current_group and len(current_group) >= min_items and current_size + len(separator) + len(text) > max_chars:
+            groups.append(current_group)
+            current_group, current_size = [], 0
+        current_size += (len(separator) if current_group else 0) + len(text)
+        current_group.append(text)
+    if current_group:
+        # A trailing group that is too small to make progress is folded into the previous one
+        if groups and len(current_group) < min_items:
+            groups[-1].extend(current_group)
+        else:
+            groups.append(current_group)
+    return [separator.join(group) for group in groups]
+
+def _partial_memory_messages(section_text: str, section_number: int, section_count: int, target_language: str) -> List[BaseMessage]:
+    """Builds the request for a partial translation memory covering one section of the transcript."""
+    logger.info(f"Generating partial translation memory for section {section_number}/{section_count}...")
+    sys_prompt = TRANSLATION_CONTEXT_SECTION_SYSTEM_PROMPT.format(
+        target_language=target_language, section_number=section_number, section_count=section_count
+    )
+    human_prompt = TRANSLATION_CONTEXT_SECTION_HUMAN_PROMPT.format(
+        target_language=target_language, section_number=section_number, section_count=section_count,
+        subtitle_section_text=section_text
+    )
+    return [SystemMessage(content=sys_prompt), HumanMessage(content=human_prompt)]
+
+def _merge_memories_messages(partial_memories: List[str], target_language: str) -> List[BaseMessage]:
+    """Builds the request that merges ordered partial translation memories into one memory in the standard structure."""
+    logger.info(f"Merging {len(partial_memories)} partial translation memories...")
+    numbered_partials = "\n\n".join(
+        f"--- Partial memory {number} ---\n{memory}" for number, memory in enumerate(partial_memories, 1)
+    )
+    sys_prompt = TRANSLATION_CONTEXT_MERGE_SYSTEM_PROMPT.format(target_language=target_language)
+    human_prompt = TRANSLATION_CONTEXT_MERGE_HUMAN_PROMPT.format(
+        target_language=target_language, partial_count=len(partial_memories), partial_memories=numbered_partials
+    )
+    return [SystemMessage(content=sys_prompt), HumanMessage(content=human_prompt)]
+
+def _generate_partial_translation_memory(llm, section_text: str, section_number: int, section_count: int, target_language: str,
+                                         usage_tracker: UsageTracker = None) -> str:
+    """Asks the LLM for a partial translation memory covering one section of the transcript."""
+    ai_response, _ = _invoke_llm(llm, _partial_memory_messages(section_text, section_number, section_count, target_language),
+                                 usage_tracker, "generate_translation_context")
+    return ai_response.content
+
+def _merge_translation_memories(llm, partial_memories: List[str], target_language: str, usage_tracker: UsageTracker = None) -> str:
+    """Asks the LLM to merge ordered partial translation memories into one memory in the standard structure."""
+    ai_response, _ = _invoke_llm(llm, _merge_memories_messages(partial_memories, target_language),
+                                 usage_tracker, "generate_translation_context")
+    return ai_response.content
+
+async def _agenerate_partial_translation_memory(llm, section_text: str, section_number: int, section_count: int, target_language: str,
+                                                usage_tracker: UsageTracker = None) -> str:
+    """Async counterpart of _generate_partial_translation_memory."""
+    ai_response, _ = await _ainvoke_llm(llm, _partial_memory_messages(section_text, section_number, section_count, target_language),
+                                        usage_tracker, "generate_translation_context")
+    return ai_response.content
+
+async def _amerge_translation_memories(llm, partial_memories: List[str], target_language: str, usage_tracker: UsageTracker = None) -> str:
+    """Async counterpart of _merge_translation_memories."""
+    ai_response, _ = await _ainvoke_llm(llm, _merge_memories_messages(partial_memories, target_language),
+                                        usage_tracker, "generate_translation_context")
+    return ai_response.content
+
+# Separator of partial results grouped into one merge request
+PARTIAL_SEPARATOR = "\n\n<<<PARTIAL>>>\n\n"
+
+def _context_sections(texts: List[str], label: str) -> List[str]:
+    """Splits texts into the sections of at most CONTEXT_SECTION_CHARS that are mapped one request each."""
+    sections = _group_texts_by_size(texts, CONTEXT_SECTION_CHARS, "\n")
+    logger.info(f"Transcript split into {len(sections)} sections for hierarchical {label} generation.")
+    return sections
+
+def _map_reduce_texts(texts: List[str], map_section, merge_partials, label: str) -> str:
+    """Splits texts into sections of at most CONTEXT_SECTION_CHARS, maps every section in parallel and merges the partial results until one remains."""
+    sections = _context_sections(texts, label)
+    section_count = len(sections)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENT_CHUNKS, section_count)), thread_name_prefix="context") as executor:
+        partials = [future.result() for future in [
+            submit_in_context(executor, map_section, section_text, section_number, section_count,
+                              span_name="map_section", span_attributes={"label": label, "section_number": section_number})
+            for section_number, section_text in enumerate(sections, 1)
+        ]]
+
+        # Merge groups of partial results that fit into one prompt until a single group remains
+        while True:
+            groups = _group_texts_by_size(partials, CONTEXT_SECTION_CHARS, PARTIAL_SEPARATOR, min_items=2)
+            if len(groups) == 1:
+                return merge_partials(groups[0].split(PARTIAL_SEPARATOR))
+            logger.info(f"Reducing {len(partials)} partial {label}s in {len(groups)} groups...")
+            partials = [future.result() for future in [
+                submit_in_context(executor, merge_partials, group.split(PARTIAL_SEPARATOR),
+                                  span_name="merge_partials", span_attributes={"label": label})
+                for group in groups
+            ]]
+
+async def _amap_reduce_texts(texts: List[str], map_section, merge_partials, label: str) -> str:
+    """Async counterpart of _map_reduce_texts: map_section and merge_partials are coroutine functions, at most MAX_CONCURRENT_CHUNKS run at once."""
+    sections = _context_sections(texts, label)
+    section_count = len(sections)
+    semaphore = asyncio.Semaphore(max(1, MAX_CONCURRENT_CHUNKS))
+
+    async def bounded(span_name: str, coroutine, **span_attributes):
+        async with semaphore:
+            with span(span_name, label=label, **span_attributes):
+                return await coroutine
+
+    partials = await asyncio.gather(*(
+        bounded("map_section", map_section(section_text, section_number, section_count), section_number=section_number)
+        for section_number, section_text in enumerate(sections, 1)
+    ))
+    # Merge groups of partial results that fit into one prompt until a single group remains
+    while True:
+        groups = _group_texts_by_size(partials, CONTEXT_SECTION_CHARS, PARTIAL_SEPARATOR, min_items=2)
+        if len(groups) == 1:
+            return await merge_partials(groups[0].split(PARTIAL_SEPARATOR))
+        logger.info(f"Reducing {len(partials)} partial {label}s in {len(groups)} groups...")
+        partials = await asyncio.gather(*(bounded("merge_partials", merge_partials(group.split(PARTIAL_SEPARATOR))) for group in groups))
+
+def _generate_translation_memory_hierarchically(llm, subtitle_texts: List[str], target_language: str,
+                                                usage_tracker: UsageTracker = None) -> str:
+    """Builds the translation memory for a long transcript by analysing sections in parallel and merging the results."""
+    return _map_reduce_texts(
+        subtitle_texts,
+        lambda section_text, section_number, section_count: _generate_partial_translation_memory(
+            llm, section_text, section_number, section_count, target_language, usage_tracker
+        ),
+        lambda partial_memories: _merge_translation_memories(llm, partial_memories, target_language, usage_tracker),
+        "translation memory"
+    )
+
+async def _agenerate_translation_memory_hierarchically(llm, subtitle_texts: List[str], target_language: str,
+                                                       usage_tracker: UsageTracker = None) -> str:
+    """Async counterpart of _generate_translation_memory_hierarchically."""
+    return await _amap_reduce_texts(
+        subtitle_texts,
+        lambda section_text, section_number, section_count: _agenerate_partial_translation_memory(
+            llm, section_text, section_number, section_count, target_language, usage_tracker
+        ),
+        lambda partial_memories: _amerge_translation_memories(llm, partial_memories, target_language, usage_tracker),
+        "translation memory"
+    )
+
+def _analyse_source_section(llm, section_text: str, section_number: int, section_count: int, usage_tracker: UsageTracker = None) -> str:
+    """Asks the LLM for a target-language independent analysis of the transcript or one of its sections."""
+    section_description = "the full text" if section_count == 1 else f"section {section_number} of {section_count}"
+    logger.info(f"Analysing {section_description} of the source subtitles...")
+    sys_prompt = SOURCE_ANALYSIS_SYSTEM_PROMPT.format(section_description=section_description)
+    human_prompt = SOURCE_ANALYSIS_HUMAN_PROMPT.format(section_description=section_description, subtitle_text=section_text)
+    ai_response, _ = _invoke_llm(llm, [SystemMessage(content=sys_prompt), HumanMessage(content=human_prompt)],
+                                 usage_tracker, "source_analysis")
+    return ai_response.content
+
+def _merge_source_analyses(llm, partial_analyses: List[str], usage_tracker: UsageTracker = None) -> str:
+    """Asks the LLM to merge ordered partial source analyses into one analysis of the whole video."""
+    logger.info(f"Merging {len(partial_analyses)} partial source analyses...")
+    numbered_partials = "\n\n".join(
+        f"--- Partial analysis {number} ---\n{analysis}" for number, analysis in enumerate(partial_analyses, 1)
+    )
+    human_prompt = SOURCE_ANALYSIS_MERGE_HUMAN_PROMPT.format(partial_count=len(partial_analyses), partial_analyses=numbered_partials)
+    ai_response, _ = _invoke_llm(llm, [SystemMessage(content=SOURCE_ANALYSIS_MERGE_SYSTEM_PROMPT), HumanMessage(content=human_prompt)],
+                                 usage_tracker, "source_analysis")
+    return ai_response.content
+
+def _generate_source_analysis(llm, sub_list: SubtitleTrack, usage_tracker: UsageTracker = None) -> str:
+    """Analyses the transcript once independent of the target language, reusing a stored analysis when available."""
+    translation_cache = get_translation_cache()
+    sub_list_hash = hash_sub_list(sub_list)
+    model_name = llm.model_name
+    if translation_cache is not None:
+        try:
+            cached_analysis = translation_cache.get_translation_memory(sub_list_hash, SOURCE_ANALYSIS_LANGUAGE_KEY, model_name, PROMPT_VERSION)
+        except Exception as e:
+            logger.warning(f"Source analysis lookup failed: {e}")
+            cached_analysis = None
+        if cached_analysis is not None:
+            logger.info("Reusing stored source analysis.")
+            return cached_analysis
+
+    subtitle_texts = sub_list.texts
+    full_text = "\n".join(subtitle_texts)
+    if CONTEXT_SECTION_CHARS > 0 and len(full_text) > CONTEXT_SECTION_CHARS:
+        source_analysis = _map_reduce_texts(
+            subtitle_texts,
+            lambda section_text, section_number, section_count: _analyse_source_section(llm, section_text, section_number, section_count, usage_tracker),
+            lambda partial_analyses: _merge_source_analyses(llm, partial_analyses, usage_tracker),
+            "source analysis"
+        )
+    else:
+        source_analysis = _analyse_source_section(llm, full_text, 1, 1, usage_tracker)
+    logger.info(f"LLM generated source analysis (first 200 chars): {source_analysis[:200]}...")
+
+    if translation_cache is not None and source_analysis:
+        try:
+            translation_cache.put_translation_memory(sub_list_hash, SOURCE_ANALYSIS_LANGUAGE_KEY, model_name, PROMPT_VERSION, source_analysis)
+        except Exception as e:
+            logger.warning(f"Could not store source analysis: {e}")
+    return source_analysis
+
+def _reuse_translation_memory(state: AgentState) -> dict | None:
+    """Returns the update of generate_translation_context_node if it needs no LLM call: an error, the memory of an earlier run or a stored one."""
     logger.info("Generating translation context...")
     sub_list, target_language = state.get('sub_list'), state.get('target_language')
     if not sub_list: return {"messages": [SystemMessage(content="Error: Subtitle list not found.")]}
     if not target_language: return {"messages": [SystemMessage(content="Error: Target language not found.")]}
+    translation_llm = _llm_clients(state).translation
+    if state.get('translation_memory'):
+        # Generated by an earlier run of this job (e.g. a resumed checkpoint)
+        return {}
+    if state.get('refresh_translation_memory'):
+        invalidate_translation_memory(sub_list, target_language, translation_llm.model_name)
     
-    full_text = "\n".join([item['text'] for item in sub_list]) 
-    
+    # Reuse the stored translation memory if this exact transcript was already analysed for this language and model
+    translation_cache = get_translation_cache()
+    sub_list_hash = hash_sub_list(sub_list)
+    model_name = translation_llm.model_name
+    if translation_cache is not None:
+        try:
+            cached_memory = translation_cache.get_translation_memory(sub_list_hash, target_language, model_name, PROMPT_VERSION)
+        except Exception as e:
+            logger.warning(f"Translation memory lookup failed: {e}")
+            cached_memory = None
+        if cached_memory is not None:
+            logger.info(f"Reusing stored translation memory (first 200 chars): {cached_memory[:200]}...")
+            return {"translation_memory": cached_memory}
+    return None
+
+def _translation_context_messages(state: AgentState) -> List[BaseMessage] | None:
+    """Builds the single request that writes the translation memory, or returns None if the transcript is too long for one prompt."""
+    target_language = state.get('target_language')
+    if state.get('source_analysis'):
+        # The transcript was already analysed once for all target languages: only localise that analysis
+        sys_prompt = TRANSLATION_CONTEXT_LOCALIZE_SYSTEM_PROMPT.format(target_language=target_language)
+        human_prompt = TRANSLATION_CONTEXT_LOCALIZE_HUMAN_PROMPT.format(source_analysis=state['source_analysis'], target_language=target_language)
+        return [SystemMessage(content=sys_prompt), HumanMessage(content=human_prompt)]
+    full_text = "\n".join(state['sub_list'].texts)
+    if CONTEXT_SECTION_CHARS > 0 and len(full_text) > CONTEXT_SECTION_CHARS:
+        # Too long for one prompt: partial memories are built per section in parallel, then merged
+        return None
     sys_prompt = TRANSLATION_CONTEXT_SYSTEM_PROMPT.format(target_language=target_language)
     human_prompt = TRANSLATION_CONTEXT_HUMAN_PROMPT.format(subtitle_full_text=full_text, target_language=target_language)
-    ai_response = translation_llm.invoke([SystemMessage(content=sys_prompt), HumanMessage(content=human_prompt)])
-    logger.info(f"LLM generated translation memory (first 200 chars): {ai_response.content[:200]}...")
-    return {"translation_memory": ai_response.content}
+    return [SystemMessage(content=sys_prompt), HumanMessage(content=human_prompt)]
 
-def translate_current_chunk_node(state: AgentState) -> dict:
-    """Translates the current chunk of subtitles using an LLM, incorporating translation memory and retry logic."""
+def _store_translation_memory(state: AgentState, translation_memory: str) -> dict:
+    """Stores a generated translation memory for this transcript, language and model, and returns the node's update."""
+    logger.info(f"LLM generated translation memory (first 200 chars): {translation_memory[:200]}...")
+    translation_cache = get_translation_cache()
+    if translation_cache is not None and translation_memory:
+        try:
+            translation_cache.put_translation_memory(hash_sub_list(state['sub_list']), state['target_language'],
+                                                     _llm_clients(state).translation.model_name, PROMPT_VERSION, translation_memory)
+        except Exception as e:
+            logger.warning(f"Could not store translation memory: {e}")
+    return {"translation_memory": translation_memory}
+
+@traced()
+def generate_translation_context_node(state: AgentState) -> dict:
+    """Generates a contextual translation memory from the full subtitle text using an LLM."""
+    update = _reuse_translation_memory(state)
+    if update is not None:
+        return update
+    translation_llm = _llm_clients(state).translation
+    messages = _translation_context_messages(state)
+    if messages is None:
+        translation_memory = _generate_translation_memory_hierarchically(translation_llm, state['sub_list'].texts, state['target_language'],
+                                                                         state.get('usage_tracker'))
+    else:
+        ai_response, _ = _invoke_llm(translation_llm, messages, state.get('usage_tracker'), "generate_translation_context")
+        translation_memory = ai_response.content
+    return _store_translation_memory(state, translation_memory)
+
+@traced()
+async def agenerate_translation_context_node(state: AgentState) -> dict:
+    """Async counterpart of generate_translation_context_node."""
+    update = _reuse_translation_memory(state)
+    if update is not None:
+        return update
+    translation_llm = _llm_clients(state).translation
+    messages = _translation_context_messages(state)
+    if messages is None:
+        translation_memory = await _agenerate_translation_memory_hierarchically(translation_llm, state['sub_list'].texts, state['target_language'],
+                                                                                state.get('usage_tracker'))
+    else:
+        ai_response, _ = await _ainvoke_llm(translation_llm, messages, state.get('usage_tracker'), "generate_translation_context")
+        translation_memory = ai_response.content
+    return _store_translation_memory(state, translation_memory)
+
+def _usage_from_message(message, latency_seconds: float = 0.0) -> Dict[str, float]:
+    """Extracts input, cached input and output token counts from a response's usage metadata."""
+    usage_metadata = getattr(message, "usage_metadata", None) or {}
+    return {
+        "requests": 1,
+        "input_tokens": usage_metadata.get("input_tokens", 0),
+        "cached_input_tokens": (usage_metadata.get("input_token_details") or {}).get("cache_read", 0) or 0,
+        "output_tokens": usage_metadata.get("output_tokens", 0),
+        "latency_seconds": round(latency_seconds, 3)
+    }
+
+def _record_usage(usage_tracker: UsageTracker | None, node: str, llm, usage: Dict[str, float], chunk_index: int = None) -> None:
+    """Records one LLM call with the job's usage tracker, if the job has one."""
+    if usage_tracker is not None:
+        usage_tracker.record(node, _model_name(llm), usage, chunk_index)
+
+def _invoke_llm(llm, messages: List[BaseMessage], usage_tracker: UsageTracker = None, node: str = None,
+                chunk_index: int = None) -> Tuple[AIMessage, Dict[str, float]]:
+    """Calls the LLM within its rate limits and returns the response with its usage, recording it under the given node."""
+    with span("llm_call", node=node, model=_model_name(llm), chunk_index=chunk_index):
+        started_at = time.monotonic()
+        response = invoke_with_rate_limit(llm, messages)
+        usage = _usage_from_message(response, time.monotonic() - started_at)
+        set_span_attributes(**usage)
+    _record_usage(usage_tracker, node, llm, usage, chunk_index)
+    return response, usage
+
+async def _ainvoke_llm(llm, messages: List[BaseMessage], usage_tracker: UsageTracker = None, node: str = None,
+                       chunk_index: int = None) -> Tuple[AIMessage, Dict[str, float]]:
+    """Async counterpart of _invoke_llm, awaiting the LLM without blocking the event loop."""
+    with span("llm_call", node=node, model=_model_name(llm), chunk_index=chunk_index):
+        started_at = time.monotonic()
+        response = await ainvoke_with_rate_limit(llm, messages)
+        usage = _usage_from_message(response, time.monotonic() - started_at)
+        set_span_attributes(**usage)
+    _record_usage(usage_tracker, node, llm, usage, chunk_index)
+    return response, usage
+
+def _add_usage(usage: Dict[str, int] | None, more_usage: Dict[str, int]) -> Dict[str, int]:
+    """Sums two token usage dicts."""
+    total = dict(usage or {})
+    for key, value in more_usage.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+def _chunk_llm(state: AgentState):
+    """Returns the model for the current chunk: the cascade model first, the translation model once escalated."""
+    llm_clients = _llm_clients(state)
+    if llm_clients.cascade is not None and not state.get('current_chunk_escalated'):
+        return llm_clients.cascade
+    return llm_clients.translation
+
+def _escalate_chunk(state: AgentState, reason: str) -> dict:
+    """Hands the current chunk from the cascade model to the translation model with a fresh retry budget."""
+    llm_clients = _llm_clients(state)
+    logger.warning(f"Chunk {state.get('current_chunk_index', 0) + 1}: {reason} with cascade model {llm_clients.cascade.model_name}, "
+                   f"escalating to {llm_clients.translation.model_name}.")
+    return {
+        "current_chunk_escalated": True,
+        "current_chunk_retry_count": 0,
+        "current_chunk_validation_status": "ESCALATED",
+        "current_chunk_repaired_lines": 0
+    }
+
+def _stable_prefix_message(translation_memory: str, target_language: str) -> SystemMessage:
+    """Builds the system message shared byte-for-byte by every chunk and repair request of a job (prefix_cache layout)."""
+    return SystemMessage(content=CHUNK_TRANSLATION_SYSTEM_PROMPT.format(target_language=target_language)
+                         + TRANSLATION_MEMORY_SECTION.format(translation_memory=translation_memory))
+
+def _memory_sections(translation_memory: str, subtitle_text: str) -> Tuple[str, str]:
+    """Returns the memory part shared by every request and the glossary section for the given subtitle lines."""
+    shared_memory, glossary_lines = memory_for_chunk(translation_memory, subtitle_text)
+    if not glossary_lines:
+        return shared_memory, ""
+    return shared_memory, CHUNK_GLOSSARY_SECTION.format(glossary_lines="\n".join(glossary_lines))
+
+def _chunk_glossary(translation_memory: str, subtitle_text: str) -> str:
+    """Returns the glossary lines injected into the request for the given subtitle lines, which cached lines are keyed on."""
+    return "\n".join(memory_for_chunk(translation_memory, subtitle_text)[1])
+
+def _build_chunk_messages(original_chunk_text: str, translation_memory: str, target_language: str, retry_count: int = 0) -> List[BaseMessage]:
+    """Builds the chat messages that ask the LLM to translate one numbered subtitle chunk."""
+    retry_note = ""
+    if retry_count > 0:
+        retry_note = "\n\nIMPORTANT: YOUR PREVIOUS ATTEMPT WAS REJECTED BECAUSE IT CONTAINED MARKDOWN CODE BLOCK DELIMITERS (```). PLEASE PROVIDE THE TRANSLATION AS PLAIN TEXT, STRICTLY FOLLOWING THE NUMBERED LINE FORMAT WITHOUT ANY CODE BLOCK WRAPPERS."
+    shared_memory, chunk_glossary = _memory_sections(translation_memory, original_chunk_text)
+    if PROMPT_LAYOUT == "prefix_cache":
+        # Only the chunk's glossary, the chunk and the retry note vary, and they come last
+        human_prompt = CHUNK_TRANSLATION_TAIL_HUMAN_PROMPT.format(
+            chunk_glossary=chunk_glossary, target_language=target_language,
+            numbered_subtitle_lines=original_chunk_text, retry_note=retry_note
+        )
+        return [_stable_prefix_message(shared_memory, target_language), HumanMessage(content=human_prompt)]
+    sys_prompt = CHUNK_TRANSLATION_SYSTEM_PROMPT.format(target_language=target_language) + retry_note
+    human_prompt = CHUNK_TRANSLATION_HUMAN_PROMPT.format(
+        translation_memory=shared_memory + chunk_glossary, 
+        target_language=target_language, 
+        numbered_subtitle_lines=original_chunk_text
+    )
+    return [SystemMessage(content=sys_prompt), HumanMessage(content=human_prompt)]
+
+class _StreamedChunkLines:
+    """
+    Parses completed "N. text" lines of a streamed chunk translation as the message chunks arrive.
+
+    Every parsed line is put on line_events. feed returns False once the stream should be aborted: when a code
+    fence appears (the partial output keeps the fence so validation rejects it) or when a line number is unknown
+    or out of order (the lines received so far are kept and the repair pass requests the rest).
+    """
+
+    __slots__ = ("original_indices", "chunk_idx", "line_events", "received_lines", "buffer", "last_index", "usage")
+
+    def __init__(self, original_chunk_text: str, chunk_idx: int, line_events: queue.Queue = None):
+        self.original_indices = set(_split_numbered_chunk(original_chunk_text)[0])
+        self.chunk_idx = chunk_idx
+        self.line_events = line_events
+        self.received_lines: List[str] = []
+        self.buffer = ""
+        self.last_index = 0
+        self.usage = {}
+
+    def feed(self, message_chunk) -> bool:
+        """Adds one streamed message chunk and returns False if the stream should be aborted."""
+        if getattr(message_chunk, "usage_metadata", None):
+            self.usage = _usage_from_message(message_chunk)
+        self.buffer += message_chunk.content if isinstance(message_chunk.content, str) else ""
+        *completed_lines, self.buffer = self.buffer.split("\n")
+        return all(self._handle_line(line) for line in completed_lines)
+
+    def finish(self) -> None:
+        """Handles the last line, which has no trailing newline."""
+        self._handle_line(self.buffer)
+        self.buffer = ""
+
+    def result(self) -> Tuple[str, Dict[str, int]]:
+        """Returns the text received so far and the token usage reported by the stream."""
+        return "\n".join(self.received_lines), self.usage or {"requests": 1}
+
+    def _handle_line(self, line: str) -> bool:
+        """Records one completed line and returns False if the stream should be aborted."""
+        stripped_line = line.strip()
+        if not stripped_line:
+            return True
+        self.received_lines.append(stripped_line)
+        if "```" in stripped_line:
+            logger.warning(f"Chunk {self.chunk_idx + 1}: code fence in streamed output, aborting the response early.")
+            return False
+        # Lines are recognised exactly as validation recognises them (_split_numbered_chunk)
+        match = NUMBERED_LINE_PATTERN.match(stripped_line)
+        if not match:
+            return True  # Continuation lines are left to the repair pass
+        line_index = match.group(1)
+        if line_index not in self.original_indices or int(line_index) <= self.last_index:
+            logger.warning(f"Chunk {self.chunk_idx + 1}: unexpected line number {line_index} in streamed output, aborting the response early.")
+            self.received_lines.pop()
+            return False
+        self.last_index = int(line_index)
+        if self.line_events is not None:
+            self.line_events.put((self.chunk_idx, line_index, match.group(2).strip()))
+        return True
+
+def _stream_chunk_translation(chunk_llm, messages: List[BaseMessage], original_chunk_text: str, chunk_idx: int,
+                              line_events: queue.Queue = None) -> Tuple[str, Dict[str, int]]:
+    """
+    Streams a chunk translation and parses completed "N. text" lines as they arrive (see _StreamedChunkLines).
+
+    Returns:
+        tuple: (text received so far, token usage reported by the stream)
+    """
+    streamed_lines = _StreamedChunkLines(original_chunk_text, chunk_idx, line_events)
+    stream = stream_with_rate_limit(chunk_llm, messages, stream_usage=True)
+    try:
+        for message_chunk in stream:
+            if not streamed_lines.feed(message_chunk):
+                return streamed_lines.result()
+        streamed_lines.finish()
+    finally:
+        stream.close()  # Stops the underlying HTTP response when the stream is aborted early
+    return streamed_lines.result()
+
+async def _astream_chunk_translation(chunk_llm, messages: List[BaseMessage], original_chunk_text: str, chunk_idx: int,
+                                     line_events: queue.Queue = None) -> Tuple[str, Dict[str, int]]:
+    """Async counterpart of _stream_chunk_translation."""
+    streamed_lines = _StreamedChunkLines(original_chunk_text, chunk_idx, line_events)
+    stream = astream_with_rate_limit(chunk_llm, messages, stream_usage=True)
+    try:
+        async for message_chunk in stream:
+            if not streamed_lines.feed(message_chunk):
+                return streamed_lines.result()
+        streamed_lines.finish()
+    finally:
+        await stream.aclose()  # Stops the underlying HTTP response when the stream is aborted early or cancelled
+    return streamed_lines.result()
+
+def _cached_chunk_translation(state: AgentState, chunk_text: str, model_name: str) -> str | None:
+    """Returns the cached translation of a chunk by the given model, or None if it is not cached or caching is disabled."""
+    translation_cache = get_translation_cache()
+    if translation_cache is None:
+        return None
+    translation_memory = state.get('translation_memory')
+    try:
+        return translation_cache.get_chunk(
+            chunk_text, state.get('target_language'), model_name, PROMPT_VERSION, translation_memory,
+            PROMPT_LAYOUT, MEMORY_INJECTION, _chunk_glossary(translation_memory, chunk_text)
+        )
+    except Exception as e:
+        logger.warning(f"Translation cache lookup failed: {e}")
+        return None
+
+def _prepare_chunk_translation(state: AgentState) -> Tuple[dict | None, List[BaseMessage] | None]:
+    """
+    Does the part of translate_current_chunk_node that needs no LLM call.
+
+    Returns:
+        tuple: (the node's update, None) for an error or a translation cache hit, otherwise (None, the chunk request)
+    """
     idx = state.get('current_chunk_index', 0)
     retry_count = state.get('current_chunk_retry_count', 0)
     logger.info(f"Translating chunk {idx + 1} (Attempt {retry_count + 1})...")
     sub_chunks_list = state.get('sub_chunks_list')
     
     if not sub_chunks_list or idx >= len(sub_chunks_list):
-        return {"messages": [SystemMessage(content="Error: No more chunks or invalid index.")]}
+        return {"messages": [SystemMessage(content="Error: No more chunks or invalid index.")]}, None
     current_original_chunk_text = sub_chunks_list[idx]
     translation_memory, target_language = state.get('translation_memory'), state.get('target_language')
 
-    if not target_language: return {"messages": [SystemMessage(content="Error: Target language missing.")]}
-    if not translation_memory: return {"messages": [SystemMessage(content="Error: Translation memory missing.")]}
-    retry_note = ""
-    if retry_count > 0:
-        retry_note = "\n\nIMPORTANT: YOUR PREVIOUS ATTEMPT WAS REJECTED BECAUSE IT CONTAINED MARKDOWN CODE BLOCK DELIMITERS (```). PLEASE PROVIDE THE TRANSLATION AS PLAIN TEXT, STRICTLY FOLLOWING THE NUMBERED LINE FORMAT WITHOUT ANY CODE BLOCK WRAPPERS."
-    sys_prompt = CHUNK_TRANSLATION_SYSTEM_PROMPT.format(target_language=target_language) + retry_note
-    human_prompt = CHUNK_TRANSLATION_HUMAN_PROMPT.format(
-        translation_memory=translation_memory, 
-        target_language=target_language, 
-        numbered_subtitle_lines=current_original_chunk_text
-    )
-    ai_response = translation_llm.invoke([SystemMessage(content=sys_prompt), HumanMessage(content=human_prompt)])
-    logger.debug(f"Raw LLM output for chunk (first 200 chars): {ai_response.content[:200]}...")
+    if not target_language: return {"messages": [SystemMessage(content="Error: Target language missing.")]}, None
+    if not translation_memory: return {"messages": [SystemMessage(content="Error: Translation memory missing.")]}, None
+
+    # Serve the chunk from the translation cache on the first attempt if it was translated before
+    chunk_llm = _chunk_llm(state)
+    set_span_attributes(chunk_index=idx, attempt=retry_count + 1, model=chunk_llm.model_name)
+    if retry_count == 0:
+        cached_translation = _cached_chunk_translation(state, current_original_chunk_text, chunk_llm.model_name)
+        if cached_translation is not None:
+            logger.info(f"Chunk {idx + 1} served from translation cache.")
+            set_span_attributes(cache_hit=True)
+            return {
+                "current_chunk_original_text": current_original_chunk_text,
+                "current_chunk_translated_text": cached_translation,
+                "current_chunk_validation_status": "PENDING_VALIDATION",
+                "current_chunk_cache_hit": True
+            }, None
+
+    return None, _build_chunk_messages(current_original_chunk_text, translation_memory, target_language, retry_count)
+
+def _chunk_translation_update(state: AgentState, translated_text: str, usage: Dict[str, float]) -> dict:
+    """Returns the update of translate_current_chunk_node for a translation received from the LLM."""
+    idx = state.get('current_chunk_index', 0)
+    logger.debug(f"Raw LLM output for chunk (first 200 chars): {translated_text[:200]}...")
+    if usage.get("cached_input_tokens"):
+        logger.info(f"Chunk {idx + 1}: {usage['cached_input_tokens']}/{usage['input_tokens']} input tokens served from the provider prompt cache.")
     return {
-        "current_chunk_original_text": current_original_chunk_text, 
-        "current_chunk_translated_text": ai_response.content,
-        "current_chunk_validation_status": "PENDING_VALIDATION"
+        "current_chunk_original_text": state['sub_chunks_list'][idx], 
+        "current_chunk_translated_text": translated_text,
+        "current_chunk_validation_status": "PENDING_VALIDATION",
+        "current_chunk_cache_hit": False,
+        "current_chunk_usage": _add_usage(state.get('current_chunk_usage'), usage)
     }
 
+@traced()
+def translate_current_chunk_node(state: AgentState) -> dict:
+    """Translates the current chunk of subtitles using an LLM, incorporating translation memory and retry logic."""
+    update, messages = _prepare_chunk_translation(state)
+    if update is not None:
+        return update
+    idx, chunk_llm = state.get('current_chunk_index', 0), _chunk_llm(state)
+    if STREAM_TRANSLATION:
+        with span("llm_stream", node="translate_chunk", model=chunk_llm.model_name, chunk_index=idx):
+            started_at = time.monotonic()
+            translated_text, usage = _stream_chunk_translation(chunk_llm, messages, state['sub_chunks_list'][idx], idx, state.get('streamed_line_events'))
+            usage = dict(usage, latency_seconds=round(time.monotonic() - started_at, 3))
+            set_span_attributes(**usage)
+        _record_usage(state.get('usage_tracker'), "translate_chunk", chunk_llm, usage, idx)
+    else:
+        ai_response, usage = _invoke_llm(chunk_llm, messages, state.get('usage_tracker'), "translate_chunk", idx)
+        translated_text = ai_response.content
+    return _chunk_translation_update(state, translated_text, usage)
+
+@traced()
+async def atranslate_current_chunk_node(state: AgentState) -> dict:
+    """Async counterpart of translate_current_chunk_node."""
+    update, messages = _prepare_chunk_translation(state)
+    if update is not None:
+        return update
+    idx, chunk_llm = state.get('current_chunk_index', 0), _chunk_llm(state)
+    if STREAM_TRANSLATION:
+        with span("llm_stream", node="translate_chunk", model=chunk_llm.model_name, chunk_index=idx):
+            started_at = time.monotonic()
+            translated_text, usage = await _astream_chunk_translation(chunk_llm, messages, state['sub_chunks_list'][idx], idx,
+                                                                      state.get('streamed_line_events'))
+            usage = dict(usage, latency_seconds=round(time.monotonic() - started_at, 3))
+            set_span_attributes(**usage)
+        _record_usage(state.get('usage_tracker'), "translate_chunk", chunk_llm, usage, idx)
+    else:
+        ai_response, usage = await _ainvoke_llm(chunk_llm, messages, state.get('usage_tracker'), "translate_chunk", idx)
+        translated_text = ai_response.content
+    return _chunk_translation_update(state, translated_text, usage)
+
+def _store_chunk_in_cache(state: AgentState, translated_chunk_text: str) -> None:
+    """Stores a validated chunk translation in the translation cache, if caching is enabled."""
+    translation_cache = get_translation_cache()
+    original_chunk_text = state.get('current_chunk_original_text')
+    if translation_cache is None or not original_chunk_text:
+        return
+    try:
+        translation_cache.put_chunk(
+            original_chunk_text, translated_chunk_text, state.get('target_language'),
+            _chunk_llm(state).model_name, PROMPT_VERSION, state.get('translation_memory'), PROMPT_LAYOUT, MEMORY_INJECTION,
+            _chunk_glossary(state.get('translation_memory'), original_chunk_text)
+        )
+    except Exception as e:
+        # A broken cache must never fail the translation itself
+        logger.warning(f"Could not store chunk {state.get('current_chunk_index', 0) + 1} in translation cache: {e}")
+
+@traced()
 def validate_translation_format_node(state: AgentState) -> dict:
     """Validates the format of the translated chunk, checking for markdown code blocks."""
     chunk_idx = state.get('current_chunk_index', 0)
@@ -411,6 +1216,9 @@ def validate_translation_format_node(state: AgentState) -> dict:
         }
     else:
         logger.warning(f"Validation for Chunk {chunk_idx + 1}: FAILED (Markdown Block Detected) (Retry {retry_count + 1})")
+        if _llm_clients(state).cascade is not None and not state.get('current_chunk_escalated'):
+            # The retry budget is spent on the stronger model rather than on the one that just failed
+            return _escalate_chunk(state, "output failed validation")
         if retry_count >= MAX_TRANSLATION_RETRIES:
             logger.warning(f"Max retries ({MAX_TRANSLATION_RETRIES}) reached for chunk {chunk_idx + 1} due to markdown blocks.")
             return {"current_chunk_validation_status": "INVALID_MAX_RETRIES_REACHED"}
@@ -420,13 +1228,185 @@ def validate_translation_format_node(state: AgentState) -> dict:
                 "current_chunk_retry_count": retry_count + 1
             }
 
+def _split_numbered_chunk(chunk_text: str) -> Tuple[Dict[str, str], set]:
+    """
+    Parses 'N. text' lines of a chunk into an ordered {index: text} dict.
+
+    Also returns the indices whose output is suspect: numbers that appear more than once, and entries
+    followed by unnumbered continuation lines (a sign that lines were split or merged).
+    """
+    numbered_lines: Dict[str, str] = {}
+    suspect_indices = set()
+    last_index = None
+    for line in chunk_text.splitlines():
+        stripped_line = line.strip()
+        if not stripped_line: continue
+        match = NUMBERED_LINE_PATTERN.match(stripped_line)
+        if match:
+            index, text = match.group(1), match.group(2).strip()
+            if index in numbered_lines:
+                suspect_indices.add(index)
+            else:
+                numbered_lines[index] = text
+            last_index = index
+        elif last_index is not None:
+            suspect_indices.add(last_index)
+    return numbered_lines, suspect_indices
+
+def _find_lines_to_repair(original_lines: Dict[str, str], translated_text: str) -> Tuple[Dict[str, str], List[str]]:
+    """Returns the usable translated lines and the indices that are missing, duplicated, empty or malformed."""
+    translated_lines, suspect_indices = _split_numbered_chunk(translated_text)
+    lines_to_repair = [index for index in original_lines
+                       if index not in translated_lines or index in suspect_indices or not translated_lines[index]]
+    good_lines = {index: translated_lines[index] for index in original_lines
+                  if index in translated_lines and index not in lines_to_repair}
+    return good_lines, lines_to_repair
+
+def _line_repair_messages(original_lines: Dict[str, str], good_lines: Dict[str, str], lines_to_repair: List[str],
+                          target_language: str, translation_memory: str) -> List[BaseMessage]:
+    """Builds the request that translates only the given lines, sending their neighbours (and existing translations) as context."""
+    ordered_indices = list(original_lines)
+    positions = {index: position for position, index in enumerate(ordered_indices)}
+    context_indices = set()
+    for index in lines_to_repair:
+        position = positions[index]
+        for neighbour in ordered_indices[max(0, position - REPAIR_CONTEXT_LINES):position + REPAIR_CONTEXT_LINES + 1]:
+            if neighbour not in lines_to_repair:
+                context_indices.add(neighbour)
+    context_lines = "\n".join(
+        f"{index}. {original_lines[index]}\n    ({target_language}: {good_lines.get(index, '')})"
+        for index in ordered_indices if index in context_indices
+    ) or "(none)"
+    numbered_subtitle_lines = "\n".join(f"{index}. {original_lines[index]}" for index in lines_to_repair)
+    shared_memory, chunk_glossary = _memory_sections(translation_memory, context_lines + "\n" + numbered_subtitle_lines)
+
+    if PROMPT_LAYOUT == "prefix_cache":
+        # Reuse the chunk requests' stable prefix, so repairs hit the same provider prompt cache
+        human_prompt = LINE_REPAIR_TAIL_HUMAN_PROMPT.format(
+            chunk_glossary=chunk_glossary, context_lines=context_lines,
+            target_language=target_language, numbered_subtitle_lines=numbered_subtitle_lines
+        )
+        return [_stable_prefix_message(shared_memory, target_language), HumanMessage(content=human_prompt)]
+    else:
+        sys_prompt = LINE_REPAIR_SYSTEM_PROMPT.format(target_language=target_language)
+        human_prompt = LINE_REPAIR_HUMAN_PROMPT.format(
+            translation_memory=shared_memory + chunk_glossary,
+            context_lines=context_lines,
+            target_language=target_language,
+            numbered_subtitle_lines=numbered_subtitle_lines
+        )
+        return [SystemMessage(content=sys_prompt), HumanMessage(content=human_prompt)]
+
+def _request_line_repair(original_lines: Dict[str, str], good_lines: Dict[str, str], lines_to_repair: List[str],
+                         target_language: str, translation_memory: str, chunk_llm, usage_tracker: UsageTracker = None,
+                         chunk_index: int = None) -> Tuple[str, Dict[str, int]]:
+    """Asks the LLM to translate only the given lines, sending their neighbours (and existing translations) as context."""
+    ai_response, usage = _invoke_llm(chunk_llm, _line_repair_messages(original_lines, good_lines, lines_to_repair, target_language, translation_memory),
+                                     usage_tracker, "repair_translation", chunk_index)
+    return _clean_llm_output(ai_response.content), usage
+
+async def _arequest_line_repair(original_lines: Dict[str, str], good_lines: Dict[str, str], lines_to_repair: List[str],
+                                target_language: str, translation_memory: str, chunk_llm, usage_tracker: UsageTracker = None,
+                                chunk_index: int = None) -> Tuple[str, Dict[str, int]]:
+    """Async counterpart of _request_line_repair."""
+    ai_response, usage = await _ainvoke_llm(chunk_llm, _line_repair_messages(original_lines, good_lines, lines_to_repair, target_language, translation_memory),
+                                            usage_tracker, "repair_translation", chunk_index)
+    return _clean_llm_output(ai_response.content), usage
+
+def _start_repair(state: AgentState) -> Tuple[Dict[str, str], Dict[str, str], List[str]] | None:
+    """Returns the original lines, the usable translated lines and the lines to repair of a validated chunk, or None if there is nothing to repair."""
+    translated_text = state.get('current_chunk_translated_text')
+    original_text = state.get('current_chunk_original_text')
+    if state.get('current_chunk_validation_status') != "VALID" or not translated_text or not original_text:
+        return None
+    original_lines, _ = _split_numbered_chunk(original_text)
+    return (original_lines, *_find_lines_to_repair(original_lines, translated_text))
+
+def _log_repair_attempt(state: AgentState, lines_to_repair: List[str], attempt: int) -> None:
+    """Logs the lines a repair request is about to ask for."""
+    logger.warning(f"Chunk {state.get('current_chunk_index', 0) + 1}: {len(lines_to_repair)} missing or malformed lines "
+                   f"({', '.join(lines_to_repair[:10])}{'...' if len(lines_to_repair) > 10 else ''}). Requesting repair (attempt {attempt}/{MAX_REPAIR_ATTEMPTS})...")
+
+def _merge_repair_output(original_lines: Dict[str, str], good_lines: Dict[str, str], lines_to_repair: List[str],
+                         repair_output: str) -> List[str]:
+    """Adds the usable repaired lines to good_lines and returns the lines that are still missing."""
+    repaired_lines, lines_to_repair = _find_lines_to_repair(
+        {index: original_lines[index] for index in lines_to_repair}, repair_output
+    )
+    good_lines.update(repaired_lines)
+    return lines_to_repair
+
+@traced()
+def repair_translation_node(state: AgentState) -> dict:
+    """Re-requests only the missing, duplicated or malformed lines of a validated chunk and merges them back in order."""
+    repair = _start_repair(state)
+    if repair is None:
+        return {"current_chunk_repaired_lines": 0}
+    original_lines, good_lines, lines_to_repair = repair
+    repaired_line_count = 0
+    usage = state.get('current_chunk_usage')
+    attempt = 0
+    while lines_to_repair and attempt < MAX_REPAIR_ATTEMPTS:
+        attempt += 1
+        _log_repair_attempt(state, lines_to_repair, attempt)
+        repaired_line_count += len(lines_to_repair)
+        repair_output, repair_usage = _request_line_repair(original_lines, good_lines, lines_to_repair,
+                                             state.get('target_language'), state.get('translation_memory'), _chunk_llm(state),
+                                             state.get('usage_tracker'), state.get('current_chunk_index', 0))
+        lines_to_repair = _merge_repair_output(original_lines, good_lines, lines_to_repair, repair_output)
+        usage = _add_usage(usage, repair_usage)
+    return _finish_repair(state, original_lines, good_lines, lines_to_repair, repaired_line_count, usage)
+
+@traced()
+async def arepair_translation_node(state: AgentState) -> dict:
+    """Async counterpart of repair_translation_node."""
+    repair = _start_repair(state)
+    if repair is None:
+        return {"current_chunk_repaired_lines": 0}
+    original_lines, good_lines, lines_to_repair = repair
+    repaired_line_count = 0
+    usage = state.get('current_chunk_usage')
+    attempt = 0
+    while lines_to_repair and attempt < MAX_REPAIR_ATTEMPTS:
+        attempt += 1
+        _log_repair_attempt(state, lines_to_repair, attempt)
+        repaired_line_count += len(lines_to_repair)
+        repair_output, repair_usage = await _arequest_line_repair(original_lines, good_lines, lines_to_repair,
+                                                    state.get('target_language'), state.get('translation_memory'), _chunk_llm(state),
+                                                    state.get('usage_tracker'), state.get('current_chunk_index', 0))
+        lines_to_repair = _merge_repair_output(original_lines, good_lines, lines_to_repair, repair_output)
+        usage = _add_usage(usage, repair_usage)
+    return _finish_repair(state, original_lines, good_lines, lines_to_repair, repaired_line_count, usage)
+
+def _finish_repair(state: AgentState, original_lines: Dict[str, str], good_lines: Dict[str, str], lines_to_repair: List[str],
+                   repaired_line_count: int, usage: Dict[str, int] | None) -> dict:
+    """Escalates a cascade chunk that still misses lines, otherwise rebuilds the chunk from the repaired lines and caches it."""
+    chunk_idx = state.get('current_chunk_index', 0)
+    set_span_attributes(chunk_index=chunk_idx, repaired_lines=repaired_line_count, unrepaired_lines=len(lines_to_repair))
+    if lines_to_repair and _llm_clients(state).cascade is not None and not state.get('current_chunk_escalated'):
+        return dict(_escalate_chunk(state, f"{len(lines_to_repair)} lines still missing after repair"), current_chunk_usage=usage)
+    if lines_to_repair:
+        logger.warning(f"Chunk {chunk_idx + 1}: {len(lines_to_repair)} lines still missing after repair; original text will be used for them.")
+    elif repaired_line_count:
+        logger.info(f"Chunk {chunk_idx + 1}: repaired all missing or malformed lines.")
+
+    # Rebuild the chunk in original order, dropping stray lines that do not belong to it
+    repaired_chunk_text = "\n".join(f"{index}. {good_lines[index]}" for index in original_lines if index in good_lines)
+    if not lines_to_repair and not state.get('current_chunk_cache_hit'):
+        _store_chunk_in_cache(state, repaired_chunk_text)
+    return {
+        "current_chunk_translated_text": repaired_chunk_text,
+        "current_chunk_repaired_lines": repaired_line_count,
+        "current_chunk_usage": usage
+    }
+
 def decide_after_validation(state: AgentState) -> str:
     """Determines the next step based on the translation validation status of the current chunk."""
     status = state.get('current_chunk_validation_status')
     chunk_idx = state.get('current_chunk_index', 0)
     if status == "VALID":
         return "proceed_to_aggregate"
-    elif status == "INVALID_NEEDS_RETRY":
+    elif status in ("INVALID_NEEDS_RETRY", "ESCALATED"):
         return "retry_chunk_translation"
     elif status == "INVALID_MAX_RETRIES_REACHED":
         logger.warning(f"Chunk {chunk_idx + 1} translation failed after max retries (markdown block issue). Using original text as placeholder.")
@@ -435,8 +1415,41 @@ def decide_after_validation(state: AgentState) -> str:
         logger.error(f"Error: Unknown validation status '{status}' for chunk {chunk_idx + 1}. Ending process.")
         return END 
 
+def decide_after_repair(state: AgentState) -> str:
+    """Sends a chunk escalated by the repair pass back to translation, otherwise on to aggregation."""
+    if state.get('current_chunk_validation_status') == "ESCALATED":
+        return "retry_chunk_translation"
+    return "proceed_to_aggregate"
+
+def _positions_by_index(sub_list: SubtitleTrack | None, duplicate_index_map: Dict[str, str]) -> Dict[str, List[int]]:
+    """Maps every translated index to the track positions it fills: its own and those of its repeated lines."""
+    positions_by_index: Dict[str, List[int]] = {}
+    for position in range(len(sub_list or ())):
+        cue_index = sub_list.index_at(position)
+        positions_by_index.setdefault(duplicate_index_map.get(cue_index, cue_index), []).append(position)
+    return positions_by_index
+
+def _chunk_lines_by_position(chunk_text: str, chunk_idx: int, positions_by_index: Dict[str, List[int]]) -> List[Tuple[int, str]]:
+    """Parses the "N. text" lines of an aggregated chunk into (track position, text) pairs, one for every position of each index."""
+    chunk_lines = []
+    for line in chunk_text.splitlines():
+        stripped_line = line.strip()
+        if not stripped_line: continue
+        match = NUMBERED_LINE_PATTERN.match(stripped_line)
+        if match:
+            chunk_lines.extend((position, match.group(2)) for position in positions_by_index.get(match.group(1), ()))
+        elif not (stripped_line.startswith("[TRANSLATION FAILED") or stripped_line.startswith("[ERROR:")):
+            logger.warning(f"Warning: Chunk {chunk_idx + 1} - Could not parse line: '{line}'")
+    return chunk_lines
+
+def _merge_chunk_lines(translated_texts: List[str], chunk_lines: List[Tuple[int, str]]) -> None:
+    """Writes the parsed lines of a chunk into translated_texts."""
+    for position, text in chunk_lines:
+        translated_texts[position] = text
+
+@traced()
 def aggregate_translation_node(state: AgentState) -> dict:
-    """Aggregates the validated (or placeholder) translated text for the current chunk and updates the state."""
+    """Aggregates the validated (or placeholder) translated text for the current chunk."""
     chunk_idx = state.get('current_chunk_index', 0)
     logger.info(f"Aggregating translation for chunk {chunk_idx + 1}...")
     translated_chunks_list = state.get('translated_chunks_list', [])
@@ -462,66 +1475,211 @@ def aggregate_translation_node(state: AgentState) -> dict:
     return {
         "translated_chunks_list": translated_chunks_list,
         "current_chunk_index": new_index,
-        "current_chunk_retry_count": 0 
+        "current_chunk_retry_count": 0,
+        "current_chunk_escalated": False,
+        "current_chunk_usage": None
     }
 
-def should_translate_more_chunks(state: AgentState) -> str: 
-    """Checks if there are more subtitle chunks to translate.""" 
-    current_chunk_index = state.get('current_chunk_index', 0)
-    sub_chunks_list = state.get('sub_chunks_list')
-    if sub_chunks_list and current_chunk_index < len(sub_chunks_list):
-        logger.info(f"Translating chunk {current_chunk_index + 1}/{len(sub_chunks_list)}")
-        return "translate_next_chunk" 
-    else:
-        return "finish_translation" 
+def _translate_single_chunk(state: AgentState, chunk_index: int, precomputed_translation: str = None) -> Tuple[str, dict]:
+    """
+    Runs translate -> validate -> repair -> aggregate for one chunk on a private copy of the state.
+
+    A precomputed_translation (e.g. a batch job response from the cascade model, or the translation model without
+    a cascade) replaces the first LLM call; it is validated and repaired like any other response, and a rejected
+    one is retried (or escalated) online.
+
+    Returns:
+        tuple: (aggregated chunk text, report with 'escalated' (from the cascade model) and the token 'usage')
+    """
+    chunk_state = _new_chunk_state(state, chunk_index, precomputed_translation)
+    while True:
+        if chunk_state["current_chunk_validation_status"] != "PENDING_VALIDATION":
+            chunk_state.update(translate_current_chunk_node(chunk_state))
+        chunk_state.update(validate_translation_format_node(chunk_state))
+        if decide_after_validation(chunk_state) == "retry_chunk_translation":
+            continue
+        chunk_state.update(repair_translation_node(chunk_state))
+        if decide_after_repair(chunk_state) != "retry_chunk_translation":
+            break
+    return _finish_chunk(state, chunk_state)
+
+async def _atranslate_single_chunk(state: AgentState, chunk_index: int, precomputed_translation: str = None) -> Tuple[str, dict]:
+    """Async counterpart of _translate_single_chunk."""
+    chunk_state = _new_chunk_state(state, chunk_index, precomputed_translation)
+    while True:
+        if chunk_state["current_chunk_validation_status"] != "PENDING_VALIDATION":
+            chunk_state.update(await atranslate_current_chunk_node(chunk_state))
+        chunk_state.update(validate_translation_format_node(chunk_state))
+        if decide_after_validation(chunk_state) == "retry_chunk_translation":
+            continue
+        chunk_state.update(await arepair_translation_node(chunk_state))
+        if decide_after_repair(chunk_state) != "retry_chunk_translation":
+            break
+    return _finish_chunk(state, chunk_state)
+
+def _new_chunk_state(state: AgentState, chunk_index: int, precomputed_translation: str = None) -> dict:
+    """Returns the private copy of the state a single chunk is translated on."""
+    # Each chunk gets its own index, retry counter and validation status, so concurrent chunks never share retry state.
+    chunk_state = dict(state)
+    chunk_state.update({
+        "current_chunk_index": chunk_index,
+        "current_chunk_retry_count": 0,
+        "translated_chunks_list": [],
+        "current_chunk_original_text": None,
+        "current_chunk_translated_text": None,
+        "current_chunk_validation_status": None,
+        "current_chunk_cache_hit": None,
+        "current_chunk_repaired_lines": 0,
+        "current_chunk_escalated": False,
+        "current_chunk_usage": None
+    })
+    if precomputed_translation is not None:
+        chunk_state.update({
+            "current_chunk_original_text": state['sub_chunks_list'][chunk_index],
+            "current_chunk_translated_text": precomputed_translation,
+            "current_chunk_validation_status": "PENDING_VALIDATION",
+            "current_chunk_cache_hit": False
+        })
+    return chunk_state
+
+def _finish_chunk(state: AgentState, chunk_state: dict) -> Tuple[str, dict]:
+    """Aggregates a translated chunk and returns its text with the report of _translate_single_chunk."""
+    chunk_report = {
+        "escalated": bool(_llm_clients(state).cascade is not None and chunk_state.get("current_chunk_escalated")),
+        "usage": chunk_state.get("current_chunk_usage") or {}
+    }
+    chunk_state.update(aggregate_translation_node(chunk_state))
+    return chunk_state["translated_chunks_list"][-1], chunk_report
+
+def plan_chunk_translations_node(state: AgentState) -> dict:
+    """Starts the translated texts from the original ones and merges the chunks an earlier run of the job already finished."""
+    sub_list = state.get('sub_list')
+    total_chunks = len(state.get('sub_chunks_list') or [])
+    translated_texts = list(sub_list.texts) if sub_list is not None else []
+    positions_by_index = _positions_by_index(sub_list, state.get('duplicate_index_map') or {})
+    completed_chunks = {idx: text for idx, text in (state.get('completed_chunks') or {}).items() if idx < total_chunks}
+    for idx, translated_text in completed_chunks.items():
+        _merge_chunk_lines(translated_texts, _chunk_lines_by_position(translated_text, idx, positions_by_index))
+    logger.info(f"Translating {total_chunks - len(completed_chunks)} of {total_chunks} chunks "
+                f"({len(completed_chunks)} already translated by an earlier run).")
+    return {
+        "translated_texts": translated_texts, "positions_by_index": positions_by_index,
+        "completed_chunks": completed_chunks, "current_chunk_index": 0
+    }
+
+def fan_out_chunk_translations(state: AgentState):
+    """Sends every chunk that is not translated yet to its own translate_chunk branch; LangGraph runs the branches in parallel."""
+    completed_chunks = state.get('completed_chunks') or {}
+    pending_chunks = [idx for idx in range(len(state.get('sub_chunks_list') or [])) if idx not in completed_chunks]
+    if not pending_chunks:
+        return "collect_chunk_translations"
+    # Each branch gets its own index and retry state and reports its parsed lines through chunk_results
+    return [Send("translate_chunk", dict(state, current_chunk_index=idx)) for idx in pending_chunks]
+
+def translate_chunk_node(state: AgentState) -> dict:
+    """Fan-out branch: runs translate -> validate -> repair -> aggregate for the chunk at current_chunk_index."""
+    chunk_idx = state['current_chunk_index']
+    precomputed_translation = (state.get('precomputed_translations') or {}).get(chunk_idx)
+    with span("chunk", chunk_index=chunk_idx):
+        translated_text, chunk_report = _translate_single_chunk(state, chunk_idx, precomputed_translation)
+    return _chunk_result_update(state, chunk_idx, translated_text, chunk_report)
 
+async def atranslate_chunk_node(state: AgentState) -> dict:
+    """Async fan-out branch: the chunk's LLM calls are awaited on the event loop instead of blocking an executor thread."""
+    chunk_idx = state['current_chunk_index']
+    precomputed_translation = (state.get('precomputed_translations') or {}).get(chunk_idx)
+    chunk_slots = state.get('chunk_slots')
+    async with chunk_slots if chunk_slots is not None else contextlib.nullcontext():
+        with span("chunk", chunk_index=chunk_idx):
+            translated_text, chunk_report = await _atranslate_single_chunk(state, chunk_idx, precomputed_translation)
+    return _chunk_result_update(state, chunk_idx, translated_text, chunk_report)
+
+def _chunk_result_update(state: AgentState, chunk_idx: int, translated_text: str, chunk_report: dict) -> dict:
+    """
+    Returns a chunk branch's update: its text, report and lines parsed into track positions.
+
+    Only chunk_results (a reducer channel) is written, which concurrent branches may all update in the same step;
+    the lines are merged into translated_texts by collect_chunk_translations_node. The parsing is done here, so
+    it happens as each chunk completes rather than all at once at the end.
+    """
+    positions_by_index = state.get('positions_by_index')
+    if positions_by_index is None:
+        positions_by_index = _positions_by_index(state.get('sub_list'), state.get('duplicate_index_map') or {})
+    chunk_lines = _chunk_lines_by_position(translated_text, chunk_idx, positions_by_index)
+    return {"chunk_results": [dict(chunk_report, chunk_index=chunk_idx, translated_text=translated_text, chunk_lines=chunk_lines)]}
+
+@traced()
+def collect_chunk_translations_node(state: AgentState) -> dict:
+    """Fan-in after the chunk branches: merges their lines into the translated texts and summarises their cascade escalations and provider prompt cache use."""
+    chunk_results = state.get('chunk_results') or []
+    translated_texts = list(state.get('translated_texts') or (state['sub_list'].texts if state.get('sub_list') is not None else []))
+    for chunk_result in chunk_results:
+        _merge_chunk_lines(translated_texts, chunk_result["chunk_lines"])
+    result = {
+        "translated_texts": translated_texts,
+        "current_chunk_index": len(state.get('sub_chunks_list') or []),
+        "current_chunk_retry_count": 0,
+        "prompt_cache_stats": _summarize_prompt_cache({chunk_result["chunk_index"]: chunk_result["usage"] for chunk_result in chunk_results})
+    }
+    llm_clients = _llm_clients(state)
+    if llm_clients.cascade is not None:
+        translated_in_this_run = len(chunk_results)
+        escalated_chunks = sum(chunk_result["escalated"] for chunk_result in chunk_results)
+        result["cascade_stats"] = {
+            "cascade_model": llm_clients.cascade.model_name,
+            "escalation_model": llm_clients.translation.model_name,
+            "chunks": translated_in_this_run,
+            "escalated_chunks": escalated_chunks,
+            "escalation_rate": round(escalated_chunks / translated_in_this_run, 3) if translated_in_this_run else 0.0
+        }
+        logger.info(f"Cascade: {escalated_chunks}/{translated_in_this_run} chunks escalated to {llm_clients.translation.model_name}.")
+    return result
+
+def _summarize_prompt_cache(chunk_usages: Dict[int, Dict[str, int]]) -> Dict[str, object]:
+    """Summarises how many input tokens of the chunk requests were served from the provider prompt cache."""
+    input_tokens = sum(usage.get("input_tokens", 0) for usage in chunk_usages.values())
+    cached_input_tokens = sum(usage.get("cached_input_tokens", 0) for usage in chunk_usages.values())
+    prompt_cache_stats = {
+        "layout": PROMPT_LAYOUT,
+        "requests": sum(usage.get("requests", 0) for usage in chunk_usages.values()),
+        "input_tokens": input_tokens,
+        "cached_input_tokens": cached_input_tokens,
+        "hit_rate": round(cached_input_tokens / input_tokens, 3) if input_tokens else 0.0,
+        "per_chunk": {idx: {"input_tokens": usage.get("input_tokens", 0), "cached_input_tokens": usage.get("cached_input_tokens", 0)}
+                      for idx, usage in sorted(chunk_usages.items())}
+    }
+    if input_tokens:
+        logger.info(f"Provider prompt cache: {cached_input_tokens}/{input_tokens} chunk input tokens cached ({prompt_cache_stats['hit_rate']:.0%}).")
+    return prompt_cache_stats
+
+def _translated_srt_path(state: AgentState, partial: bool = False) -> str:
+    """Returns the path of the translated SRT file (or of its partially written preview) next to the original one."""
+    base, ext = os.path.splitext(state.get('original_srt_path'))
+    target_lang_code = state.get('target_language', 'translated') 
+    return f"{base}_{target_lang_code}{'.partial' if partial else ''}{ext}"
+
+@traced()
 def finalize_translation_node(state: AgentState) -> dict:
-    """Parses aggregated translated text, reconstructs the subtitle list, and saves the final translated SRT file."""
+    """Builds the translated subtitle list from the merged chunk translations and streams it into the final SRT file."""
     logger.info("Finalizing translation...")
-    translated_chunks_list = state.get('translated_chunks_list')
+    translated_texts = state.get('translated_texts')
     sub_list = state.get('sub_list') 
-    original_srt_path = state.get('original_srt_path')
     
     if not sub_list: 
         logger.warning("No original subtitles to finalize.")
         return {"messages": [SystemMessage(content="No subtitles to finalize.")]}
-    if not translated_chunks_list : 
+    if translated_texts is None: 
          logger.warning("No translated chunks to finalize. Using original subtitles.")
+         translated_texts = list(sub_list.texts)
     
-    full_text_to_parse = "\n".join(translated_chunks_list)
-    
-    translated_lines_map: Dict[str, str] = {} 
-    # Since input to LLM is now guaranteed single-line per numbered entry,
-    # and we expect LLM to output single-line per numbered entry,
-    # this simple parsing in finalize might work better.
-    # Warnings will still occur if LLM fails to provide "number. text" for any line.
-    for line in full_text_to_parse.splitlines():
-        stripped_line = line.strip()
-        if not stripped_line: continue
-        
-        match = re.match(r"(\d+)\.\s*(.*)", stripped_line) 
-        if match:
-            original_index = match.group(1)
-            translated_text = match.group(2) 
-            translated_lines_map[original_index] = translated_text
-        elif not (stripped_line.startswith("[TRANSLATION FAILED") or stripped_line.startswith("[ERROR:")):
-            logger.warning(f"Warning: Finalize - Could not parse line: '{line}'")
-
-    translated_sub_list_output: List[Dict[str, str]] = []
-    for original_item in sub_list: # original_item['text'] is now single-line
-        original_idx = original_item['index']
-        translated_text_for_item = translated_lines_map.get(original_idx, original_item['text']) 
-        
-        translated_sub_list_output.append({
-            'index': original_idx, 'start_time': original_item['start_time'],
-            'end_time': original_item['end_time'], 'text': translated_text_for_item
-        })
-        
-    final_srt_content = _list_to_srt_str(translated_sub_list_output)
-    base, ext = os.path.splitext(original_srt_path)
-    target_lang_code = state.get('target_language', 'translated') 
-    final_srt_path = f"{base}_{target_lang_code}{ext}"
-    with open(final_srt_path, 'w', encoding='utf-8') as f: f.write(final_srt_content)
+    # Chunks were parsed and merged as they were aggregated; the translated track shares the cue numbers and timing of the original one
+    translated_sub_list_output = sub_list.with_texts(translated_texts)
+    final_srt_path = _translated_srt_path(state)
+    with span("write_srt", path=final_srt_path, entries=len(translated_sub_list_output)):
+        write_srt(final_srt_path, translated_sub_list_output)
+    # The partially written preview from streaming mode is superseded by the final file
+    partial_srt_path = _translated_srt_path(state, partial=True)
+    if os.path.exists(partial_srt_path): os.remove(partial_srt_path)
     logger.info(f"Successfully parsed SRT. Number of entries: {len(sub_list)}")
     logger.info(f"Translated SRT saved to: {final_srt_path}")
     return {
@@ -530,6 +1688,76 @@ def finalize_translation_node(state: AgentState) -> dict:
     }
 
 # Graph definition
+def _add_extraction_steps(graph: StateGraph, after_preparation: str, asynchronous: bool = False) -> None:
+    """Adds the subtitle download (direct or through the extraction LLM) and chunking, continuing with after_preparation."""
+    graph.add_node('direct_extraction', adirect_extraction_node if asynchronous else direct_extraction_node)
+    graph.add_node('getsub', aget_sub_node if asynchronous else get_sub_node)
+    graph.add_node('extraction_tools', ToolNode(tools=extraction_tools))
+    graph.add_node('prepare_translation', prepare_translation_node)
+
+    graph.add_conditional_edges(
+        'direct_extraction',
+        should_continue_extraction,
+        {
+            "start_translation": 'prepare_translation',
+            "end_process": END
+        }
+    )
+    # Edges for subtitle processing flow
+    graph.add_conditional_edges(
+        'getsub', 
+        should_continue_extraction,
+        {
+            "continue_extraction": 'extraction_tools', 
+            "start_translation": 'prepare_translation', 
+            "end_process": END
+        }
+    )
+    graph.add_edge('extraction_tools', 'getsub') # Loop back to get_sub_node to process tool output
+    graph.add_edge('prepare_translation', after_preparation)
+
+def _add_translation_steps(graph: StateGraph, asynchronous: bool = False) -> None:
+    """Adds the target-language steps: translation memory, one parallel branch per chunk (Send fan-out), fan-in and the final SRT."""
+    graph.add_node('generate_translation_context', agenerate_translation_context_node if asynchronous else generate_translation_context_node)
+    graph.add_node('plan_chunk_translations', plan_chunk_translations_node)
+    graph.add_node('translate_chunk', atranslate_chunk_node if asynchronous else translate_chunk_node)
+    graph.add_node('collect_chunk_translations', collect_chunk_translations_node)
+    graph.add_node('finalize_translation', finalize_translation_node)
+
+    graph.add_edge('generate_translation_context', 'plan_chunk_translations')
+    graph.add_conditional_edges('plan_chunk_translations', fan_out_chunk_translations,
+                                ['translate_chunk', 'collect_chunk_translations'])
+    graph.add_edge('translate_chunk', 'collect_chunk_translations')
+    graph.add_edge('collect_chunk_translations', 'finalize_translation')
+    graph.add_edge('finalize_translation', END)
+
+def _build_job_graph(fetch_subtitles: bool = True, translate: bool = True, asynchronous: bool = False) -> StateGraph:
+    """
+    Builds a non-interactive graph for the API: the source language check, download and chunking, the translation
+    of prepared subtitles, or both.
+
+    With asynchronous, the nodes that wait on the network are coroutines (LLM calls are awaited and YouTube
+    downloads run on the shared fetch executor); the CPU and file steps stay synchronous.
+    """
+    job_graph = StateGraph(AgentState)
+    if fetch_subtitles:
+        job_graph.add_node('select_source_language', aselect_source_language_node if asynchronous else select_source_language_node)
+        job_graph.add_edge(START, 'select_source_language')
+        job_graph.add_conditional_edges(
+            'select_source_language',
+            decide_extraction_mode,
+            {
+                "direct_extraction": 'direct_extraction',
+                "llm_extraction": 'getsub'
+            }
+        )
+        _add_extraction_steps(job_graph, 'generate_translation_context' if translate else END, asynchronous)
+    else:
+        job_graph.add_edge(START, 'generate_translation_context')
+    if translate:
+        _add_translation_steps(job_graph, asynchronous)
+    return job_graph
+
 graph = StateGraph(AgentState)
 
 # Add new nodes for the refined input flow
@@ -537,17 +1765,6 @@ graph.add_node('get_video_link', get_video_link_node)
 graph.add_node('display_available_languages', display_available_languages_node)
 graph.add_node('get_language_choices', get_language_choices_node)
 
-graph.add_node('getsub', get_sub_node)
-extraction_tool_node = ToolNode(tools=extraction_tools)
-graph.add_node('extraction_tools', extraction_tool_node)
-
-graph.add_node('prepare_translation', prepare_translation_node)
-graph.add_node('generate_translation_context', generate_translation_context_node)
-graph.add_node('translate_current_chunk', translate_current_chunk_node)
-graph.add_node('validate_translation_format', validate_translation_format_node) 
-graph.add_node('aggregate_translation', aggregate_translation_node)
-graph.add_node('finalize_translation', finalize_translation_node)
-
 # Define edges for the new flow
 graph.add_edge(START, 'get_video_link')
 graph.add_edge('get_video_link', 'display_available_languages')
@@ -559,54 +1776,31 @@ graph.add_conditional_edges(
         END: END
     }
 )
-graph.add_edge('get_language_choices', 'getsub')
-
-# Edges for subtitle processing flow
 graph.add_conditional_edges(
-    'getsub', 
-    should_continue_extraction,
+    'get_language_choices',
+    decide_extraction_mode,
     {
-        "continue_extraction": 'extraction_tools', 
-        "start_translation": 'prepare_translation', 
-        "end_process": END
+        "direct_extraction": 'direct_extraction',
+        "llm_extraction": 'getsub'
     }
 )
-graph.add_edge('extraction_tools', 'getsub') # Loop back to get_sub_node to process tool output
-graph.add_edge('prepare_translation', 'generate_translation_context')
-graph.add_conditional_edges(
-    'generate_translation_context', 
-    should_translate_more_chunks, 
-    {
-        "translate_next_chunk": 'translate_current_chunk',
-        "finish_translation": 'finalize_translation' 
-    }
-)
-graph.add_edge('translate_current_chunk', 'validate_translation_format')
-graph.add_conditional_edges(
-    'validate_translation_format',
-    decide_after_validation,
-    {
-        "retry_chunk_translation": 'translate_current_chunk', 
-        "proceed_to_aggregate": 'aggregate_translation',
-        "proceed_to_aggregate_with_placeholder": 'aggregate_translation'
-    }
-)
-graph.add_conditional_edges(
-    'aggregate_translation',
-    should_translate_more_chunks, 
-    {
-        "translate_next_chunk": 'translate_current_chunk', 
-        "finish_translation": 'finalize_translation'      
-    }
-)
-graph.add_edge('finalize_translation', END)
+_add_extraction_steps(graph, 'generate_translation_context')
+_add_translation_steps(graph)
 
 app = graph.compile()
 
+# Non-interactive graphs driven by the API: a whole job, the target-language independent preparation shared by
+# multi-language jobs, and the translation of prepared subtitles (resumed, multi-language and batch jobs)
+job_app = _build_job_graph().compile()
+preparation_app = _build_job_graph(translate=False).compile()
+translation_app = _build_job_graph(fetch_subtitles=False).compile()
+# The whole job with coroutine nodes, driven by atranslate_video_api on the caller's event loop
+async_job_app = _build_job_graph(asynchronous=True).compile()
+
 # Main execution block to run the agent.
 if __name__ == '__main__':
-    config = {"recursion_limit": 250} 
-    initial_state = {} 
+    config = {"recursion_limit": 250, "max_concurrency": MAX_CONCURRENT_CHUNKS} 
+    initial_state = {"llm_clients": create_llm_clients()}
     for event in app.stream(initial_state, config=config):
         for k, v in event.items():
             if k != "__end__":
@@ -627,11 +1821,360 @@ if __name__ == '__main__':
                 logger.info("---")
         logger.info("##################################################")
 
+def _job_initial_state(video_url: str, source_language_code: str, extraction_mode: str, llm_clients: LLMClients,
+                       usage_tracker: UsageTracker = None) -> dict:
+    """Returns the input state of a job graph for one video."""
+    return {
+        "video_link": video_url,
+        "chosen_language_code": source_language_code,
+        "extraction_mode": extraction_mode,
+        "llm_clients": llm_clients,
+        "current_chunk_index": 0,
+        "current_chunk_retry_count": 0,
+        "translated_chunks_list": [],
+        "translated_sub_list": None,
+        "usage_tracker": usage_tracker,
+        "chunk_results": [],
+        "messages": []
+    }
+
+# Progress reported when a job graph node finishes, announcing the step that follows it: (step, progress, message)
+JOB_GRAPH_PROGRESS = {
+    "select_source_language": ("download", 30, "Downloading original subtitle file..."),
+    "extraction_tools": ("extract_continue", 35, "Processing subtitle download..."),
+    "prepare_translation": ("context", 45, "Generating translation context..."),
+    "collect_chunk_translations": ("finalize", 90, "Consolidating translation results...")
+}
+
+async def _astream_job_graph(graph_app, state: dict, progress_callback=None, max_concurrent_chunks: int = None,
+                             job_id: str = None, asynchronous: bool = False) -> dict:
+    """
+    Drives a job graph with astream and returns its final state.
+
+    Progress, checkpoints and the streamed partial SRT are handled here, on the thread running the event loop, as
+    each node or chunk branch finishes, since UI callbacks (e.g. Streamlit) are not thread-safe. Chunk branches run
+    with up to max_concurrent_chunks at once.
+    """
+    max_concurrency = max(1, max_concurrent_chunks or MAX_CONCURRENT_CHUNKS)
+    # LangGraph's max_concurrency gate is not used: a branch cancelled while queued there (the job was cancelled or
+    # another branch failed) is dropped without its node coroutine ever being awaited. Async branches wait for a slot
+    # inside atranslate_chunk_node instead, synchronous ones for a thread of the executor _run_job_graph sized for them
+    chunk_slots = asyncio.Semaphore(max_concurrency) if asynchronous else None
+    # In streaming mode, chunk branches put their lines on a queue, written to a partial SRT file from this thread
+    line_events = queue.Queue() if STREAM_TRANSLATION else None
+    current_state = dict(state, streamed_line_events=line_events, chunk_slots=chunk_slots)
+    written_indices = set()
+    completed = len(state.get('completed_chunks') or {})
+    progress_percent = 50
+
+    def report(step: str, progress: int, message: str) -> None:
+        if progress_callback:
+            progress_callback(step, progress, message)
+
+    def drain_line_events():
+        """Writes streamed lines to the partial SRT and reports them, skipping lines already written by an earlier attempt."""
+        new_entries = []
+        sub_list, positions_by_index = current_state.get('sub_list'), current_state.get('positions_by_index') or {}
+        while line_events is not None and not line_events.empty():
+            chunk_idx, line_index, text = line_events.get_nowait()
+            if line_index in written_indices:
+                continue
+            written_indices.add(line_index)
+            new_entries.extend(format_srt_block(sub_list.numbers[position], sub_list.start_ms[position], sub_list.end_ms[position], text)
+                               for position in positions_by_index.get(line_index, []))
+            report("translate_line", progress_percent, f"Chunk {chunk_idx + 1}, line {line_index}: {text}")
+        if new_entries:
+            partial_srt_path = _translated_srt_path(current_state, partial=True)
+            with span("write_partial_srt", path=partial_srt_path, entries=len(new_entries)):
+                with open(partial_srt_path, 'a', encoding='utf-8') as f: f.write("\n".join(new_entries) + "\n")
+
+    async def drain_line_events_periodically():
+        while True:
+            await asyncio.sleep(0.1)
+            drain_line_events()
+
+    drain_task = asyncio.create_task(drain_line_events_periodically()) if line_events is not None else None
+    try:
+        finished_nodes = set()
+        async for mode, payload in graph_app.astream(current_state, stream_mode=["updates", "values"]):
+            if mode == "values":
+                # The full state after a step; save it once the subtitles are chunked and once the translation memory exists
+                current_state = payload
+                if job_id and finished_nodes & {"prepare_translation", "generate_translation_context"}:
+                    _update_checkpoint(job_id, lambda store: store.save_state(job_id, _persisted_state(current_state)))
+                finished_nodes = set()
+                continue
+            for node, update in payload.items():
+                update = update or {}
+                if update or node != "generate_translation_context":
+                    finished_nodes.add(node)
+                if node in JOB_GRAPH_PROGRESS:
+                    report(*JOB_GRAPH_PROGRESS[node])
+                elif node in ("direct_extraction", "getsub") and update.get("original_srt_path"):
+                    report("prepare", 40, "Preparing translation data...")
+                elif node == "generate_translation_context":
+                    report("translate", 50, f"Translating {len(current_state.get('sub_chunks_list') or [])} subtitle chunks...")
+                elif node == "plan_chunk_translations" and line_events is not None:
+                    open(_translated_srt_path(current_state, partial=True), 'w', encoding='utf-8').close()
+                elif node == "translate_chunk":
+                    total_chunks = len(current_state.get('sub_chunks_list') or [])
+                    for chunk_result in update["chunk_results"]:
+                        idx = chunk_result["chunk_index"]
+                        drain_line_events()
+                        if job_id:
+                            _update_checkpoint(job_id, lambda store: store.save_chunk(job_id, idx, chunk_result["translated_text"]))
+                        completed += 1
+                        logger.info(f"Chunk {idx + 1} done ({completed}/{total_chunks})")
+                        progress_percent = 50 + int((completed / total_chunks) * 40)
+                        report("translate", progress_percent, f"Translated subtitle chunk {idx + 1} ({completed}/{total_chunks} done)...")
+    finally:
+        if drain_task is not None:
+            drain_task.cancel()
+    return current_state
+
+def _run_job_graph(graph_app, state: dict, progress_callback=None, max_concurrent_chunks: int = None, job_id: str = None) -> dict:
+    """
+    Runs a job graph to completion on a private event loop whose executor has a thread for every concurrent chunk branch.
+
+    If the calling thread already runs an event loop (e.g. Jupyter or an async server calling the synchronous API),
+    the private loop runs on a worker thread instead, since asyncio.run cannot be nested; progress is then reported
+    from that thread.
+    """
+    max_workers = max(1, max_concurrent_chunks or MAX_CONCURRENT_CHUNKS)
+
+    async def run():
+        # LangGraph runs the synchronous nodes on the loop's default executor
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chunk"))
+        return await _astream_job_graph(graph_app, state, progress_callback, max_concurrent_chunks, job_id)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(run())
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="job") as executor:
+        return submit_in_context(executor, lambda: asyncio.run(run())).result()
+
+def _fetch_and_prepare_subtitles(video_url: str, source_language_code: str, extraction_mode: str,
+                                 llm_clients: LLMClients, progress_callback=None, usage_tracker: UsageTracker = None) -> dict:
+    """Validates the source language, downloads the original subtitles and splits them into chunks (target-language independent)."""
+    if progress_callback:
+        progress_callback("extract", 25, "Extracting video subtitles...")
+    initial_state = _job_initial_state(video_url, source_language_code, extraction_mode, llm_clients, usage_tracker)
+    prepared_state = _run_job_graph(preparation_app, initial_state, progress_callback)
+    if not prepared_state.get('original_srt_path'):
+        raise ValueError("Failed to extract subtitles")
+    return prepared_state
+
+def _translate_prepared_subtitles(prepared_state: dict, target_language: str, max_concurrent_chunks: int = None,
+                                  refresh_translation_memory: bool = False, progress_callback=None, job_id: str = None,
+                                  completed_chunks: Dict[int, str] = None, usage_tracker: UsageTracker = None,
+                                  precomputed_translations: Dict[int, str] = None, llm_clients: LLMClients = None) -> dict:
+    """Runs the translation graph on prepared subtitles: translation memory for one target language, chunk fan-out and the final SRT."""
+    current_state = dict(prepared_state, target_language=target_language, refresh_translation_memory=refresh_translation_memory,
+                         completed_chunks=completed_chunks or {}, precomputed_translations=precomputed_translations or {},
+                         chunk_results=[])
+    if usage_tracker is not None:
+        current_state["usage_tracker"] = usage_tracker
+    if llm_clients is not None:
+        current_state["llm_clients"] = llm_clients
+    if progress_callback and not current_state.get('translation_memory'):
+        progress_callback("context", 45, "Generating translation context...")
+    return _run_job_graph(translation_app, current_state, progress_callback, max_concurrent_chunks, job_id)
+
+def _persisted_state(state: dict) -> dict:
+    """Returns the JSON serializable part of the state needed to continue a job in another process."""
+    persisted_state = {key: state.get(key) for key in PERSISTED_STATE_KEYS if state.get(key) is not None}
+    for key in ("sub_list", "sub_chunks_list"):
+        if hasattr(persisted_state.get(key), "to_json"):
+            persisted_state[key] = persisted_state[key].to_json()
+    return persisted_state
+
+def _restore_persisted_state(persisted_state: dict) -> dict:
+    """Rebuilds the subtitle track and its chunks of a state saved with _persisted_state."""
+    state = dict(persisted_state)
+    state["sub_list"] = SubtitleTrack.from_json(state.get("sub_list"))
+    state["sub_chunks_list"] = SubtitleChunks.from_json(state.get("sub_chunks_list"), state["sub_list"])
+    return state
+
+def _update_checkpoint(job_id: str, update) -> None:
+    """Applies an update to the checkpoint store, if checkpoints are enabled."""
+    checkpoint_store = get_checkpoint_store()
+    if checkpoint_store is None:
+        return
+    try:
+        with span("checkpoint", job_id=job_id):
+            update(checkpoint_store)
+    except Exception as e:
+        # A broken checkpoint store must never fail the translation itself
+        logger.warning(f"Could not update checkpoint of job {job_id}: {e}")
+
+def _summarize_usage(usage_tracker: UsageTracker, label: str) -> Dict[str, object]:
+    """Returns the usage summary of a job and logs its totals."""
+    usage_summary = usage_tracker.summary()
+    total = usage_summary["total"]
+    cost = f"${total['cost_usd']:.4f}" if total["cost_usd"] is not None else "unknown cost"
+    logger.info(f"{label} usage: {total['requests']} LLM calls, {total['input_tokens']} input tokens ({total['cached_input_tokens']} cached), "
+                f"{total['output_tokens']} output tokens, {cost}, {usage_summary['wall_seconds']:.1f}s wall time.")
+    return usage_summary
+
+def _log_job_run(job_id: str | None, params: dict, result: dict, usage_summary: Dict[str, object]) -> None:
+    """Appends a finished or failed job to the run log, with the settings that shaped its cost and duration."""
+    append_run_log({
+        "job_id": job_id,
+        "success": result.get("success"),
+        "error": result.get("error"),
+        "params": params,
+        "settings": {
+            "chunk_token_budget": CHUNK_TOKEN_BUDGET, "chunk_size": CHUNK_SIZE,
+            "max_concurrent_chunks": params.get("max_concurrent_chunks") or MAX_CONCURRENT_CHUNKS,
+            "prompt_layout": PROMPT_LAYOUT, "stream_translation": STREAM_TRANSLATION
+        },
+        "total_chunks": result.get("total_chunks"),
+        "chunk_stats": result.get("chunk_stats"),
+        "usage": usage_summary
+    })
+
+def _run_translation_job(job_id: str, params: dict, saved_state: dict = None, completed_chunks: Dict[int, str] = None,
+                         progress_callback=None, llm_clients: LLMClients = None) -> dict:
+    """Runs (or continues) a checkpointed single-language translation job and returns the API result."""
+    usage_tracker = UsageTracker()
+    with start_trace("translation_job", job_id=job_id, video_url=params.get("video_url"),
+                     target_language=params.get("target_language"), resumed=saved_state is not None) as trace:
+        result = _execute_translation_job(job_id, params, saved_state, completed_chunks, progress_callback, usage_tracker, llm_clients)
+    result["trace_path"] = export_trace(trace, job_id)
+    result["usage"] = _summarize_usage(usage_tracker, f"Job {job_id}")
+    _log_job_run(job_id, params, result, result["usage"])
+    return result
+
+async def _arun_translation_job(job_id: str, params: dict, progress_callback=None, llm_clients: LLMClients = None) -> dict:
+    """Async counterpart of _run_translation_job for a new job; a cancelled job is still traced and logged before the cancellation propagates."""
+    usage_tracker = UsageTracker()
+    result = {"success": False, "job_id": job_id, "error": "Translation cancelled"}
+    try:
+        with start_trace("translation_job", job_id=job_id, video_url=params.get("video_url"),
+                         target_language=params.get("target_language"), resumed=False) as trace:
+            result = await _aexecute_translation_job(job_id, params, progress_callback, usage_tracker, llm_clients)
+    finally:
+        result["trace_path"] = export_trace(trace, job_id)
+        result["usage"] = _summarize_usage(usage_tracker, f"Job {job_id}")
+        _log_job_run(job_id, params, result, result["usage"])
+    return result
+
+def _start_translation_job(params: dict, progress_callback, llm_clients: LLMClients = None) -> Tuple[LLMClients, str]:
+    """Returns the job's models (llm_clients if given) and extraction mode, prioritizing its parameters over environment variables."""
+    extraction_model_name = params.get("extraction_model") or EXTRACTION_MODEL_NAME
+    translation_model_name = params.get("translation_model") or TRANSLATION_MODEL_NAME
+    cascade_model_name = CASCADE_MODEL_NAME if params.get("cascade_model") is None else params["cascade_model"]
+    extraction_mode = (params.get("extraction_mode") or EXTRACTION_MODE).strip().lower()
+    
+    # Take the job's models from the shared client registry; they are passed to the nodes in the state
+    if llm_clients is None:
+        llm_clients = create_llm_clients(translation_model_name, cascade_model_name, extraction_model_name, extraction_mode)
+    else:
+        translation_model_name = _model_name(llm_clients.translation)
+    
+    if progress_callback:
+        progress_callback("init", 15, f"Initializing translation workflow with models: {extraction_model_name} & {translation_model_name}...")
+    return llm_clients, extraction_mode
+
+def _new_job_state(params: dict, extraction_mode: str, llm_clients: LLMClients, usage_tracker: UsageTracker, progress_callback) -> dict:
+    """Returns the input state of a new job, which runs on the job graph from the source language check to the final SRT."""
+    if progress_callback:
+        progress_callback("extract", 25, "Extracting video subtitles...")
+    return dict(_job_initial_state(params["video_url"], params["source_language_code"], extraction_mode, llm_clients, usage_tracker),
+                target_language=params["target_language"],
+                refresh_translation_memory=params.get("refresh_translation_memory", False))
+
+def _track_dicts(track: SubtitleTrack | None) -> List[Dict[str, str]] | None:
+    """Returns a track in the list-of-dicts form of the API results ('index', 'start_time', 'end_time', 'text')."""
+    return track.to_dicts() if track is not None else None
+
+def _finish_translation_job(job_id: str, current_state: dict, progress_callback) -> dict:
+    """Marks a job whose graph ran to the end as completed and returns its API result."""
+    _update_checkpoint(job_id, lambda store: store.set_status(job_id, "completed"))
+    
+    if progress_callback:
+        progress_callback("complete", 100, "Translation completed!")
+    
+    # Return results
+    return {
+        "success": True,
+        "job_id": job_id,
+        "final_srt_path": current_state.get("final_srt_path"),
+        "original_srt_path": current_state.get("original_srt_path"),
+        "sub_list": _track_dicts(current_state.get("sub_list")),
+        "translated_sub_list": _track_dicts(current_state.get("translated_sub_list")),
+        "total_chunks": len(current_state.get('sub_chunks_list', [])),
+        "chunk_stats": current_state.get("chunk_stats"),
+        "dedup_stats": current_state.get("dedup_stats"),
+        "cascade_stats": current_state.get("cascade_stats"),
+        "prompt_cache_stats": current_state.get("prompt_cache_stats"),
+        "rate_limits": get_rate_limit_utilisation()
+    }
+
+def _failed_translation_job(job_id: str, error: Exception, progress_callback) -> dict:
+    """Marks a job as failed (resume_translation_job can continue it) and returns its API result."""
+    logger.error(f"Translation API error: {error}", exc_info=error)
+    _update_checkpoint(job_id, lambda store: store.set_status(job_id, "failed", str(error)))
+    if progress_callback:
+        progress_callback("error", 0, f"Translation failed: {str(error)}")
+    return {
+        "success": False,
+        "job_id": job_id,
+        "error": str(error)
+    }
+
+def _execute_translation_job(job_id: str, params: dict, saved_state: dict, completed_chunks: Dict[int, str] | None,
+                             progress_callback, usage_tracker: UsageTracker, llm_clients: LLMClients = None) -> dict:
+    """Does the work of _run_translation_job, recording every LLM call with usage_tracker."""
+    try:
+        llm_clients, extraction_mode = _start_translation_job(params, progress_callback, llm_clients)
+        if saved_state and saved_state.get('sub_chunks_list'):
+            # Resume: the subtitles were already downloaded and chunked by the interrupted run
+            prepared_state = dict(_restore_persisted_state(saved_state), usage_tracker=usage_tracker)
+            if progress_callback:
+                progress_callback("resume", 40, f"Resuming job {job_id}: {len(completed_chunks or {})}/{len(prepared_state['sub_chunks_list'])} chunks already translated...")
+            current_state = _translate_prepared_subtitles(prepared_state, params["target_language"], params.get("max_concurrent_chunks"),
+                                                          params.get("refresh_translation_memory", False), progress_callback,
+                                                          job_id, completed_chunks, llm_clients=llm_clients)
+        else:
+            initial_state = _new_job_state(params, extraction_mode, llm_clients, usage_tracker, progress_callback)
+            current_state = _run_job_graph(job_app, initial_state, progress_callback, params.get("max_concurrent_chunks"), job_id)
+            if not current_state.get('original_srt_path'):
+                raise ValueError("Failed to extract subtitles")
+        return _finish_translation_job(job_id, current_state, progress_callback)
+    except Exception as e:
+        return _failed_translation_job(job_id, e, progress_callback)
+
+async def _aexecute_translation_job(job_id: str, params: dict, progress_callback, usage_tracker: UsageTracker,
+                                    llm_clients: LLMClients = None) -> dict:
+    """Does the work of _arun_translation_job on async_job_app, awaited on the caller's event loop."""
+    try:
+        llm_clients, extraction_mode = _start_translation_job(params, progress_callback, llm_clients)
+        initial_state = _new_job_state(params, extraction_mode, llm_clients, usage_tracker, progress_callback)
+        current_state = await _astream_job_graph(async_job_app, initial_state, progress_callback, params.get("max_concurrent_chunks"), job_id,
+                                                 asynchronous=True)
+        if not current_state.get('original_srt_path'):
+            raise ValueError("Failed to extract subtitles")
+        return _finish_translation_job(job_id, current_state, progress_callback)
+    except asyncio.CancelledError:
+        # Chunks finished before the cancellation are checkpointed, so resume_translation_job continues from there
+        logger.warning(f"Job {job_id} was cancelled.")
+        _update_checkpoint(job_id, lambda store: store.set_status(job_id, "cancelled"))
+        if progress_callback:
+            progress_callback("cancelled", 0, "Translation cancelled.")
+        raise
+    except Exception as e:
+        return _failed_translation_job(job_id, e, progress_callback)
+
 def translate_video_api(video_url: str, source_language_code: str, target_language: str, 
-                       extraction_model: str = None, translation_model: str = None, progress_callback=None):
+                       extraction_model: str = None, translation_model: str = None, progress_callback=None,
+                       max_concurrent_chunks: int = None, refresh_translation_memory: bool = False,
+                       extraction_mode: str = None, job_id: str = None, cascade_model: str = None,
+                       llm_clients: LLMClients = None):
     """
     API function for Streamlit to call the translation workflow.
-    
+
     Args:
         video_url: YouTube video URL
         source_language_code: Source language code (e.g., 'en')
@@ -639,144 +2182,279 @@ def translate_video_api(video_url: str, source_language_code: str, target_langua
         extraction_model: Model for subtitle extraction (optional, defaults to environment variable or o3-mini)
         translation_model: Model for translation (optional, defaults to environment variable or o3-mini)
         progress_callback: Optional callback function for progress updates
+        max_concurrent_chunks: Maximum number of chunks translated at once (optional, defaults to AGENT_MAX_CONCURRENT_CHUNKS)
+        refresh_translation_memory: Regenerate the translation memory even if a stored one matches this transcript
+        extraction_mode: "direct" to fetch subtitles without the extraction LLM, "llm" for the tool-calling agent
+                         (optional, defaults to AGENT_EXTRACTION_MODE or "direct")
+        job_id: ID under which the job is checkpointed (optional, a new one is generated)
+        cascade_model: Cheap model that translates every chunk first; chunks failing validation or repair are
+                       escalated to translation_model (optional, defaults to CASCADE_MODEL, "" disables the cascade)
+        llm_clients: Chat models to use instead of the ones named by the model arguments (optional, e.g. an
+                     offline model for tests and benchmarks; see create_llm_clients). Not kept in the checkpoint,
+                     so resume_translation_job uses the named models
     
     Returns:
-        dict: Result containing paths and status
+        dict: Result containing paths and status, the tokens, latency and estimated cost of every node and chunk
+              under "usage", and the job_id to pass to resume_translation_job if it failed
     """
-    try:
-        # Set model names, prioritizing function parameters over environment variables
-        extraction_model_name = extraction_model or EXTRACTION_MODEL_NAME
-        translation_model_name = translation_model or TRANSLATION_MODEL_NAME
-        
-        # Create model instances with the specified models
-        global llm, translation_llm
-        llm = ChatOpenAI(model=extraction_model_name).bind_tools(extraction_tools)
-        translation_llm = ChatOpenAI(model=translation_model_name)
-        
-        if progress_callback:
-            progress_callback("init", 15, f"Initializing translation workflow with models: {extraction_model_name} & {translation_model_name}...")
-        
-        # Create initial state for the workflow
-        initial_state = {
-            "video_link": video_url,
-            "chosen_language_code": source_language_code,
-            "target_language": target_language,
-            "current_chunk_index": 0,
-            "current_chunk_retry_count": 0,
-            "translated_chunks_list": [],
-            "translated_sub_list": [],
-            "messages": []
-        }
-        
-        # Skip interactive input nodes by directly calling the subtitle extraction
-        if progress_callback:
-            progress_callback("extract", 25, "Extracting video subtitles...")
-        
-        # Get available languages to validate
-        available_languages = list_available_languages.invoke({"video_url": video_url})
-        source_lang_info = None
-        for lang in available_languages:
-            if lang['code'] == source_language_code:
-                source_lang_info = lang
-                break
-        
-        if not source_lang_info:
-            raise ValueError(f"Source language '{source_language_code}' not available for this video")
-        
-        initial_state["available_languages"] = available_languages
-        initial_state["original_language"] = source_lang_info['name']
-        
-        # Prepare messages for subtitle extraction
-        extraction_messages = [
-            SystemMessage(content=SUBTITLE_EXTRACTION_SYSTEM_PROMPT),
-            HumanMessage(content=f"Please fetch subtitles for the video: {video_url}. "
-                                f"The chosen original language code is '{source_language_code}'.")
-        ]
-        initial_state["messages"] = extraction_messages
-        
-        if progress_callback:
-            progress_callback("download", 30, "Downloading original subtitle file...")
-        
-        # Execute the workflow step by step
-        current_state = initial_state
-        
-        # Step 1: Extract subtitles
-        current_state.update(get_sub_node(current_state))
-        
-        # Continue with extraction if needed
-        while should_continue_extraction(current_state) == "continue_extraction":
+    job_id = job_id or uuid.uuid4().hex
+    params = {
+        "video_url": video_url, "source_language_code": source_language_code, "target_language": target_language,
+        "extraction_model": extraction_model, "translation_model": translation_model,
+        "max_concurrent_chunks": max_concurrent_chunks, "refresh_translation_memory": refresh_translation_memory,
+        "extraction_mode": extraction_mode, "cascade_model": cascade_model
+    }
+    _update_checkpoint(job_id, lambda store: store.create_job(job_id, params))
+    return _run_translation_job(job_id, params, progress_callback=progress_callback, llm_clients=llm_clients)
+
+async def atranslate_video_api(video_url: str, source_language_code: str, target_language: str,
+                               extraction_model: str = None, translation_model: str = None, progress_callback=None,
+                               max_concurrent_chunks: int = None, refresh_translation_memory: bool = False,
+                               extraction_mode: str = None, job_id: str = None, cascade_model: str = None,
+                               llm_clients: LLMClients = None):
+    """
+    Coroutine version of translate_video_api for async servers, which can run many jobs concurrently on one event loop.
+
+    LLM calls are awaited and the YouTube downloads run on a small shared thread pool (YOUTUBE_FETCH_MAX_WORKERS), so
+    a job holds no thread of its own while it waits. progress_callback is called on the event loop and must not block.
+    Cancelling the task stops the job's requests and marks its checkpoint "cancelled"; the finished chunks are kept
+    and resume_translation_job(job_id) continues the job.
+
+    Args:
+        Same as translate_video_api
+
+    Returns:
+        dict: Same result as translate_video_api
+    """
+    job_id = job_id or uuid.uuid4().hex
+    params = {
+        "video_url": video_url, "source_language_code": source_language_code, "target_language": target_language,
+        "extraction_model": extraction_model, "translation_model": translation_model,
+        "max_concurrent_chunks": max_concurrent_chunks, "refresh_translation_memory": refresh_translation_memory,
+        "extraction_mode": extraction_mode, "cascade_model": cascade_model
+    }
+    _update_checkpoint(job_id, lambda store: store.create_job(job_id, params))
+    return await _arun_translation_job(job_id, params, progress_callback, llm_clients)
+
+def resume_translation_job(job_id: str, progress_callback=None, max_concurrent_chunks: int = None):
+    """
+    Continues a checkpointed translation job, e.g. after the process or Streamlit session died.
+
+    Subtitles, chunks and the translation memory are taken from the checkpoint and only unfinished chunks are translated.
+
+    Args:
+        job_id: ID returned by translate_video_api
+        progress_callback: Optional callback function for progress updates
+        max_concurrent_chunks: Override the concurrency of the original request (optional)
+
+    Returns:
+        dict: Same result as translate_video_api
+    """
+    checkpoint_store = get_checkpoint_store()
+    job = checkpoint_store.get_job(job_id) if checkpoint_store is not None else None
+    if job is None:
+        return {"success": False, "job_id": job_id, "error": f"No checkpoint found for job '{job_id}'"}
+
+    params = dict(job["params"], refresh_translation_memory=False)
+    if max_concurrent_chunks:
+        params["max_concurrent_chunks"] = max_concurrent_chunks
+    checkpoint_store.set_status(job_id, "running")
+    logger.info(f"Resuming job {job_id} ({len(job['completed_chunks'])} chunks already translated)...")
+    return _run_translation_job(job_id, params, job["state"], job["completed_chunks"], progress_callback)
+
+def translate_video_multi_api(video_url: str, source_language_code: str, target_languages: List[str],
+                              extraction_model: str = None, translation_model: str = None, progress_callback=None,
+                              max_concurrent_chunks: int = None, refresh_translation_memory: bool = False,
+                              extraction_mode: str = None, cascade_model: str = None):
+    """
+    Translates one video into several target languages in a single job.
+
+    Subtitles are listed, downloaded, parsed and chunked once, the target-language independent part of the
+    translation memory is generated once, and the per-language translations run concurrently.
+
+    Args:
+        video_url: YouTube video URL
+        source_language_code: Source language code (e.g., 'en')
+        target_languages: Target languages (e.g., ['zh-CN', 'ja', 'ko', 'es'])
+        extraction_model: Model for subtitle extraction (optional, defaults to environment variable or o3-mini)
+        translation_model: Model for translation (optional, defaults to environment variable or o3-mini)
+        progress_callback: Optional callback function for progress updates, always called from the calling thread
+        max_concurrent_chunks: Total number of chunks translated at once across all languages
+                               (optional, defaults to AGENT_MAX_CONCURRENT_CHUNKS)
+        refresh_translation_memory: Regenerate the translation memories even if stored ones match this transcript
+        extraction_mode: "direct" to fetch subtitles without the extraction LLM, "llm" for the tool-calling agent
+                         (optional, defaults to AGENT_EXTRACTION_MODE or "direct")
+        cascade_model: Cheap model that translates every chunk first (optional, defaults to CASCADE_MODEL, "" disables it)
+
+    Returns:
+        dict: Result containing the original paths, one result per target language under "results"
+              and the translated file of every successful language under "final_srt_paths". The usage of the
+              shared download and analysis is under "shared_usage", each language's under its result and
+              the sum of all under "usage".
+    """
+    params = {
+        "video_url": video_url, "source_language_code": source_language_code, "target_languages": target_languages,
+        "extraction_model": extraction_model, "translation_model": translation_model,
+        "max_concurrent_chunks": max_concurrent_chunks, "refresh_translation_memory": refresh_translation_memory,
+        "extraction_mode": extraction_mode, "cascade_model": cascade_model
+    }
+    shared_usage_tracker = UsageTracker()
+    language_usage_trackers: Dict[str, UsageTracker] = {}
+    with start_trace("multi_language_job", video_url=video_url, target_languages=",".join(dict.fromkeys(target_languages))) as trace:
+        try:
+            target_languages = list(dict.fromkeys(target_languages))  # Drop duplicates, keep order
+            if not target_languages:
+                raise ValueError("No target languages given")
+
+            extraction_model_name = extraction_model or EXTRACTION_MODEL_NAME
+            translation_model_name = translation_model or TRANSLATION_MODEL_NAME
+            cascade_model_name = CASCADE_MODEL_NAME if cascade_model is None else cascade_model
+            extraction_mode = (extraction_mode or EXTRACTION_MODE).strip().lower()
+            llm_clients = create_llm_clients(translation_model_name, cascade_model_name, extraction_model_name, extraction_mode)
+
             if progress_callback:
-                progress_callback("extract_continue", 35, "Processing subtitle download...")
-            tool_node = ToolNode(tools=extraction_tools)
-            tool_result = tool_node.invoke(current_state)
-            current_state.update(tool_result)
-            current_state.update(get_sub_node(current_state))
-        
-        if should_continue_extraction(current_state) != "start_translation":
-            raise ValueError("Failed to extract subtitles")
-        
-        if progress_callback:
-            progress_callback("prepare", 40, "Preparing translation data...")
-        
-        # Step 2: Prepare translation
-        current_state.update(prepare_translation_node(current_state))
-        
-        if progress_callback:
-            progress_callback("context", 45, "Generating translation context...")
-        
-        # Step 3: Generate translation context
-        current_state.update(generate_translation_context_node(current_state))
-        
-        # Step 4: Translate chunks
-        total_chunks = len(current_state.get('sub_chunks_list', []))
-        
-        while should_translate_more_chunks(current_state) == "translate_next_chunk":
-            current_chunk = current_state.get('current_chunk_index', 0)
-            progress_percent = 50 + int((current_chunk / max(total_chunks, 1)) * 40)
-            
+                progress_callback("init", 15, f"Initializing translation workflow for {len(target_languages)} languages with models: {extraction_model_name} & {translation_model_name}...")
+
+            prepared_state = _fetch_and_prepare_subtitles(video_url, source_language_code, extraction_mode,
+                                                          llm_clients, progress_callback, shared_usage_tracker)
+
             if progress_callback:
-                progress_callback("translate", progress_percent, 
-                                f"Translating subtitle chunk {current_chunk + 1}/{total_chunks}...")
-            
-            # Translate current chunk
-            current_state.update(translate_current_chunk_node(current_state))
-        
-            # Validate translation
-            current_state.update(validate_translation_format_node(current_state))
-            
-            # Handle validation result
-            validation_result = decide_after_validation(current_state)
-            if validation_result == "retry_chunk_translation":
-                # Retry if needed
-                continue
-            
-            # Aggregate translation
-            current_state.update(aggregate_translation_node(current_state))
-        
-        if progress_callback:
-            progress_callback("finalize", 90, "Consolidating translation results...")
-        
-        # Step 5: Finalize translation
-        current_state.update(finalize_translation_node(current_state))
-        
-        if progress_callback:
-            progress_callback("complete", 100, "Translation completed!")
-        
-        # Return results
-        return {
-            "success": True,
-            "final_srt_path": current_state.get("final_srt_path"),
-            "original_srt_path": current_state.get("original_srt_path"),
-            "sub_list": current_state.get("sub_list"),
-            "translated_sub_list": current_state.get("translated_sub_list"),
-            "total_chunks": total_chunks
-        }
-        
-    except Exception as e:
-        logger.error(f"Translation API error: {e}", exc_info=True)
-        if progress_callback:
-            progress_callback("error", 0, f"Translation failed: {str(e)}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+                progress_callback("context", 42, "Analysing subtitles for all target languages...")
+            if refresh_translation_memory:
+                invalidate_translation_memory(prepared_state.get('sub_list'), SOURCE_ANALYSIS_LANGUAGE_KEY, translation_model_name)
+            prepared_state["source_analysis"] = _generate_source_analysis(llm_clients.translation, prepared_state['sub_list'], shared_usage_tracker)
+
+            # Split the chunk concurrency budget between the languages running side by side
+            total_workers = max(1, max_concurrent_chunks or MAX_CONCURRENT_CHUNKS)
+            workers_per_language = max(1, total_workers // len(target_languages))
+
+            # Worker threads report progress through a queue so the callback only ever runs on this thread
+            progress_events = queue.Queue()
+
+            def make_language_callback(language: str):
+                return lambda step, progress, message: progress_events.put((step, progress, f"[{language}] {message}"))
+
+            results = {}
+            language_usage_trackers = {language: UsageTracker() for language in target_languages}
+            with ThreadPoolExecutor(max_workers=len(target_languages), thread_name_prefix="language") as executor:
+                futures = {
+                    submit_in_context(executor, _translate_prepared_subtitles, prepared_state, language, workers_per_language,
+                                      refresh_translation_memory, make_language_callback(language),
+                                      usage_tracker=language_usage_trackers[language],
+                                      span_name="language", span_attributes={"language": language}): language
+                    for language in target_languages
+                }
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                    while not progress_events.empty():
+                        step, progress, message = progress_events.get_nowait()
+                        if progress_callback:
+                            progress_callback(step, progress, message)
+                    for future in done:
+                        language = futures[future]
+                        try:
+                            language_state = future.result()
+                            results[language] = {
+                                "success": True,
+                                "final_srt_path": language_state.get("final_srt_path"),
+                                "translated_sub_list": _track_dicts(language_state.get("translated_sub_list")),
+                                "cascade_stats": language_state.get("cascade_stats"),
+                                "prompt_cache_stats": language_state.get("prompt_cache_stats")
+                            }
+                        except Exception as e:
+                            logger.error(f"Translation into {language} failed: {e}", exc_info=True)
+                            results[language] = {"success": False, "error": str(e)}
+                        results[language]["usage"] = _summarize_usage(language_usage_trackers[language], f"[{language}]")
+
+            if progress_callback:
+                progress_callback("complete", 100, "Translation completed!")
+
+            result = {
+                "success": all(language_result["success"] for language_result in results.values()),
+                "original_srt_path": prepared_state.get("original_srt_path"),
+                "sub_list": _track_dicts(prepared_state.get("sub_list")),
+                "results": {language: results[language] for language in target_languages},
+                "final_srt_paths": {language: results[language]["final_srt_path"]
+                                    for language in target_languages if results[language]["success"]},
+                "total_chunks": len(prepared_state.get('sub_chunks_list', [])),
+                "chunk_stats": prepared_state.get("chunk_stats"),
+                "dedup_stats": prepared_state.get("dedup_stats"),
+                "shared_usage": shared_usage_tracker.summary(),
+                "rate_limits": get_rate_limit_utilisation()
+            }
+
+        except Exception as e:
+            logger.error(f"Multi-language translation API error: {e}", exc_info=True)
+            if progress_callback:
+                progress_callback("error", 0, f"Translation failed: {str(e)}")
+            result = {
+                "success": False,
+                "error": str(e)
+            }
+    result["trace_path"] = export_trace(trace, f"multi_{trace.trace_id}") if trace is not None else None
+    result["usage"] = _summarize_usage(UsageTracker.combine([shared_usage_tracker, *language_usage_trackers.values()]), "Multi-language job")
+    _log_job_run(None, params, result, result["usage"])
+    return result
+
+def prepare_chunk_translations(video_url: str, source_language_code: str, target_language: str,
+                               extraction_mode: str = None, llm_clients: LLMClients = None) -> dict:
+    """
+    Prepares a video whose chunks are translated outside of the job (e.g. through a batch endpoint).
+
+    Subtitles are downloaded and chunked and the translation memory is generated; the chunk requests are returned
+    instead of being sent. Chunks already in the translation cache need no request.
+
+    Args:
+        video_url: YouTube video URL
+        source_language_code: Source language code (e.g., 'en')
+        target_language: Target language (e.g., 'zh-CN')
+        extraction_mode: "direct" or "llm" (optional, defaults to AGENT_EXTRACTION_MODE or "direct")
+        llm_clients: Chat models of the job (optional, defaults to create_llm_clients()); the requests are meant for
+                     the model that translates chunks first, i.e. the cascade model if there is one
+
+    Returns:
+        dict: "state", the JSON serializable state to pass to finish_chunk_translations, "model_name", the model the
+              requests are meant for, and "chunk_messages", the chat messages of every chunk to translate by chunk index
+    """
+    extraction_mode = (extraction_mode or EXTRACTION_MODE).strip().lower()
+    llm_clients = llm_clients or create_llm_clients(extraction_mode=extraction_mode)
+    prepared_state = _fetch_and_prepare_subtitles(video_url, source_language_code, extraction_mode, llm_clients)
+    prepared_state["target_language"] = target_language
+    prepared_state.update(generate_translation_context_node(prepared_state))
+    translation_memory = prepared_state.get("translation_memory")
+    if not translation_memory:
+        raise ValueError("Failed to generate translation memory")
+
+    chunk_model_name = _chunk_llm(prepared_state).model_name
+    chunk_messages = {
+        chunk_index: _build_chunk_messages(chunk_text, translation_memory, target_language)
+        for chunk_index, chunk_text in enumerate(prepared_state["sub_chunks_list"])
+        if _cached_chunk_translation(prepared_state, chunk_text, chunk_model_name) is None
+    }
+    return {"state": _persisted_state(prepared_state), "model_name": chunk_model_name, "chunk_messages": chunk_messages}
+
+def finish_chunk_translations(prepared_state: dict, chunk_translations: Dict[int, str], max_concurrent_chunks: int = None,
+                              llm_clients: LLMClients = None) -> dict:
+    """
+    Completes a video prepared with prepare_chunk_translations from the chunk translations obtained for it.
+
+    The translations go through the same validation, repair and escalation as responses of the job's own requests;
+    chunks without a translation are translated online.
+
+    Args:
+        prepared_state: The "state" returned by prepare_chunk_translations
+        chunk_translations: Raw model output by chunk index
+        max_concurrent_chunks: Maximum number of chunks processed at once (optional, defaults to AGENT_MAX_CONCURRENT_CHUNKS)
+        llm_clients: Chat models for the chunks translated or escalated online (optional, defaults to create_llm_clients())
+
+    Returns:
+        dict: "final_srt_path" of the translated subtitles and "total_chunks"
+    """
+    state = _restore_persisted_state(prepared_state)
+    final_state = _translate_prepared_subtitles(state, state["target_language"], max_concurrent_chunks,
+                                                precomputed_translations=chunk_translations,
+                                                llm_clients=llm_clients or create_llm_clients())
+    if not final_state.get("final_srt_path"):
+        raise ValueError("Failed to write the translated subtitles")
+    return {"final_srt_path": final_state["final_srt_path"], "total_chunks": len(final_state["sub_chunks_list"])}
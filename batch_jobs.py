@@ -0,0 +1,364 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage, SystemMessage
+
+import Agent
+from llm_clients import get_chat_model
+from rate_limiter import invoke_with_rate_limit
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Batch job parameters
+# Which batch endpoint to submit to: "openai" (OpenAI Batch API) or "local" (file-based stand-in for testing)
+BATCH_BACKEND = os.environ.get("BATCH_BACKEND", "openai").strip().lower()
+# Directory holding one sub-directory (request file, manifest, results) per batch job
+BATCH_JOBS_DIR = os.environ.get("BATCH_JOBS_DIR", "batch_jobs")
+# Seconds between status checks while waiting for a batch to finish
+BATCH_POLL_SECONDS = int(os.environ.get("BATCH_POLL_SECONDS", "60"))
+# Completion window requested from the OpenAI Batch API
+BATCH_COMPLETION_WINDOW = os.environ.get("BATCH_COMPLETION_WINDOW", "24h")
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+MANIFEST_FILE_NAME = "manifest.json"
+REQUESTS_FILE_NAME = "requests.jsonl"
+RESULTS_FILE_NAME = "results.jsonl"
+# Batch statuses after which no more results will arrive
+FINAL_BATCH_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+# --- Batch Backends ---
+
+class OpenAIBatchBackend:
+    """Submits request files to the OpenAI Batch API."""
+
+    def __init__(self):
+        from openai import OpenAI
+        self.client = OpenAI()
+
+    def submit(self, requests_path: str, metadata: Dict[str, str]) -> str:
+        with open(requests_path, "rb") as requests_file:
+            input_file = self.client.files.create(file=requests_file, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id, endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW, metadata=metadata
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def fetch_results(self, batch_id: str) -> List[dict]:
+        batch = self.client.batches.retrieve(batch_id)
+        results = []
+        # Failed requests are reported in the error file; both use the same line format
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                results.extend(json.loads(line) for line in self.client.files.content(file_id).text.splitlines() if line.strip())
+        return results
+
+class LocalBatchBackend:
+    """File-based stand-in for a batch endpoint: requests are answered with ChatOpenAI the first time the batch is polled."""
+
+    def __init__(self, storage_dir: str = None):
+        self.storage_dir = storage_dir or os.path.join(BATCH_JOBS_DIR, "local_backend")
+        os.makedirs(self.storage_dir, exist_ok=True)
+
+    def _path(self, batch_id: str, suffix: str) -> str:
+        return os.path.join(self.storage_dir, f"{batch_id}{suffix}")
+
+    def submit(self, requests_path: str, metadata: Dict[str, str]) -> str:
+        batch_id = f"local_batch_{uuid.uuid4().hex}"
+        shutil.copyfile(requests_path, self._path(batch_id, "_input.jsonl"))
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        if not os.path.exists(self._path(batch_id, "_input.jsonl")):
+            return "failed"
+        if not os.path.exists(self._path(batch_id, "_output.jsonl")):
+            self._process(batch_id)
+        return "completed"
+
+    def _process(self, batch_id: str) -> None:
+        """Answers every request of the batch and writes the responses in the OpenAI batch output format."""
+        role_to_message = {"system": SystemMessage, "user": HumanMessage}
+        llms = {}
+        output_lines = []
+        with open(self._path(batch_id, "_input.jsonl"), "r", encoding="utf-8") as input_file:
+            for line in input_file:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                body = request["body"]
+                try:
+                    if body["model"] not in llms:
+                        llms[body["model"]] = get_chat_model(body["model"])
+                    messages = [role_to_message[message["role"]](content=message["content"]) for message in body["messages"]]
+                    content = invoke_with_rate_limit(llms[body["model"]], messages).content
+                    output_lines.append({
+                        "id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request["custom_id"],
+                        "response": {"status_code": 200, "body": {"choices": [{"message": {"role": "assistant", "content": content}}]}},
+                        "error": None
+                    })
+                except Exception as e:
+                    logger.warning(f"Local batch request {request['custom_id']} failed: {e}")
+                    output_lines.append({
+                        "id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request["custom_id"],
+                        "response": None, "error": {"code": type(e).__name__, "message": str(e)}
+                    })
+        # Write to a temporary file first so a crash never leaves a half-written output behind
+        temp_path = self._path(batch_id, "_output.jsonl.tmp")
+        with open(temp_path, "w", encoding="utf-8") as output_file:
+            output_file.writelines(json.dumps(line, ensure_ascii=False) + "\n" for line in output_lines)
+        os.replace(temp_path, self._path(batch_id, "_output.jsonl"))
+
+    def fetch_results(self, batch_id: str) -> List[dict]:
+        with open(self._path(batch_id, "_output.jsonl"), "r", encoding="utf-8") as output_file:
+            return [json.loads(line) for line in output_file if line.strip()]
+
+def get_batch_backend(name: str = None):
+    """Returns the batch backend with the given name (defaults to BATCH_BACKEND)."""
+    name = (name or BATCH_BACKEND).strip().lower()
+    if name == "openai":
+        return OpenAIBatchBackend()
+    if name == "local":
+        return LocalBatchBackend()
+    raise ValueError(f"Unknown batch backend '{name}', expected 'openai' or 'local'")
+
+# --- Helper Functions ---
+
+def _message_to_dict(message) -> Dict[str, str]:
+    """Converts a system or human chat message into the role/content format of the chat completions API."""
+    return {"role": "system" if isinstance(message, SystemMessage) else "user", "content": message.content}
+
+def _custom_id(video_number: int, chunk_index: int) -> str:
+    return f"video-{video_number}-chunk-{chunk_index}"
+
+def _read_manifest(job_dir: str) -> dict:
+    with open(os.path.join(job_dir, MANIFEST_FILE_NAME), "r", encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
+def _write_manifest(job_dir: str, manifest: dict) -> None:
+    temp_path = os.path.join(job_dir, MANIFEST_FILE_NAME + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, ensure_ascii=False, indent=2)
+    os.replace(temp_path, os.path.join(job_dir, MANIFEST_FILE_NAME))
+
+# --- Public API ---
+
+def create_batch_job(videos: List[Dict[str, str]], translation_model: str = None, extraction_model: str = None,
+                     backend: str = None, jobs_dir: str = None, extraction_mode: str = None, cascade_model: str = None) -> dict:
+    """
+    Prepares every video and submits all of their chunk translations as one batch.
+
+    Subtitles are downloaded and the translation memory is generated right away; only the chunk translations,
+    which make up most of the tokens, go through the batch endpoint. Chunks already in the translation cache
+    are not submitted.
+
+    Args:
+        videos: Dicts with 'video_url', 'source_language_code' and 'target_language'
+        translation_model: Model for translation (optional, defaults to environment variable or o3-mini)
+        extraction_model: Model for subtitle extraction in "llm" extraction mode (optional)
+        backend: "openai" or "local" (optional, defaults to BATCH_BACKEND)
+        jobs_dir: Directory for the job files (optional, defaults to BATCH_JOBS_DIR)
+        extraction_mode: "direct" or "llm" (optional, defaults to AGENT_EXTRACTION_MODE)
+        cascade_model: Cheap model the batch requests go to; chunks it fails on are escalated to the translation
+                       model online when the job is collected (optional, defaults to CASCADE_MODEL, "" disables it)
+
+    Returns:
+        dict: The job manifest, including 'job_id', 'job_dir', 'batch_id' and 'request_count'
+    """
+    translation_model_name = translation_model or Agent.TRANSLATION_MODEL_NAME
+    extraction_model_name = extraction_model or Agent.EXTRACTION_MODEL_NAME
+    extraction_mode = (extraction_mode or Agent.EXTRACTION_MODE).strip().lower()
+    backend_name = (backend or BATCH_BACKEND).strip().lower()
+    llm_clients = Agent.create_llm_clients(translation_model_name, cascade_model, extraction_model_name, extraction_mode)
+
+    job_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}_{uuid.uuid4().hex[:8]}"
+    job_dir = os.path.join(jobs_dir or BATCH_JOBS_DIR, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    requests_path = os.path.join(job_dir, REQUESTS_FILE_NAME)
+
+    manifest = {
+        "job_id": job_id, "job_dir": job_dir, "backend": backend_name, "batch_id": None, "status": "preparing",
+        "translation_model": translation_model_name, "cascade_model": llm_clients.cascade.model_name if llm_clients.cascade else "",
+        "prompt_version": Agent.PROMPT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(), "request_count": 0, "videos": []
+    }
+    with open(requests_path, "w", encoding="utf-8") as requests_file:
+        for video_number, video in enumerate(videos):
+            video_entry = dict(video)
+            try:
+                logger.info(f"Preparing video {video_number + 1}/{len(videos)}: {video['video_url']} -> {video['target_language']}")
+                prepared = Agent.prepare_chunk_translations(video["video_url"], video["source_language_code"],
+                                                            video["target_language"], extraction_mode, llm_clients)
+            except Exception as e:
+                logger.error(f"Could not prepare {video.get('video_url')}: {e}", exc_info=True)
+                video_entry.update({"status": "failed", "error": str(e)})
+                manifest["videos"].append(video_entry)
+                continue
+
+            # Cached chunks get no request; they are served from the cache when the job is collected
+            requests = {}
+            for chunk_index, messages in prepared["chunk_messages"].items():
+                custom_id = _custom_id(video_number, chunk_index)
+                requests_file.write(json.dumps({
+                    "custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT,
+                    "body": {"model": prepared["model_name"], "messages": [_message_to_dict(message) for message in messages]}
+                }, ensure_ascii=False) + "\n")
+                requests[custom_id] = chunk_index
+
+            # The manifest keeps the state needed to collect the video later
+            video_entry.update({"status": "prepared", "state": prepared["state"], "requests": requests})
+            manifest["videos"].append(video_entry)
+            manifest["request_count"] += len(requests)
+
+    if manifest["request_count"]:
+        manifest["batch_id"] = get_batch_backend(backend_name).submit(requests_path, {"job_id": job_id})
+        manifest["status"] = "submitted"
+        logger.info(f"Submitted batch {manifest['batch_id']} with {manifest['request_count']} requests for job {job_id}.")
+    else:
+        manifest["status"] = "ready"
+        logger.info(f"Job {job_id} needs no batch requests; it can be collected right away.")
+    _write_manifest(job_dir, manifest)
+    return manifest
+
+def get_batch_job_status(job_dir: str) -> str:
+    """Returns the current status of a batch job ("ready" once it can be collected, "collected" once it was)."""
+    manifest = _read_manifest(job_dir)
+    if manifest["status"] != "submitted":
+        return manifest["status"]
+    batch_status = get_batch_backend(manifest["backend"]).status(manifest["batch_id"])
+    return "ready" if batch_status in FINAL_BATCH_STATUSES else batch_status
+
+def collect_batch_job(job_dir: str, wait: bool = False, poll_interval: int = None,
+                      max_concurrent_chunks: int = None) -> dict:
+    """
+    Feeds the batch responses of a job through validation, repair and finalization and writes the translated SRT files.
+
+    Chunks whose response is missing, failed or rejected by validation are translated online instead.
+
+    Args:
+        job_dir: Directory of the job created by create_batch_job
+        wait: Poll until the batch has finished instead of returning its status right away
+        poll_interval: Seconds between status checks (optional, defaults to BATCH_POLL_SECONDS)
+        max_concurrent_chunks: Concurrency for chunks that need online processing (optional)
+
+    Returns:
+        dict: 'success', 'status' and one result per video under 'videos'
+    """
+    manifest = _read_manifest(job_dir)
+    backend = get_batch_backend(manifest["backend"]) if manifest["batch_id"] else None
+    if backend is not None:
+        while True:
+            batch_status = backend.status(manifest["batch_id"])
+            if batch_status in FINAL_BATCH_STATUSES:
+                break
+            if not wait:
+                return {"success": False, "status": batch_status, "job_id": manifest["job_id"]}
+            logger.info(f"Batch {manifest['batch_id']} is {batch_status}, checking again in {poll_interval or BATCH_POLL_SECONDS}s...")
+            time.sleep(poll_interval or BATCH_POLL_SECONDS)
+        if batch_status != "completed":
+            logger.warning(f"Batch {manifest['batch_id']} ended as '{batch_status}'; its chunks are translated online instead.")
+
+    responses = {}
+    if backend is not None and batch_status == "completed":
+        results = backend.fetch_results(manifest["batch_id"])
+        with open(os.path.join(job_dir, RESULTS_FILE_NAME), "w", encoding="utf-8") as results_file:
+            results_file.writelines(json.dumps(result, ensure_ascii=False) + "\n" for result in results)
+        for result in results:
+            response = result.get("response") or {}
+            if response.get("status_code") == 200:
+                responses[result["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+            else:
+                logger.warning(f"Batch request {result.get('custom_id')} failed: {result.get('error')}")
+
+    # Jobs created before the cascade model was recorded fall back to CASCADE_MODEL
+    llm_clients = Agent.create_llm_clients(manifest["translation_model"], manifest.get("cascade_model"))
+    video_results = []
+    for video_entry in manifest["videos"]:
+        if video_entry["status"] == "failed" and "state" not in video_entry:
+            video_results.append({"video_url": video_entry["video_url"], "success": False, "error": video_entry.get("error")})
+            continue
+        try:
+            batch_translations = {
+                chunk_index: responses[custom_id]
+                for custom_id, chunk_index in video_entry["requests"].items() if custom_id in responses
+            }
+            finished = Agent.finish_chunk_translations(video_entry["state"], batch_translations, max_concurrent_chunks, llm_clients)
+            video_entry.update({"status": "collected", "final_srt_path": finished["final_srt_path"]})
+            video_results.append({
+                "video_url": video_entry["video_url"], "target_language": video_entry["target_language"],
+                "success": True, "final_srt_path": finished["final_srt_path"],
+                "batch_chunks": len(batch_translations), "total_chunks": finished["total_chunks"]
+            })
+        except Exception as e:
+            logger.error(f"Could not collect {video_entry['video_url']}: {e}", exc_info=True)
+            video_entry.update({"status": "failed", "error": str(e)})
+            video_results.append({"video_url": video_entry["video_url"], "success": False, "error": str(e)})
+
+    manifest["status"] = "collected"
+    _write_manifest(job_dir, manifest)
+    return {
+        "success": all(result["success"] for result in video_results),
+        "status": "collected", "job_id": manifest["job_id"], "videos": video_results
+    }
+
+# --- Command Line Interface ---
+
+def _load_videos(args) -> List[Dict[str, str]]:
+    """Reads the videos to translate from --videos-file (JSONL) or from --video/--source/--target."""
+    if args.videos_file:
+        with open(args.videos_file, "r", encoding="utf-8") as videos_file:
+            return [json.loads(line) for line in videos_file if line.strip()]
+    if not (args.video and args.source and args.target):
+        raise SystemExit("Either --videos-file or --video, --source and --target are required.")
+    return [{"video_url": video_url, "source_language_code": args.source, "target_language": args.target} for video_url in args.video]
+
+def main():
+    parser = argparse.ArgumentParser(description="Translate YouTube subtitles through a batch endpoint.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = subparsers.add_parser("submit", help="Prepare videos and submit their chunk translations as a batch")
+    submit_parser.add_argument("--video", action="append", help="YouTube video URL (repeatable)")
+    submit_parser.add_argument("--source", help="Source language code, e.g. 'en'")
+    submit_parser.add_argument("--target", help="Target language, e.g. 'zh-CN'")
+    submit_parser.add_argument("--videos-file", help="JSONL file with video_url, source_language_code and target_language per line")
+    submit_parser.add_argument("--backend", choices=["openai", "local"], help="Batch backend (default: BATCH_BACKEND)")
+    submit_parser.add_argument("--model", help="Translation model (default: TRANSLATION_MODEL)")
+    submit_parser.add_argument("--cascade-model", help="Cheap model the batch requests go to, '' to disable (default: CASCADE_MODEL)")
+    submit_parser.add_argument("--jobs-dir", help="Directory for job files (default: BATCH_JOBS_DIR)")
+
+    status_parser = subparsers.add_parser("status", help="Show the status of a batch job")
+    status_parser.add_argument("job_dir")
+
+    collect_parser = subparsers.add_parser("collect", help="Validate the batch responses and write the translated SRT files")
+    collect_parser.add_argument("job_dir")
+    collect_parser.add_argument("--wait", action="store_true", help="Poll until the batch has finished")
+    collect_parser.add_argument("--poll-interval", type=int, help="Seconds between status checks (default: BATCH_POLL_SECONDS)")
+
+    args = parser.parse_args()
+    if args.command == "submit":
+        manifest = create_batch_job(_load_videos(args), translation_model=args.model, backend=args.backend, jobs_dir=args.jobs_dir,
+                                    cascade_model=args.cascade_model)
+        print(f"Job {manifest['job_id']} ({manifest['status']}, {manifest['request_count']} requests): {manifest['job_dir']}")
+    elif args.command == "status":
+        print(get_batch_job_status(args.job_dir))
+    elif args.command == "collect":
+        result = collect_batch_job(args.job_dir, wait=args.wait, poll_interval=args.poll_interval)
+        if result["status"] != "collected":
+            print(f"Batch not finished yet: {result['status']}")
+        for video_result in result.get("videos", []):
+            print(f"{video_result['video_url']}: {video_result.get('final_srt_path') or 'FAILED - ' + str(video_result.get('error'))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Dict, Iterator, List
+
+# The benchmark runs fully offline: no caches, checkpoints or run log may carry state from one run into the next,
+# and no API key is needed (these only set defaults, the environment still wins)
+BENCHMARK_ENVIRONMENT = {
+    "OPENAI_API_KEY": "sk-benchmark",
+    "TRANSLATION_CACHE_ENABLED": "false",
+    "CHECKPOINT_ENABLED": "false",
+    "AGENT_RUN_LOG_PATH": "",
+    "AGENT_EXTRACTION_MODE": "direct",
+    "OPENAI_RPM_LIMIT": "0",
+    "OPENAI_TPM_LIMIT": "0",
+    "OPENAI_RATE_LIMIT_RETRIES": "5",
+}
+for variable, value in BENCHMARK_ENVIRONMENT.items():
+    os.environ.setdefault(variable, value)
+
+import httpx
+import openai
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import tool
+from pydantic import PrivateAttr
+
+import Agent
+from chunk_planner import count_tokens
+from llm_clients import LLMClients
+
+logger = logging.getLogger(__name__)
+
+# Benchmark parameters
+# Transcript sizes (number of cues) benchmarked by default
+DEFAULT_CUE_COUNTS = (100, 1000, 10000, 100000)
+BENCHMARK_VIDEO_URL = "https://www.youtube.com/watch?v=benchmark00"
+BENCHMARK_SOURCE_LANGUAGE = "en"
+BENCHMARK_TARGET_LANGUAGE = "zh-CN"
+# Headings the fake model looks for to find the lines it has to "translate"
+_CHUNK_HEADING = "Current Subtitle Chunk"
+_REPAIR_HEADING = "Lines to Translate"
+
+# Synthetic transcripts mix unique sentences, glossary terms and repeated lines (so deduplication has work to do)
+_SUBJECTS = ["The host", "Our guest", "Michelle Obama", "The audience", "My producer", "Everyone at 30 Rock", "The band"]
+_VERBS = ["talks about", "laughs at", "remembers", "asks about", "explains", "jokes about", "points to"]
+_OBJECTS = ["the new book", "last night's show", "the White House", "a trip to Chicago", "the first episode",
+            "the garden", "an old photo", "the opening monologue"]
+_REPEATED_LINES = ["[Music]", "[Applause]", "[Laughter]", "Thank you.", "Yeah."]
+FAKE_TRANSLATION_MEMORY = """**Basis:**
+A late-night talk show interview, recorded in front of a studio audience.
+
+**Glossary:**
+- Michelle Obama: 米歇尔·奥巴马
+- 30 Rock: 洛克菲勒广场30号
+- White House: 白宫
+- Chicago: 芝加哥
+
+**Voices Description:**
+- Host: playful, quick, teasing.
+- Guest: warm, relaxed, self-deprecating.
+
+**Tips:**
+- Keep jokes short and natural in spoken Chinese.
+
+**Thinking:**
+Synthetic memory returned by the benchmark model."""
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic offline stand-in for ChatOpenAI.
+
+    Chunk and repair requests are answered by echoing their numbered lines with a "[zh]" marker, every other request
+    (translation memory, source analysis) with FAKE_TRANSLATION_MEMORY. Latency, transient 429 failures, markdown
+    fences and dropped lines are injected at the configured rates. Whether a request is hit is derived from the seed,
+    the request and how often that request was made before, so a run gives the same result with any thread timing.
+    """
+
+    model_name: str = "benchmark-fake"
+    latency_seconds: float = 0.0
+    failure_rate: float = 0.0
+    fence_rate: float = 0.0
+    drop_rate: float = 0.0
+    seed: int = 0
+    stats: Dict[str, int] = {"requests": 0, "failures": 0, "fences": 0, "dropped_lines": 0}
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _occurrences: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _seen_prefixes: set = PrivateAttr(default_factory=set)
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _random_for(self, messages: List[BaseMessage]) -> random.Random:
+        request_key = hashlib.sha256("\x00".join(str(message.content) for message in messages).encode("utf-8")).hexdigest()
+        with self._lock:
+            occurrence = self._occurrences.get(request_key, 0)
+            self._occurrences[request_key] = occurrence + 1
+        return random.Random(f"{self.seed}:{request_key}:{occurrence}")
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        rng = self._random_for(messages)
+        self._count("requests")
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        if rng.random() < self.failure_rate:
+            self._count("failures")
+            request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+            raise openai.RateLimitError("Injected rate limit", response=httpx.Response(429, request=request, headers={"retry-after-ms": "1"}),
+                                        body=None)
+
+        human_text = str(messages[-1].content)
+        heading = _REPAIR_HEADING if _REPAIR_HEADING in human_text else _CHUNK_HEADING if _CHUNK_HEADING in human_text else None
+        if heading is None:
+            content = FAKE_TRANSLATION_MEMORY
+        else:
+            translated_lines = []
+            for line in human_text.split(heading, 1)[1].splitlines():
+                number, separator, text = line.partition(". ")
+                if not separator or not number.isdigit():
+                    continue
+                if heading == _CHUNK_HEADING and rng.random() < self.drop_rate:
+                    self._count("dropped_lines")
+                    continue
+                translated_lines.append(f"{number}. [zh] {text}")
+            content = "\n".join(translated_lines)
+            # Retries tell the model what went wrong, so only first attempts are fenced
+            if "PREVIOUS ATTEMPT" not in human_text and rng.random() < self.fence_rate:
+                self._count("fences")
+                content = f"```\n{content}\n```"
+
+        # Provider prompt caching: a system prompt (the stable prefix) seen before counts as cached input
+        input_tokens = sum(count_tokens(str(message.content)) for message in messages)
+        system_prompt = str(messages[0].content) if len(messages) > 1 else ""
+        with self._lock:
+            cached_input_tokens = count_tokens(system_prompt) if system_prompt in self._seen_prefixes else 0
+            self._seen_prefixes.add(system_prompt)
+        output_tokens = count_tokens(content)
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens,
+            "input_token_details": {"cache_read": cached_input_tokens}
+        })
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        message = self._respond(messages)
+        lines = message.content.splitlines(keepends=True)
+        for line_number, line in enumerate(lines):
+            is_last = line_number == len(lines) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(content=line, usage_metadata=message.usage_metadata if is_last else None))
+
+# --- Fixture Transcripts ---
+
+def _srt_time(milliseconds: int) -> str:
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+def generate_transcript(cue_count: int, seed: int = 0) -> str:
+    """Returns a synthetic SRT transcript with cue_count cues, speech pauses and about 10% repeated lines."""
+    rng = random.Random(seed)
+    blocks = []
+    start_ms = 0
+    for cue_number in range(1, cue_count + 1):
+        if rng.random() < 0.1:
+            text = rng.choice(_REPEATED_LINES)
+        else:
+            text = f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} ({cue_number})."
+        duration_ms = rng.randint(800, 4000)
+        blocks.append(f"{cue_number}\n{_srt_time(start_ms)} --> {_srt_time(start_ms + duration_ms)}\n{text}\n")
+        start_ms += duration_ms + (rng.randint(1500, 3000) if rng.random() < 0.05 else rng.randint(0, 300))
+    return "\n".join(blocks)
+
+class FixtureTranscriptSource:
+    """Serves a synthetic transcript through the same tool interface as get_sub, so no request reaches YouTube."""
+
+    def __init__(self, srt_content: str):
+        self.srt_content = srt_content
+        source = self
+
+        @tool
+        def list_available_languages(video_url: str) -> List[Dict[str, object]]:
+            """Lists the languages of the fixture transcript."""
+            return [{"name": "English", "code": BENCHMARK_SOURCE_LANGUAGE, "is_generated": False}]
+
+        @tool
+        def fetch_youtube_srt(video_url: str, language_code: str, output_srt_path: str) -> str:
+            """Writes the fixture transcript to output_srt_path."""
+            with open(output_srt_path, "w", encoding="utf-8") as f:
+                f.write(source.srt_content)
+            return output_srt_path
+
+        self.list_available_languages = list_available_languages
+        self.fetch_youtube_srt = fetch_youtube_srt
+
+    def install(self) -> None:
+        """Makes Agent fetch subtitles from this source until restore() is called."""
+        self._previous_tools = (Agent.list_available_languages, Agent.fetch_youtube_srt)
+        Agent.list_available_languages = self.list_available_languages
+        Agent.fetch_youtube_srt = self.fetch_youtube_srt
+
+    def restore(self) -> None:
+        """Puts back the tools Agent used before install()."""
+        Agent.list_available_languages, Agent.fetch_youtube_srt = self._previous_tools
+
+# --- Benchmark ---
+
+# Cues of the transcript translated once before the first measured run, so lazy imports and one-time setup
+# (graph compilation, tokenizer, HTTP pools) are not counted in its wall time and peak heap
+WARM_UP_CUE_COUNT = 50
+_warmed_up = False
+
+def _translate_fixture(srt_content: str, llm_clients: LLMClients, max_concurrent_chunks: int = None,
+                       trace_memory: bool = False) -> tuple:
+    """Translates a fixture transcript with translate_video_api; returns the result, wall seconds and peak heap bytes (or None)."""
+    work_dir = tempfile.mkdtemp(prefix="subtitle_benchmark_")
+    previous_output_dir = os.environ.get("TRANSCRIPT_OUTPUT_DIR")
+    os.environ["TRANSCRIPT_OUTPUT_DIR"] = work_dir
+    source = FixtureTranscriptSource(srt_content)
+    source.install()
+    try:
+        if trace_memory:
+            tracemalloc.start()
+        started_at = time.perf_counter()
+        result = Agent.translate_video_api(BENCHMARK_VIDEO_URL, BENCHMARK_SOURCE_LANGUAGE, BENCHMARK_TARGET_LANGUAGE,
+                                           max_concurrent_chunks=max_concurrent_chunks, extraction_mode="direct",
+                                           llm_clients=llm_clients)
+        wall_seconds = time.perf_counter() - started_at
+        peak_memory_bytes = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        source.restore()
+        if previous_output_dir is None:
+            os.environ.pop("TRANSCRIPT_OUTPUT_DIR", None)
+        else:
+            os.environ["TRANSCRIPT_OUTPUT_DIR"] = previous_output_dir
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return result, wall_seconds, peak_memory_bytes
+
+def _warm_up() -> None:
+    """Runs a small untimed translation once per process."""
+    global _warmed_up
+    if _warmed_up:
+        return
+    result, _, _ = _translate_fixture(generate_transcript(WARM_UP_CUE_COUNT), fake_llm_clients())
+    if not result.get("success"):
+        raise RuntimeError(f"Benchmark warm-up run failed: {result.get('error')}")
+    _warmed_up = True
+
+def fake_llm_clients(**fake_model_options) -> LLMClients:
+    """Returns job clients whose translation model is a FakeChatModel with the given options (named after TRANSLATION_MODEL, for cost estimates)."""
+    return LLMClients(translation=FakeChatModel(model_name=Agent.TRANSLATION_MODEL_NAME, **fake_model_options))
+
+def run_benchmark(cue_count: int, latency_seconds: float = 0.0, failure_rate: float = 0.0, fence_rate: float = 0.0,
+                  drop_rate: float = 0.0, max_concurrent_chunks: int = None, seed: int = 0,
+                  trace_memory: bool = True) -> Dict[str, object]:
+    """
+    Translates a synthetic transcript with translate_video_api against the fake model.
+
+    Args:
+        cue_count: Number of cues of the synthetic transcript
+        latency_seconds: Simulated latency of every model request
+        failure_rate: Share of requests rejected with a (retried) HTTP 429
+        fence_rate: Share of first chunk translation attempts wrapped in a markdown fence (rejected by validation)
+        drop_rate: Share of lines left out of chunk translations (restored by the repair node)
+        max_concurrent_chunks: Chunk workers (optional, defaults to AGENT_MAX_CONCURRENT_CHUNKS)
+        seed: Seed of the transcript and of the injected faults
+        trace_memory: Measure the peak Python heap with tracemalloc (which slows the run down noticeably)
+
+    Returns:
+        dict: Wall time, throughput, peak memory, retries and injected faults of the run
+    """
+    _warm_up()
+    llm_clients = fake_llm_clients(latency_seconds=latency_seconds, failure_rate=failure_rate, fence_rate=fence_rate,
+                                   drop_rate=drop_rate, seed=seed)
+    result, wall_seconds, peak_memory_bytes = _translate_fixture(generate_transcript(cue_count, seed), llm_clients,
+                                                                 max_concurrent_chunks, trace_memory)
+
+    if not result.get("success"):
+        raise RuntimeError(f"Benchmark run with {cue_count} cues failed: {result.get('error')}")
+    by_node = result["usage"]["by_node"]
+    total_chunks = result["total_chunks"]
+    injected = llm_clients.translation.stats
+    return {
+        "cues": cue_count,
+        "chunks": total_chunks,
+        "wall_seconds": round(wall_seconds, 3),
+        "cues_per_second": round(cue_count / wall_seconds, 1),
+        "chunks_per_second": round(total_chunks / wall_seconds, 1),
+        "peak_memory_mb": round(peak_memory_bytes / 2 ** 20, 1) if peak_memory_bytes is not None else None,
+        "max_rss_mb": round(_max_rss_bytes() / 2 ** 20, 1),
+        "llm_requests": result["usage"]["total"]["requests"],
+        # Chunk translations beyond the first attempt of each chunk (validation retries)
+        "translation_retries": by_node.get("translate_chunk", {}).get("requests", 0) - total_chunks,
+        "repair_requests": by_node.get("repair_translation", {}).get("requests", 0),
+        "rate_limit_retries": injected["failures"],
+        "injected_fences": injected["fences"],
+        "injected_dropped_lines": injected["dropped_lines"],
+        "prompt_cache_hit_rate": (result.get("prompt_cache_stats") or {}).get("hit_rate")
+    }
+
+def _max_rss_bytes() -> int:
+    """Peak resident set size of the process so far (ru_maxrss is in bytes on macOS and in kilobytes elsewhere)."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+def format_report(reports: List[Dict[str, object]]) -> str:
+    """Formats benchmark results as a plain-text table."""
+    columns = [("cues", "cues"), ("chunks", "chunks"), ("wall_seconds", "wall s"), ("cues_per_second", "cues/s"),
+               ("peak_memory_mb", "peak MB"), ("max_rss_mb", "RSS MB"), ("llm_requests", "requests"),
+               ("translation_retries", "retries"), ("repair_requests", "repairs"), ("rate_limit_retries", "429s")]
+    rows = [[header for _, header in columns]] + [["-" if report[key] is None else str(report[key]) for key, _ in columns]
+                                                  for report in reports]
+    widths = [max(len(row[column]) for row in rows) for column in range(len(columns))]
+    return "\n".join("  ".join(value.rjust(width) for value, width in zip(row, widths)) for row in rows)
+
+# --- Command Line Interface ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the translation pipeline offline against a deterministic fake model.")
+    parser.add_argument("--cues", type=int, nargs="+", default=list(DEFAULT_CUE_COUNTS), help="Transcript sizes to benchmark")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per model request")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests rejected with HTTP 429")
+    parser.add_argument("--fence-rate", type=float, default=0.0, help="Share of chunk translations wrapped in markdown fences")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Share of lines dropped from chunk translations")
+    parser.add_argument("--concurrency", type=int, help="Concurrent chunk workers (default: AGENT_MAX_CONCURRENT_CHUNKS)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the transcripts and injected faults")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip the peak heap measurement (faster)")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's logging (every injected fault logs a warning)")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.ERROR)
+    reports = []
+    for cue_count in args.cues:
+        reports.append(run_benchmark(cue_count, args.latency, args.failure_rate, args.fence_rate, args.drop_rate,
+                                     args.concurrency, args.seed, trace_memory=not args.no_tracemalloc))
+        print(f"{cue_count} cues: {reports[-1]['wall_seconds']}s", file=sys.stderr)
+    print(format_report(reports))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": reports}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
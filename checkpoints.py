@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Checkpoint parameters
+# Set CHECKPOINT_ENABLED to "false" to run translations without durable checkpoints
+CHECKPOINT_ENABLED = os.environ.get("CHECKPOINT_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+DEFAULT_CHECKPOINT_PATH = os.path.join(".cache", "checkpoints.sqlite3")
+CHECKPOINT_PATH = os.environ.get("CHECKPOINT_PATH", DEFAULT_CHECKPOINT_PATH)
+
+class CheckpointStore:
+    """
+    SQLite-backed store of translation job checkpoints.
+
+    A job keeps its request parameters, the prepared state (subtitle list, chunks, translation memory, ...)
+    and every chunk translation as soon as it is finished, so an interrupted job can be resumed without
+    downloading the subtitles again or re-translating finished chunks.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        checkpoint_dir = os.path.dirname(path)
+        if checkpoint_dir and not os.path.exists(checkpoint_dir):
+            logger.info(f"Creating checkpoint directory: {checkpoint_dir}")
+            os.makedirs(checkpoint_dir, exist_ok=True)
+
+        # One connection shared by all threads, serialized through self._lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                state TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_chunks (
+                job_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                translated_text TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (job_id, chunk_index)
+            )
+        """)
+        self._conn.commit()
+        logger.info(f"Checkpoint store opened at: {path}")
+
+    def create_job(self, job_id: str, params: Dict[str, object]) -> None:
+        """Registers a new job with its request parameters, replacing any earlier job with the same ID."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM job_chunks WHERE job_id = ?", (job_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, status, params, state, error, created_at, updated_at) VALUES (?, ?, ?, NULL, NULL, ?, ?)",
+                (job_id, "running", json.dumps(params, ensure_ascii=False), now, now)
+            )
+            self._conn.commit()
+
+    def save_state(self, job_id: str, state: Dict[str, object]) -> None:
+        """Stores the prepared state of a job (it must be JSON serializable)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, updated_at = ? WHERE job_id = ?",
+                (json.dumps(state, ensure_ascii=False), time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def set_status(self, job_id: str, status: str, error: str = None) -> None:
+        """Updates the status of a job ("running", "completed", "failed" or "cancelled")."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, error, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def save_chunk(self, job_id: str, chunk_index: int, translated_text: str) -> None:
+        """Stores the finished translation of one chunk."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_chunks (job_id, chunk_index, translated_text, updated_at) VALUES (?, ?, ?, ?)",
+                (job_id, chunk_index, translated_text, now)
+            )
+            self._conn.execute("UPDATE jobs SET updated_at = ? WHERE job_id = ?", (now, job_id))
+            self._conn.commit()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, object]]:
+        """Returns a job with its parameters, state and finished chunks, or None if it does not exist."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, params, state, error, created_at, updated_at FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            chunk_rows = self._conn.execute(
+                "SELECT chunk_index, translated_text FROM job_chunks WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        status, params, state, error, created_at, updated_at = row
+        return {
+            "job_id": job_id, "status": status, "params": json.loads(params),
+            "state": json.loads(state) if state else None, "error": error,
+            "created_at": created_at, "updated_at": updated_at,
+            "completed_chunks": {chunk_index: translated_text for chunk_index, translated_text in chunk_rows}
+        }
+
+    def list_jobs(self, status: str = None) -> List[Dict[str, object]]:
+        """Lists jobs (newest first) with their status and progress, optionally filtered by status."""
+        query = """
+            SELECT jobs.job_id, jobs.status, jobs.params, jobs.error, jobs.updated_at, COUNT(job_chunks.chunk_index)
+            FROM jobs LEFT JOIN job_chunks ON jobs.job_id = job_chunks.job_id
+        """
+        params = []
+        if status is not None:
+            query += " WHERE jobs.status = ?"
+            params.append(status)
+        query += " GROUP BY jobs.job_id ORDER BY jobs.updated_at DESC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {"job_id": job_id, "status": job_status, "params": json.loads(job_params), "error": error,
+             "updated_at": updated_at, "completed_chunk_count": chunk_count}
+            for job_id, job_status, job_params, error, updated_at, chunk_count in rows
+        ]
+
+    def delete_job(self, job_id: str) -> None:
+        """Removes a job and its chunk checkpoints."""
+        with self._lock:
+            self._conn.execute("DELETE FROM job_chunks WHERE job_id = ?", (job_id,))
+            self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+            self._conn.commit()
+
+_default_store: Optional[CheckpointStore] = None
+_default_store_lock = threading.Lock()
+
+def get_checkpoint_store() -> Optional[CheckpointStore]:
+    """Returns the process-wide checkpoint store, or None if checkpoints are disabled or unavailable."""
+    global _default_store
+    if not CHECKPOINT_ENABLED:
+        return None
+    with _default_store_lock:
+        if _default_store is None:
+            try:
+                _default_store = CheckpointStore()
+            except Exception as e:
+                logger.error(f"Could not open checkpoint store at {CHECKPOINT_PATH}: {e}", exc_info=True)
+                return None
+        return _default_store
@@ -0,0 +1,124 @@
+import logging
+import os
+import statistics
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Planner parameters
+# Token budget for the numbered subtitle lines of one chunk, 0 falls back to fixed AGENT_CHUNK_SIZE slicing
+CHUNK_TOKEN_BUDGET = int(os.environ.get("AGENT_CHUNK_TOKEN_BUDGET", "1200"))
+# Gaps between cues at least this long (in seconds) are preferred as chunk boundaries
+CHUNK_PAUSE_SECONDS = float(os.environ.get("AGENT_CHUNK_PAUSE_SECONDS", "1.5"))
+# tiktoken encoding used to count tokens locally
+TOKENIZER_ENCODING = os.environ.get("AGENT_TOKENIZER_ENCODING", "o200k_base")
+# A chunk is only cut early at a pause once it holds at least this share of the token budget
+MIN_CHUNK_FILL_RATIO = 0.6
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+# --- Helper Functions ---
+
+def _get_encoding():
+    """Loads the tiktoken encoding once, returning None if tiktoken or its encoding files are unavailable."""
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            _encoding_loaded = True
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+            except Exception as e:
+                logger.warning(f"tiktoken encoding '{TOKENIZER_ENCODING}' unavailable ({type(e).__name__}), estimating token counts from characters instead.")
+                _encoding = None
+        return _encoding
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token estimate: about 4 ASCII characters per token and one token per non-ASCII character."""
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return max(1, round(ascii_chars / 4 + (len(text) - ascii_chars))) if text else 0
+
+def count_tokens(text: str) -> int:
+    """Counts the tokens of a text with the local tokenizer, or estimates them if it is unavailable."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return _estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def plan_chunks(start_ms: Sequence[int], end_ms: Sequence[int], numbered_lines: List[str], token_budget: int = CHUNK_TOKEN_BUDGET,
+                max_entries: int = None, pause_seconds: float = CHUNK_PAUSE_SECONDS) -> Tuple[List[Tuple[int, int]], List[int]]:
+    """
+    Packs consecutive subtitle entries into chunks of at most token_budget tokens.
+
+    When a chunk is full, it is cut at the longest pause between cues (if one of at least pause_seconds exists
+    after the chunk is MIN_CHUNK_FILL_RATIO full), so chunks tend to end where the speaker stops.
+
+    Args:
+        start_ms: Start time of each entry in milliseconds
+        end_ms: End time of each entry in milliseconds
+        numbered_lines: The "N. text" line sent to the LLM for each entry, in the same order
+        token_budget: Maximum tokens per chunk (a single longer entry still forms its own chunk)
+        max_entries: Maximum entries per chunk (optional)
+        pause_seconds: Minimum gap between cues that counts as a pause
+
+    Returns:
+        tuple: (ranges, token_counts) where ranges are (start, end) entry slices and token_counts the tokens per chunk
+    """
+    line_tokens = [count_tokens(line) + 1 for line in numbered_lines]  # +1 for the joining newline
+    pause_ms = int(pause_seconds * 1000)
+    min_fill_tokens = token_budget * MIN_CHUNK_FILL_RATIO
+    total_entries = len(numbered_lines)
+
+    ranges: List[Tuple[int, int]] = []
+    token_counts: List[int] = []
+    start = 0
+    while start < total_entries:
+        # Find the furthest end that still fits the budget
+        end, tokens = start, 0
+        while end < total_entries and (end == start or (tokens + line_tokens[end] <= token_budget
+                                                        and (not max_entries or end - start < max_entries))):
+            tokens += line_tokens[end]
+            end += 1
+
+        # Prefer cutting at the longest pause once the chunk is reasonably full
+        cut = end
+        if end < total_entries:
+            best_gap = -1
+            filled = 0
+            for position in range(start + 1, end + 1):
+                filled += line_tokens[position - 1]
+                if filled < min_fill_tokens:
+                    continue
+                gap = start_ms[position] - end_ms[position - 1]
+                if gap >= pause_ms and gap >= best_gap:
+                    best_gap, cut = gap, position
+
+        ranges.append((start, cut))
+        token_counts.append(sum(line_tokens[start:cut]))
+        start = cut
+    return ranges, token_counts
+
+def summarize_chunk_sizes(token_counts: List[int], entry_counts: List[int]) -> Dict[str, float]:
+    """Summarises the token and entry distribution of planned chunks."""
+    if not token_counts:
+        return {"chunks": 0}
+    ordered = sorted(token_counts)
+    return {
+        "chunks": len(token_counts),
+        "tokens_total": sum(token_counts),
+        "tokens_min": ordered[0],
+        "tokens_max": ordered[-1],
+        "tokens_mean": round(statistics.mean(ordered), 1),
+        "tokens_median": statistics.median(ordered),
+        "tokens_p90": ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+        "tokens_stdev": round(statistics.pstdev(ordered), 1),
+        "entries_min": min(entry_counts),
+        "entries_max": max(entry_counts)
+    }
@@ -2,12 +2,18 @@ from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound, Tran
 import re
 import os
 import time # For implementing retry delays
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.tools import tool
 import logging
 import yt_dlp
 import json
 import tempfile
 from dotenv import load_dotenv
+from tracing import span, traced
+from subtitle_io import convert_to_srt
 
 load_dotenv()
 
@@ -18,6 +24,8 @@ logger = logging.getLogger(__name__)
 # Retry parameters
 MAX_RETRIES = int(os.environ.get("YOUTUBE_API_MAX_RETRIES", "1"))
 RETRY_DELAY_SECONDS = int(os.environ.get("YOUTUBE_API_RETRY_DELAY_SECONDS", "3"))
+# Threads shared by all async callers for the blocking YouTube API and yt-dlp calls
+FETCH_MAX_WORKERS = int(os.environ.get("YOUTUBE_FETCH_MAX_WORKERS", "4"))
 if not logger.hasHandlers(): # Avoid adding multiple handlers if this module is reloaded
     handler = logging.StreamHandler()
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(module)s.%(funcName)s:%(lineno)d - %(message)s')
@@ -27,11 +35,6 @@ if not logger.hasHandlers(): # Avoid adding multiple handlers if this module is
 
 # --- Helper Functions ---
 
-def _convert_vtt_to_srt_time(vtt_time: str) -> str:
-    """Convert WebVTT time format to SRT time format"""
-    # VTT: 00:00:01.500 -> SRT: 00:00:01,500
-    return vtt_time.replace('.', ',')
-
 def _convert_yt_dlp_subtitles_to_srt(subtitles_data: list) -> str:
     """Convert yt-dlp subtitle data to SRT format"""
     srt_lines = []
@@ -56,6 +59,7 @@ def _convert_yt_dlp_subtitles_to_srt(subtitles_data: list) -> str:
     
     return "\n".join(srt_lines)
 
+@traced("yt_dlp.fetch_subtitles")
 def _fetch_subtitles_with_yt_dlp(video_url: str, language_code: str = None) -> tuple:
     """
     Fetch subtitles using yt-dlp as backup method
@@ -132,12 +136,9 @@ def _fetch_subtitles_with_yt_dlp(video_url: str, language_code: str = None) -> t
                 
                 vtt_file_path = os.path.join(temp_dir, vtt_files[0])
                 
-                # Parse VTT file and convert to SRT
-                with open(vtt_file_path, 'r', encoding='utf-8') as f:
-                    vtt_content = f.read()
-                
-                # Simple VTT to SRT conversion
-                srt_content = _convert_vtt_to_srt_format(vtt_content)
+                # Parse VTT file and convert to SRT in one pass
+                with open(vtt_file_path, 'r', encoding='utf-8-sig') as f:
+                    srt_content = convert_to_srt(f)
                 logger.info(f"Successfully converted yt-dlp VTT to SRT format")
                 
                 return srt_content, available_languages
@@ -146,44 +147,6 @@ def _fetch_subtitles_with_yt_dlp(video_url: str, language_code: str = None) -> t
         logger.error(f"yt-dlp failed to fetch subtitles: {str(e)}")
         raise e
 
-def _convert_vtt_to_srt_format(vtt_content: str) -> str:
-    """Convert VTT format to SRT format"""
-    lines = vtt_content.split('\n')
-    srt_lines = []
-    entry_num = 1
-    i = 0
-    
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        # Skip metadata lines and empty lines
-        if line.startswith('WEBVTT') or line.startswith('NOTE') or not line:
-            i += 1
-            continue
-        
-        # Look for timestamp lines (format: 00:00:01.500 --> 00:00:03.500)
-        if '-->' in line:
-            # Convert VTT time to SRT time
-            time_line = line.replace('.', ',')
-            
-            # Get subtitle text (next non-empty lines until empty line or next timestamp)
-            i += 1
-            text_lines = []
-            while i < len(lines) and lines[i].strip() and '-->' not in lines[i]:
-                text_lines.append(lines[i].strip())
-                i += 1
-            
-            if text_lines:
-                srt_lines.append(str(entry_num))
-                srt_lines.append(time_line)
-                srt_lines.extend(text_lines)
-                srt_lines.append("")  # Empty line
-                entry_num += 1
-        else:
-            i += 1
-    
-    return '\n'.join(srt_lines)
-
 def format_time_srt(time_seconds: float) -> str:
     """Converts seconds to SRT time format HH:MM:SS,mmm"""
     if time_seconds < 0:
@@ -219,6 +182,172 @@ def _extract_video_id(video_url: str) -> str:
     logger.error(f"Could not extract video ID from URL: {video_url}")
     raise ValueError(f"Could not extract video ID from URL: {video_url}")
 
+def _write_srt_file(output_srt_path: str, srt_content: str) -> None:
+    """Writes SRT content to output_srt_path, creating its directory if needed."""
+    output_dir = os.path.dirname(output_srt_path)
+    if output_dir and not os.path.exists(output_dir): # Ensure directory exists
+        logger.info(f"Creating output directory: {output_dir}")
+        os.makedirs(output_dir, exist_ok=True)
+
+    try:
+        with span("write_srt", path=output_srt_path):
+            with open(output_srt_path, 'w', encoding='utf-8') as f:
+                f.write(srt_content)
+        logger.info(f"Successfully wrote SRT content to: {output_srt_path}")
+    except IOError as e:
+        logger.error(f"IOError writing SRT file to {output_srt_path}: {str(e)}", exc_info=True)
+        raise IOError(f"Failed to write SRT file to {output_srt_path}: {str(e)}")
+    except Exception as e:
+        logger.error(f"Unexpected error writing SRT file to {output_srt_path}: {str(e)}", exc_info=True)
+        raise Exception(f"Unexpected error writing SRT file to {output_srt_path}: {str(e)}")
+
+def _available_languages(transcript_list_obj, video_id: str, video_url: str) -> list:
+    """Converts a youtube_transcript_api transcript list into the language dicts returned by list_available_languages."""
+    available_langs = []
+    for transcript_lang in transcript_list_obj:
+        available_langs.append({
+            'name': transcript_lang.language,
+            'code': transcript_lang.language_code,
+            'is_generated': transcript_lang.is_generated
+        })
+    
+    if not available_langs:
+        logger.warning(f"No subtitle languages found for video ID {video_id} (URL: {video_url}), though transcripts are not explicitly disabled.")
+        raise NoTranscriptFound(f"No subtitle languages found for video ID {video_id}, though transcripts are not explicitly disabled.")
+    
+    logger.info(f"Found {len(available_langs)} available languages for video ID {video_id} (URL: {video_url}).")
+    logger.debug(f"Available languages for {video_id}: {available_langs}")
+    return available_langs
+
+def _transcript_entries_to_srt(transcript_entries: list, video_id: str, language_code: str) -> str:
+    """Converts youtube_transcript_api entries ({'text', 'start', 'duration'}) into SRT content."""
+    if not transcript_entries: # Should be redundant if API raises NoTranscriptFound correctly
+        logger.warning(f"Transcript data for video ID {video_id} (lang: {language_code}) was unexpectedly empty after fetch.")
+        raise NoTranscriptFound(f"Transcript data for video ID {video_id} (lang: {language_code}) was unexpectedly empty after fetch.")
+
+    srt_content_lines = []
+    for i, entry in enumerate(transcript_entries):
+        start_time_seconds = entry['start'] 
+        duration_seconds = entry['duration']
+        text = entry['text'].strip()
+        end_time_seconds = start_time_seconds + duration_seconds
+
+        srt_content_lines.append(str(i + 1))
+        srt_content_lines.append(
+            f"{format_time_srt(start_time_seconds)} --> {format_time_srt(end_time_seconds)}"
+        )
+        srt_content_lines.append(text)
+        srt_content_lines.append("") # Blank line separator
+
+    return "\n".join(srt_content_lines)
+
+def _list_transcripts(video_id: str, attempt: int):
+    with span("youtube.list_transcripts", video_id=video_id, attempt=attempt + 1):
+        return YouTubeTranscriptApi.list_transcripts(video_id)
+
+def _get_transcript(video_id: str, language_code: str, attempt: int) -> list:
+    # Fetches a list of dictionaries: [{'text': '...', 'start': ..., 'duration': ...}, ...]
+    with span("youtube.get_transcript", video_id=video_id, language_code=language_code, attempt=attempt + 1):
+        return YouTubeTranscriptApi.get_transcript(video_id, languages=[language_code])
+
+def _log_failed_attempt(description: str, attempt: int, error: Exception) -> bool:
+    """Logs a failed YouTube API attempt and returns True if it should be retried after RETRY_DELAY_SECONDS."""
+    logger.error(f"Attempt {attempt + 1}/{MAX_RETRIES} failed to {description}: {str(error)}", exc_info=True)
+    if attempt + 1 < MAX_RETRIES:
+        logger.info(f"Retrying in {RETRY_DELAY_SECONDS} seconds...")
+        return True
+    logger.error(f"Maximum retry attempts ({MAX_RETRIES}) reached to {description}. Trying yt-dlp as fallback...")
+    return False
+
+def _fallback_result(description: str, error: Exception, fallback_result, fallback_error: Exception = None):
+    """
+    Returns the yt-dlp fallback result for a failed YouTube API call, or raises.
+
+    A missing or disabled transcript re-raises the original error; after exhausted retries both errors are reported.
+    """
+    if fallback_error is None and fallback_result:
+        logger.info(f"yt-dlp fallback succeeded to {description} after {type(error).__name__}")
+        return fallback_result
+    if fallback_error is None:
+        fallback_error = Exception("yt-dlp fallback returned nothing")
+    logger.error(f"yt-dlp fallback failed to {description}: {str(fallback_error)}")
+    if isinstance(error, (TranscriptsDisabled, NoTranscriptFound)):
+        raise error
+    raise Exception(f"Both youtube_transcript_api and yt-dlp failed. Primary error: {str(error)}. Fallback error: {str(fallback_error)}")
+
+def _call_with_fallback(call, convert, fallback, description: str):
+    """
+    Calls the YouTube API with call(attempt), retrying failures RETRY_DELAY_SECONDS apart, and falls back to yt-dlp.
+
+    A missing or disabled transcript is not retried but goes straight to the fallback. convert(result) turns a
+    successful API result into the return value outside the retry loop, so its errors (an empty transcript or
+    language list) are raised as they are, without a retry or the fallback.
+    """
+    error = Exception(f"No attempts made to {description} (YOUTUBE_API_MAX_RETRIES is {MAX_RETRIES})")
+    for attempt in range(MAX_RETRIES):
+        try:
+            logger.info(f"Attempt {attempt + 1}/{MAX_RETRIES} to {description}...")
+            result = call(attempt)
+        except (TranscriptsDisabled, NoTranscriptFound) as e:
+            logger.warning(f"Could not {description} on attempt {attempt + 1}: {type(e).__name__} - {str(e)}. Trying yt-dlp as fallback...")
+            error = e
+            break
+        except Exception as e:
+            error = e
+            if not _log_failed_attempt(description, attempt, e):
+                break
+            time.sleep(RETRY_DELAY_SECONDS)
+        else:
+            return convert(result)
+    try:
+        fallback_result = fallback()
+    except Exception as fallback_error:
+        return _fallback_result(description, error, None, fallback_error)
+    return _fallback_result(description, error, fallback_result)
+
+_fetch_executor: ThreadPoolExecutor | None = None
+_fetch_executor_lock = threading.Lock()
+
+def _get_fetch_executor() -> ThreadPoolExecutor:
+    """Returns the bounded thread pool the async fetchers run blocking calls on, creating it on first use."""
+    global _fetch_executor
+    with _fetch_executor_lock:
+        if _fetch_executor is None:
+            _fetch_executor = ThreadPoolExecutor(max_workers=max(1, FETCH_MAX_WORKERS), thread_name_prefix="youtube")
+        return _fetch_executor
+
+async def _run_blocking(function, *args):
+    """Runs a blocking call on the shared fetch executor, keeping the caller's trace and parent span."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_get_fetch_executor(), context.run, function, *args)
+
+async def _acall_with_fallback(call, convert, fallback, description: str):
+    """
+    Async counterpart of _call_with_fallback: the blocking calls run on the fetch executor and retry delays use
+    asyncio.sleep, so no thread is held while waiting and the fetch can be cancelled between attempts.
+    """
+    error = Exception(f"No attempts made to {description} (YOUTUBE_API_MAX_RETRIES is {MAX_RETRIES})")
+    for attempt in range(MAX_RETRIES):
+        try:
+            logger.info(f"Attempt {attempt + 1}/{MAX_RETRIES} to {description}...")
+            result = await _run_blocking(call, attempt)
+        except (TranscriptsDisabled, NoTranscriptFound) as e:
+            logger.warning(f"Could not {description} on attempt {attempt + 1}: {type(e).__name__} - {str(e)}. Trying yt-dlp as fallback...")
+            error = e
+            break
+        except Exception as e:
+            error = e
+            if not _log_failed_attempt(description, attempt, e):
+                break
+            await asyncio.sleep(RETRY_DELAY_SECONDS)
+        else:
+            return convert(result)
+    try:
+        fallback_result = await _run_blocking(fallback)
+    except Exception as fallback_error:
+        return _fallback_result(description, error, None, fallback_error)
+    return _fallback_result(description, error, fallback_result)
+
 # --- Tool Functions for LangGraph Agent ---
 @tool
 def list_available_languages(video_url: str) -> list:
@@ -243,73 +372,23 @@ def list_available_languages(video_url: str) -> list:
     logger.info(f"Attempting to list available languages for URL: {video_url}")
     video_id = _extract_video_id(video_url) 
     logger.debug(f"Extracted video ID: {video_id} for URL: {video_url}")
-    
-    transcript_list_obj = None
-    for attempt in range(MAX_RETRIES):
-        try:
-            logger.info(f"Attempt {attempt + 1}/{MAX_RETRIES} to list available languages for video ID {video_id}...")
-            transcript_list_obj = YouTubeTranscriptApi.list_transcripts(video_id)
-            logger.debug(f"Successfully listed transcripts for video ID {video_id} on attempt {attempt + 1}.")
-            break # Success, exit retry loop
-        except (TranscriptsDisabled, NoTranscriptFound) as e:
-            logger.warning(f"Error listing transcripts for video ID {video_id} (URL: {video_url}) on attempt {attempt + 1}: {type(e).__name__} - {str(e)}. Trying yt-dlp as fallback...")
-            # Try yt-dlp as fallback for these specific errors
-            try:
-                _, available_languages_fallback = _fetch_subtitles_with_yt_dlp(video_url)
-                if available_languages_fallback:
-                    logger.info(f"yt-dlp fallback succeeded for {type(e).__name__} error, found {len(available_languages_fallback)} languages")
-                    return available_languages_fallback
-                else:
-                    raise e  # If yt-dlp also fails, raise original error
-            except Exception as fallback_error:
-                logger.error(f"yt-dlp fallback failed for {type(e).__name__}: {str(fallback_error)}")
-                raise e  # Raise original error if fallback fails
-        except Exception as e:
-            logger.error(f"Attempt {attempt + 1}/{MAX_RETRIES} failed to list transcripts for video ID {video_id} (URL: {video_url}): {str(e)}", exc_info=True)
-            if attempt + 1 < MAX_RETRIES:
-                logger.info(f"Retrying in {RETRY_DELAY_SECONDS} seconds...")
-                time.sleep(RETRY_DELAY_SECONDS)
-            else:
-                logger.error(f"Maximum retry attempts ({MAX_RETRIES}) reached for listing transcripts for video ID {video_id}. Trying yt-dlp as fallback...")
-                # Try yt-dlp as fallback
-                try:
-                    _, available_languages_fallback = _fetch_subtitles_with_yt_dlp(video_url)
-                    if available_languages_fallback:
-                        logger.info(f"yt-dlp fallback succeeded, found {len(available_languages_fallback)} languages")
-                        return available_languages_fallback
-                    else:
-                        raise Exception("yt-dlp fallback returned no languages")
-                except Exception as fallback_error:
-                    logger.error(f"yt-dlp fallback also failed: {str(fallback_error)}")
-                    raise Exception(f"Both youtube_transcript_api and yt-dlp failed. Primary error: {str(e)}. Fallback error: {str(fallback_error)}")
-    if transcript_list_obj is None:
-        # This case should ideally be covered by exceptions in the loop, but as a fallback:
-        logger.error(f"Failed to obtain transcript list for {video_id} after all retries, and no specific exception was re-raised. This indicates an unexpected state.")
-        # Try yt-dlp as final fallback
-        try:
-            _, available_languages_fallback = _fetch_subtitles_with_yt_dlp(video_url)
-            if available_languages_fallback:
-                logger.info(f"yt-dlp final fallback succeeded")
-                return available_languages_fallback
-        except:
-            pass
-        raise Exception(f"Unknown error: Failed to list transcripts for video ID {video_id} after {MAX_RETRIES} attempts and fallback methods failed.")
+    return _call_with_fallback(
+        lambda attempt: _list_transcripts(video_id, attempt),
+        lambda transcript_list_obj: _available_languages(transcript_list_obj, video_id, video_url),
+        lambda: _fetch_subtitles_with_yt_dlp(video_url)[1],
+        f"list transcripts for video ID {video_id}"
+    )
 
-    available_langs = []
-    for transcript_lang in transcript_list_obj:
-        available_langs.append({
-            'name': transcript_lang.language,
-            'code': transcript_lang.language_code,
-            'is_generated': transcript_lang.is_generated
-        })
-    
-    if not available_langs:
-        logger.warning(f"No subtitle languages found for video ID {video_id} (URL: {video_url}), though transcripts are not explicitly disabled.")
-        raise NoTranscriptFound(f"No subtitle languages found for video ID {video_id}, though transcripts are not explicitly disabled.")
-    
-    logger.info(f"Found {len(available_langs)} available languages for video ID {video_id} (URL: {video_url}).")
-    logger.debug(f"Available languages for {video_id}: {available_langs}")
-    return available_langs
+async def _alist_available_languages(video_url: str) -> list:
+    """Async implementation of list_available_languages, used by its ainvoke()."""
+    logger.info(f"Attempting to list available languages for URL: {video_url}")
+    video_id = _extract_video_id(video_url)
+    return await _acall_with_fallback(
+        lambda attempt: _list_transcripts(video_id, attempt),
+        lambda transcript_list_obj: _available_languages(transcript_list_obj, video_id, video_url),
+        lambda: _fetch_subtitles_with_yt_dlp(video_url)[1],
+        f"list transcripts for video ID {video_id}"
+    )
 
 @tool
 def fetch_youtube_srt(video_url: str, language_code: str, output_srt_path: str) -> str:
@@ -338,127 +417,29 @@ def fetch_youtube_srt(video_url: str, language_code: str, output_srt_path: str)
     logger.info(f"Attempting to fetch SRT for URL: {video_url}, language: {language_code}, output: {output_srt_path}")
     video_id = _extract_video_id(video_url)
     logger.debug(f"Extracted video ID: {video_id} for URL: {video_url}")
+    srt_content = _call_with_fallback(
+        lambda attempt: _get_transcript(video_id, language_code, attempt),
+        lambda transcript_entries: _transcript_entries_to_srt(transcript_entries, video_id, language_code),
+        lambda: _fetch_subtitles_with_yt_dlp(video_url, language_code)[0],
+        f"fetch transcript for video ID {video_id}, language {language_code}"
+    )
+    _write_srt_file(output_srt_path, srt_content)
+    return output_srt_path
 
-    transcript_entries = None
-    for attempt in range(MAX_RETRIES):
-        try:
-            logger.info(f"Attempt {attempt + 1}/{MAX_RETRIES} to fetch transcript for video ID {video_id}, language {language_code}...")
-            # Fetches a list of dictionaries: [{'text': '...', 'start': ..., 'duration': ...}, ...]
-            transcript_entries = YouTubeTranscriptApi.get_transcript(video_id, languages=[language_code])
-            logger.debug(f"Successfully fetched transcript data on attempt {attempt + 1} for video ID {video_id}, language {language_code}. Entries: {len(transcript_entries)}")
-            break # Success, exit retry loop
-        except (NoTranscriptFound, TranscriptsDisabled) as e:
-            logger.warning(f"Error fetching transcript for video ID {video_id}, lang {language_code} (URL: {video_url}) on attempt {attempt + 1}: {type(e).__name__} - {str(e)}. Trying yt-dlp as fallback...")
-            # Try yt-dlp as fallback for these specific errors
-            try:
-                srt_content_fallback, _ = _fetch_subtitles_with_yt_dlp(video_url, language_code)
-                if srt_content_fallback:
-                    logger.info(f"yt-dlp fallback succeeded for {type(e).__name__} error, language {language_code}")
-                    # Save the content to file
-                    output_dir = os.path.dirname(output_srt_path)
-                    if output_dir and not os.path.exists(output_dir):
-                        logger.info(f"Creating output directory: {output_dir}")
-                        os.makedirs(output_dir, exist_ok=True)
-                    
-                    try:
-                        with open(output_srt_path, 'w', encoding='utf-8') as f:
-                            f.write(srt_content_fallback)
-                        logger.info(f"Successfully wrote yt-dlp SRT content to: {output_srt_path}")
-                        return output_srt_path
-                    except Exception as file_error:
-                        logger.error(f"Failed to write yt-dlp content to file: {str(file_error)}")
-                        raise e  # Raise original error if file writing fails
-                else:
-                    raise e  # If yt-dlp also fails, raise original error
-            except Exception as fallback_error:
-                logger.error(f"yt-dlp fallback failed for {type(e).__name__}: {str(fallback_error)}")
-                raise e  # Raise original error if fallback fails
-        except Exception as e:
-            logger.error(f"Attempt {attempt + 1}/{MAX_RETRIES} failed to fetch transcript for video ID {video_id}, lang {language_code} (URL: {video_url}): {str(e)}", exc_info=True)
-            if attempt + 1 < MAX_RETRIES:
-                logger.info(f"Retrying in {RETRY_DELAY_SECONDS} seconds...")
-                time.sleep(RETRY_DELAY_SECONDS)
-            else:
-                logger.error(f"Maximum retry attempts ({MAX_RETRIES}) reached for fetching transcript for video ID {video_id}, lang {language_code}. Trying yt-dlp as fallback...")
-                # Try yt-dlp as fallback
-                try:
-                    srt_content_fallback, _ = _fetch_subtitles_with_yt_dlp(video_url, language_code)
-                    if srt_content_fallback:
-                        logger.info(f"yt-dlp fallback succeeded for language {language_code}")
-                        # Save the content to file
-                        output_dir = os.path.dirname(output_srt_path)
-                        if output_dir and not os.path.exists(output_dir):
-                            logger.info(f"Creating output directory: {output_dir}")
-                            os.makedirs(output_dir, exist_ok=True)
-                        
-                        try:
-                            with open(output_srt_path, 'w', encoding='utf-8') as f:
-                                f.write(srt_content_fallback)
-                            logger.info(f"Successfully wrote yt-dlp SRT content to: {output_srt_path}")
-                            return output_srt_path
-                        except Exception as file_error:
-                            logger.error(f"Failed to write yt-dlp content to file: {str(file_error)}")
-                            raise IOError(f"Failed to write SRT file to {output_srt_path}: {str(file_error)}")
-                    else:
-                        raise Exception("yt-dlp fallback returned no content")
-                except Exception as fallback_error:
-                    logger.error(f"yt-dlp fallback also failed: {str(fallback_error)}")
-                    raise Exception(f"Both youtube_transcript_api and yt-dlp failed. Primary error: {str(e)}. Fallback error: {str(fallback_error)}")
-    if transcript_entries is None:
-        # This case should ideally be covered by exceptions in the loop, but as a fallback:
-        logger.error(f"Failed to obtain transcript entries for {video_id}, lang {language_code} after all retries, and no specific exception was re-raised. This indicates an unexpected state.")
-        # Try yt-dlp as final fallback
-        try:
-            srt_content_fallback, _ = _fetch_subtitles_with_yt_dlp(video_url, language_code)
-            if srt_content_fallback:
-                logger.info(f"yt-dlp final fallback succeeded for language {language_code}")
-                # Save the content to file
-                output_dir = os.path.dirname(output_srt_path)
-                if output_dir and not os.path.exists(output_dir):
-                    os.makedirs(output_dir, exist_ok=True)
-                
-                with open(output_srt_path, 'w', encoding='utf-8') as f:
-                    f.write(srt_content_fallback)
-                logger.info(f"Successfully wrote yt-dlp final fallback content to: {output_srt_path}")
-                return output_srt_path
-        except:
-            pass
-        raise Exception(f"Unknown error: Failed to fetch transcript for video ID {video_id} (lang: {language_code}) after {MAX_RETRIES} attempts and fallback methods failed.")
-
-    if not transcript_entries: # Should be redundant if API raises NoTranscriptFound correctly
-        logger.warning(f"Transcript data for video ID {video_id} (lang: {language_code}) was unexpectedly empty after fetch.")
-        raise NoTranscriptFound(f"Transcript data for video ID {video_id} (lang: {language_code}) was unexpectedly empty after fetch.")
-
-    srt_content_lines = []
-    for i, entry in enumerate(transcript_entries):
-        start_time_seconds = entry['start'] 
-        duration_seconds = entry['duration']
-        text = entry['text'].strip()
-        end_time_seconds = start_time_seconds + duration_seconds
-
-        srt_content_lines.append(str(i + 1))
-        srt_content_lines.append(
-            f"{format_time_srt(start_time_seconds)} --> {format_time_srt(end_time_seconds)}"
-        )
-        srt_content_lines.append(text)
-        srt_content_lines.append("") # Blank line separator
-
-    srt_content_string = "\n".join(srt_content_lines)
-
-    output_dir = os.path.dirname(output_srt_path)
-    if output_dir and not os.path.exists(output_dir): # Ensure directory exists
-        logger.info(f"Creating output directory: {output_dir}")
-        os.makedirs(output_dir, exist_ok=True)
-
-    try:
-        with open(output_srt_path, 'w', encoding='utf-8') as f:
-            f.write(srt_content_string)
-        logger.info(f"Successfully wrote SRT content to: {output_srt_path}")
-    except IOError as e:
-        logger.error(f"IOError writing SRT file to {output_srt_path}: {str(e)}", exc_info=True)
-        raise IOError(f"Failed to write SRT file to {output_srt_path}: {str(e)}")
-    except Exception as e:
-        logger.error(f"Unexpected error writing SRT file to {output_srt_path}: {str(e)}", exc_info=True)
-        raise Exception(f"Unexpected error writing SRT file to {output_srt_path}: {str(e)}")
-
+async def _afetch_youtube_srt(video_url: str, language_code: str, output_srt_path: str) -> str:
+    """Async implementation of fetch_youtube_srt, used by its ainvoke()."""
+    logger.info(f"Attempting to fetch SRT for URL: {video_url}, language: {language_code}, output: {output_srt_path}")
+    video_id = _extract_video_id(video_url)
+    srt_content = await _acall_with_fallback(
+        lambda attempt: _get_transcript(video_id, language_code, attempt),
+        lambda transcript_entries: _transcript_entries_to_srt(transcript_entries, video_id, language_code),
+        lambda: _fetch_subtitles_with_yt_dlp(video_url, language_code)[0],
+        f"fetch transcript for video ID {video_id}, language {language_code}"
+    )
+    await _run_blocking(_write_srt_file, output_srt_path, srt_content)
     return output_srt_path
+
+# ainvoke() of the tools (the async job graph and its extraction ToolNode) awaits these instead of running the
+# blocking implementations on a thread for the whole fetch, retry delays included
+list_available_languages.coroutine = _alist_available_languages
+fetch_youtube_srt.coroutine = _afetch_youtube_srt
@@ -0,0 +1,84 @@
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# HTTP connection pool shared by every chat model client
+# Maximum number of connections open to the API at once
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "100"))
+# Idle connections kept alive for reuse (no new TCP and TLS handshake per request), and for how many seconds
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "60"))
+
+class LLMClients:
+    """
+    The chat models of one job, passed to the nodes through the state instead of module globals.
+
+    translation translates and writes the translation memory, cascade (optional) translates every chunk first
+    and extraction (only in "llm" extraction mode) is the tool-calling subtitle extraction model.
+    """
+
+    __slots__ = ("translation", "cascade", "extraction")
+
+    def __init__(self, translation, cascade=None, extraction=None):
+        self.translation = translation
+        self.cascade = cascade
+        self.extraction = extraction
+
+_http_client: Optional[httpx.Client] = None
+_clients: Dict[Tuple[str, Tuple[Tuple[str, object], ...]], ChatOpenAI] = {}
+_clients_lock = threading.Lock()
+
+def _shared_http_client() -> httpx.Client:
+    """Returns the keep-alive connection pool shared by all clients, creating it on first use. Call with _clients_lock held."""
+    global _http_client
+    if _http_client is None:
+        _http_client = openai.DefaultHttpxClient(limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SECONDS
+        ))
+    return _http_client
+
+def get_chat_model(model: str, **settings) -> ChatOpenAI:
+    """
+    Returns the shared client for a model and its settings, creating it on first use.
+
+    Clients are long-lived and safe to use from several threads at once, so every job (and every Streamlit
+    session) with the same model and settings reuses one client and its pooled HTTP connections.
+
+    Args:
+        model: Model name (e.g. 'o3-mini')
+        **settings: Further ChatOpenAI settings (e.g. temperature); each combination gets its own client.
+                    max_retries defaults to 0, leaving 429 handling to rate_limiter
+
+    Returns:
+        ChatOpenAI: The shared client
+    """
+    # The rate limiter owns every 429 retry (shared pause, retry-after), so the SDK must not retry on its own first
+    settings.setdefault("max_retries", 0)
+    key = (model, tuple(sorted(settings.items())))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = ChatOpenAI(model=model, http_client=_shared_http_client(), **settings)
+            _clients[key] = client
+            logger.info(f"Created shared LLM client for {model}.")
+        return client
+
+def clear_chat_models() -> None:
+    """Drops every shared client and closes the connection pool (e.g. after the API key or base URL changed)."""
+    global _http_client
+    with _clients_lock:
+        _clients.clear()
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
@@ -1,5 +1,8 @@
 # prompts.py
 
+# Bump whenever the translation prompts change so cached translations from older prompts are not reused.
+PROMPT_VERSION = "2"
+
 SUBTITLE_EXTRACTION_SYSTEM_PROMPT = """
 You are an AI assistant specialized in extracting YouTube video subtitles.
 Your goal is to retrieve subtitles for a video in a specific language code that has already been determined and provided to you, and then save these subtitles to a file.
@@ -77,6 +80,195 @@ The full text of the original subtitles is:
 {subtitle_full_text}
 """
 
+TRANSLATION_CONTEXT_SECTION_SYSTEM_PROMPT = """
+You are an AI assistant helping to build a "translation memory" for a long video whose subtitles are too long to analyse at once.
+You will receive ONE SECTION of the subtitles (section {section_number} of {section_count}). Other sections are analysed separately and all partial results will be merged later.
+
+Based ONLY on this section, write a concise partial translation memory for translating into {target_language}:
+
+1. **Basis**: What happens in this section? What is the topic, the tone and the likely audience?
+2. **Glossary**: Important names (people, places, organizations), technical terms, jargon or recurring phrases in this section, each with its suggested translation into {target_language}.
+3. **Voices Description**: Who is talking in this section and what is their role or character.
+4. **Tips**: Anything in this section that will be hard to translate into {target_language} (tone, puns, idioms, cultural references) and how to handle it.
+
+Do not invent content that is not in this section. Keep it short; the merged memory has to fit into every translation request.
+
+The output should be structured clearly as follows:
+
+**Basis:**
+[2-3 sentences]
+
+**Glossary:**
+- [Original Term]: [Suggested Translation in {target_language}]
+- ...
+
+**Voices Description:**
+- [Voice]: [Description of It]
+- ...
+
+**Tips:**
+- [Tip]
+- ...
+"""
+
+TRANSLATION_CONTEXT_SECTION_HUMAN_PROMPT = """
+Please generate the partial translation memory for translating subtitles into **{target_language}**.
+Section {section_number} of {section_count} of the original subtitles is:
+
+{subtitle_section_text}
+"""
+
+TRANSLATION_CONTEXT_MERGE_SYSTEM_PROMPT = """
+You are an AI assistant tasked with creating a "translation memory" to ensure consistent and high-quality subtitle translation into {target_language}.
+The video was too long to analyse at once, so it was split into consecutive sections and a partial translation memory was written for each one.
+You will receive these partial memories in order. Merge them into ONE translation memory for the whole video:
+
+1. **Basis**: Summarise what the whole video is, its topic, tone and target audience.
+2. **Glossary**: Combine all glossaries. Remove duplicates, and when the same term was translated differently, choose ONE translation and use it consistently.
+3. **Voices Description**: Combine the speakers, merging entries that describe the same person.
+4. **Tips**: Combine the tips, dropping duplicates and keeping the ones that matter for the whole video.
+5. **Thinking**: A short free brainstorm about how to translate this video consistently from start to end.
+
+The output should be structured clearly as follows:
+
+**Basis:**
+[Your basis infos. Aim for 2-4 sentences.]
+
+**Glossary:**
+- [Original Term 1]: [Suggested Translation in {target_language}]
+- [Original Term 2]: [Suggested Translation in {target_language}]
+- ...
+
+**Voices Description:**
+- [Voice 1]: [Description of It]
+- [Voice 2]: [Description of It]
+- ...
+
+**Tips:**
+- [Tip 1]
+- [Tip 2]
+- ...
+
+**Thinking:**
+[Thinking process here, stop until think clear]
+
+This translation memory will be provided to the AI translating individual subtitle chunks.
+"""
+
+TRANSLATION_CONTEXT_MERGE_HUMAN_PROMPT = """
+Please merge the following {partial_count} partial translation memories (in video order) into one translation memory for translating subtitles into **{target_language}**:
+
+{partial_memories}
+"""
+
+SOURCE_ANALYSIS_SYSTEM_PROMPT = """
+You are an AI assistant analysing video subtitles ahead of translation. The same analysis will later be turned into a translation memory for SEVERAL target languages, so it must not depend on any target language.
+You will receive {section_description} of the original subtitles. Based only on it, write:
+
+1. **Basis**: What video is this (lecture, commercial, comedy, ...)? What is being talked about, in what tone, and who is the likely audience?
+2. **Key Terms**: Important names (people, places, organizations), technical terms, jargon and recurring phrases, each with a short explanation of what it means here. Keep the terms exactly as they appear in the original.
+3. **Voices Description**: How many people are talking, who they are and what their role or character is.
+4. **Difficulties**: Anything that will be hard to translate into another language (tone, puns, idioms, wordplay, cultural references) and why.
+
+Do not translate anything. Do not invent content that is not in the subtitles.
+
+The output should be structured clearly as follows:
+
+**Basis:**
+[2-4 sentences]
+
+**Key Terms:**
+- [Original Term]: [What it means in this video]
+- ...
+
+**Voices Description:**
+- [Voice]: [Description of It]
+- ...
+
+**Difficulties:**
+- [Difficulty]
+- ...
+"""
+
+SOURCE_ANALYSIS_HUMAN_PROMPT = """
+Please analyse {section_description} of the original subtitles:
+
+{subtitle_text}
+"""
+
+SOURCE_ANALYSIS_MERGE_SYSTEM_PROMPT = """
+You are an AI assistant analysing video subtitles ahead of translation. The same analysis will later be turned into a translation memory for SEVERAL target languages, so it must not depend on any target language.
+The video was too long to analyse at once, so it was split into consecutive sections and an analysis was written for each one.
+You will receive these partial analyses in order. Merge them into ONE analysis of the whole video: summarise the basis, combine the key terms and speakers without duplicates, and keep the difficulties that matter for the whole video.
+
+The output should be structured clearly as follows:
+
+**Basis:**
+[2-4 sentences]
+
+**Key Terms:**
+- [Original Term]: [What it means in this video]
+- ...
+
+**Voices Description:**
+- [Voice]: [Description of It]
+- ...
+
+**Difficulties:**
+- [Difficulty]
+- ...
+"""
+
+SOURCE_ANALYSIS_MERGE_HUMAN_PROMPT = """
+Please merge the following {partial_count} partial analyses (in video order) into one analysis of the whole video:
+
+{partial_analyses}
+"""
+
+TRANSLATION_CONTEXT_LOCALIZE_SYSTEM_PROMPT = """
+You are an AI assistant tasked with creating a "translation memory" to ensure consistent and high-quality subtitle translation into {target_language}.
+You will not see the subtitles themselves. Instead you receive a language-neutral analysis of the video (basis, key terms, speakers and difficulties).
+Turn it into the translation memory for {target_language}:
+
+1. **Basis**: Restate the video basis, adding what may be hard to understand for a {target_language} audience.
+2. **Glossary**: Give ONE translation into {target_language} for every key term, to be used consistently from start to end.
+3. **Voices Description**: Describe the speakers, including how their voice and register should come across in {target_language}.
+4. **Tips**: For every difficulty, explain how to handle it in {target_language}.
+5. **Thinking**: A short free brainstorm about how to translate this video into {target_language}.
+
+The output should be structured clearly as follows:
+
+**Basis:**
+[Your basis infos. Aim for 2-4 sentences.]
+
+**Glossary:**
+- [Original Term 1]: [Suggested Translation in {target_language}]
+- [Original Term 2]: [Suggested Translation in {target_language}]
+- ...
+
+**Voices Description:**
+- [Voice 1]: [Description of It]
+- [Voice 2]: [Description of It]
+- ...
+
+**Tips:**
+- [Tip 1]
+- [Tip 2]
+- ...
+
+**Thinking:**
+[Thinking process here, stop until think clear]
+
+This translation memory will be provided to the AI translating individual subtitle chunks.
+"""
+
+TRANSLATION_CONTEXT_LOCALIZE_HUMAN_PROMPT = """
+Please generate the translation memory for translating subtitles into **{target_language}**.
+The analysis of the original subtitles is:
+
+{source_analysis}
+"""
+
 CHUNK_TRANSLATION_SYSTEM_PROMPT = """
 You are an AI assistant specialized in translating subtitle chunks line by line into **{target_language}**.
 You will receive:
@@ -128,3 +320,72 @@ CHUNK_TRANSLATION_HUMAN_PROMPT = """
 
 Please provide the translation for the chunk above.
 """
+
+# Prefix-cache-friendly layout: the system message (instructions + translation memory) is byte-identical for
+# every chunk and repair request of a job, and everything that varies comes last in the human message.
+TRANSLATION_MEMORY_SECTION = """
+**Translation Memory:**
+{translation_memory}
+"""
+
+# Glossary entries of the translation memory whose source terms occur in the lines of one request
+CHUNK_GLOSSARY_SECTION = """
+**Glossary for These Lines (use these translations consistently):**
+{glossary_lines}
+
+---"""
+
+CHUNK_TRANSLATION_TAIL_HUMAN_PROMPT = """{chunk_glossary}
+**Current Subtitle Chunk to Translate into {target_language} (Strictly Preserve Line Numbers and Format as Plain Text; each input line is a single subtitle entry):**
+{numbered_subtitle_lines}
+---
+
+Please provide the translation for the chunk above.{retry_note}
+"""
+
+LINE_REPAIR_TAIL_HUMAN_PROMPT = """
+A previous translation of a subtitle chunk was missing some numbered lines, or returned them merged, duplicated or malformed.
+Translate ONLY the lines listed under "Lines to Translate", one line per requested number in the form "N. translated text".
+The context lines are for reference only; do NOT output them.
+{chunk_glossary}
+
+**Context (reference only, do not output):**
+{context_lines}
+
+---
+**Lines to Translate into {target_language}:**
+{numbered_subtitle_lines}
+---
+
+Please provide the translation for the requested lines only.
+"""
+
+LINE_REPAIR_SYSTEM_PROMPT = """
+You are an AI assistant fixing a few lines of a subtitle translation into **{target_language}**.
+A previous translation of a subtitle chunk was missing some numbered lines, or returned them merged, duplicated or malformed.
+You will receive:
+1.  A "Translation Memory" with the video summary and key terminology.
+2.  "Context" lines around the broken lines, with their existing translations where available. They are for reference only.
+3.  "Lines to Translate": the numbered original lines that need a translation.
+
+Your task is to:
+1.  Translate ONLY the lines listed under "Lines to Translate" into **{target_language}**, consistent with the context and the translation memory.
+2.  Output exactly one line per requested number, in the form "N. translated text", on a single line, starting with the original number, a period and a space.
+3.  Do NOT output context lines, explanations or any Markdown (NO ```).
+"""
+
+LINE_REPAIR_HUMAN_PROMPT = """
+**Translation Memory:**
+{translation_memory}
+
+---
+**Context (reference only, do not output):**
+{context_lines}
+
+---
+**Lines to Translate into {target_language}:**
+{numbered_subtitle_lines}
+---
+
+Please provide the translation for the requested lines only.
+"""
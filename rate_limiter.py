@@ -0,0 +1,333 @@
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+import openai
+from dotenv import load_dotenv
+
+from chunk_planner import count_tokens
+from tracing import record_span
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Rate limit parameters (per model, 0 disables the limit)
+# Requests per minute allowed for each model
+OPENAI_RPM_LIMIT = int(os.environ.get("OPENAI_RPM_LIMIT", "0"))
+# Tokens (prompt + completion) per minute allowed for each model
+OPENAI_TPM_LIMIT = int(os.environ.get("OPENAI_TPM_LIMIT", "0"))
+# How often a request rejected with HTTP 429 (or failing with a server or connection error) is retried before the error is raised
+OPENAI_RATE_LIMIT_RETRIES = int(os.environ.get("OPENAI_RATE_LIMIT_RETRIES", "5"))
+# Backoff used when a 429 response carries no retry-after header: base * 2^attempt seconds, capped
+RATE_LIMIT_BACKOFF_BASE_SECONDS = 2.0
+RATE_LIMIT_BACKOFF_MAX_SECONDS = 60.0
+# The completion is assumed to be about as long as the prompt until the actual usage is known
+COMPLETION_TOKEN_RATIO = 1.0
+# Transient server and connection errors are retried here as well, since the clients' own SDK retries are disabled
+TRANSIENT_ERRORS = (openai.APIConnectionError, openai.InternalServerError)
+# Coroutines cannot be woken by notify_all(), so they re-check the buckets at least this often while waiting
+ASYNC_WAIT_POLL_SECONDS = 1.0
+
+class TokenBucket:
+    """A bucket holding up to capacity units that refills continuously at capacity per minute."""
+
+    def __init__(self, capacity: float):
+        self.capacity = capacity
+        self.available = capacity
+        self._refill_per_second = capacity / 60.0
+        self._updated_at = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated_at) * self._refill_per_second)
+        self._updated_at = now
+
+    def seconds_until(self, amount: float) -> float:
+        """Seconds until amount units are available (0 if they already are). Call refill() first."""
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing / self._refill_per_second) if missing > 0 else 0.0
+
+class ModelRateLimiter:
+    """
+    Client-side RPM/TPM limiter for one model.
+
+    Callers block in acquire() (or await aacquire()) until both buckets can cover the request. Token usage is first estimated
+    and corrected once the response reports the actual usage. A 429 response pauses every caller of the
+    model for the retry-after period.
+    """
+
+    def __init__(self, model_name: str, rpm_limit: int = OPENAI_RPM_LIMIT, tpm_limit: int = OPENAI_TPM_LIMIT):
+        self.model_name = model_name
+        self.request_bucket = TokenBucket(rpm_limit) if rpm_limit > 0 else None
+        self.token_bucket = TokenBucket(tpm_limit) if tpm_limit > 0 else None
+        self._condition = threading.Condition()
+        self._paused_until = 0.0
+        self._waiting = 0
+        self._throttled_requests = 0
+        self._rate_limit_errors = 0
+
+    def _try_reserve(self, estimated_tokens: int) -> float:
+        """Takes the request's share if both buckets cover it and returns 0, otherwise the seconds to wait. Call with _condition held."""
+        wait_seconds = self._paused_until - time.monotonic()
+        for bucket, amount in ((self.request_bucket, 1), (self.token_bucket, estimated_tokens)):
+            if bucket is not None:
+                bucket.refill()
+                wait_seconds = max(wait_seconds, bucket.seconds_until(amount))
+        if wait_seconds > 0:
+            return wait_seconds
+        if self.request_bucket is not None:
+            self.request_bucket.available -= 1
+        if self.token_bucket is not None:
+            self.token_bucket.available -= min(estimated_tokens, self.token_bucket.capacity)
+        return 0.0
+
+    def _record_wait(self, started_at: float, started_at_ns: int) -> float:
+        """Counts and reports a request that had to wait for its share; returns the seconds waited."""
+        waited = time.monotonic() - started_at
+        if waited > 0.05:
+            with self._condition:
+                self._throttled_requests += 1
+            logger.info(f"Rate limiter delayed a {self.model_name} request by {waited:.1f}s.")
+            record_span("rate_limit_wait", started_at_ns, time.time_ns(), model=self.model_name)
+        return waited
+
+    def acquire(self, estimated_tokens: int) -> float:
+        """Blocks until the request fits both buckets, takes its share and returns the seconds spent waiting."""
+        started_at = time.monotonic()
+        started_at_ns = time.time_ns()
+        with self._condition:
+            self._waiting += 1
+            try:
+                while True:
+                    wait_seconds = self._try_reserve(estimated_tokens)
+                    if wait_seconds <= 0:
+                        break
+                    # Woken early by notify_all() when usage is corrected or a pause changes
+                    self._condition.wait(wait_seconds)
+            finally:
+                self._waiting -= 1
+        return self._record_wait(started_at, started_at_ns)
+
+    async def aacquire(self, estimated_tokens: int) -> float:
+        """Like acquire(), but waits with asyncio.sleep so the event loop keeps running (and the wait can be cancelled)."""
+        started_at = time.monotonic()
+        started_at_ns = time.time_ns()
+        with self._condition:
+            self._waiting += 1
+        try:
+            while True:
+                with self._condition:
+                    wait_seconds = self._try_reserve(estimated_tokens)
+                if wait_seconds <= 0:
+                    break
+                await asyncio.sleep(min(wait_seconds, ASYNC_WAIT_POLL_SECONDS))
+        finally:
+            with self._condition:
+                self._waiting -= 1
+        return self._record_wait(started_at, started_at_ns)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Corrects the token bucket by the difference between the estimated and the reported token usage."""
+        if self.token_bucket is None or actual_tokens is None:
+            return
+        with self._condition:
+            self.token_bucket.refill()
+            self.token_bucket.available = min(self.token_bucket.capacity,
+                                              self.token_bucket.available + estimated_tokens - actual_tokens)
+            self._condition.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Holds back every request for this model for the given number of seconds (e.g. after a 429)."""
+        with self._condition:
+            self._rate_limit_errors += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+    def utilisation(self) -> Dict[str, object]:
+        """Returns the current fill level of both buckets and the number of queued and throttled requests."""
+        with self._condition:
+            stats = {
+                "rpm_limit": self.request_bucket.capacity if self.request_bucket else None,
+                "tpm_limit": self.token_bucket.capacity if self.token_bucket else None,
+                "queued_requests": self._waiting,
+                "throttled_requests": self._throttled_requests,
+                "rate_limit_errors": self._rate_limit_errors,
+                "paused_seconds": round(max(0.0, self._paused_until - time.monotonic()), 1)
+            }
+            for name, bucket in (("rpm", self.request_bucket), ("tpm", self.token_bucket)):
+                if bucket is not None:
+                    bucket.refill()
+                    stats[f"{name}_utilisation"] = round(1 - max(bucket.available, 0) / bucket.capacity, 3)
+            return stats
+
+_limiters: Dict[str, ModelRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+# --- Helper Functions ---
+
+def get_rate_limiter(model_name: str) -> ModelRateLimiter:
+    """Returns the shared rate limiter of a model, creating it with the default limits on first use."""
+    with _limiters_lock:
+        if model_name not in _limiters:
+            _limiters[model_name] = ModelRateLimiter(model_name)
+        return _limiters[model_name]
+
+def configure_rate_limit(model_name: str, rpm_limit: int = 0, tpm_limit: int = 0) -> ModelRateLimiter:
+    """Replaces the limits of one model (e.g. when its quota differs from OPENAI_RPM_LIMIT/OPENAI_TPM_LIMIT)."""
+    with _limiters_lock:
+        _limiters[model_name] = ModelRateLimiter(model_name, rpm_limit, tpm_limit)
+        return _limiters[model_name]
+
+def get_rate_limit_utilisation() -> Dict[str, Dict[str, object]]:
+    """Returns the current utilisation of every model's rate limiter."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {model_name: limiter.utilisation() for model_name, limiter in limiters.items()}
+
+def _model_name(llm) -> str:
+    """Returns the model name of a chat model, also when it is wrapped (e.g. by bind_tools)."""
+    return getattr(llm, "model_name", None) or getattr(getattr(llm, "bound", None), "model_name", None) or "unknown"
+
+def _estimate_request_tokens(messages) -> int:
+    """Estimates the prompt plus completion tokens of a chat request."""
+    prompt_tokens = sum(count_tokens(message.content) for message in messages if isinstance(message.content, str))
+    return int(prompt_tokens * (1 + COMPLETION_TOKEN_RATIO))
+
+def _retry_after_seconds(error: openai.RateLimitError, attempt: int) -> float:
+    """Reads the wait time from the retry-after(-ms) headers of a 429 response, falling back to exponential backoff."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                # HTTP-date form
+                return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    backoff = min(RATE_LIMIT_BACKOFF_MAX_SECONDS, RATE_LIMIT_BACKOFF_BASE_SECONDS * 2 ** attempt)
+    return backoff * (0.5 + random.random() / 2)
+
+def _is_quota_exhausted(error: openai.RateLimitError) -> bool:
+    """A 429 caused by an exhausted quota will not go away by waiting."""
+    return getattr(error, "code", None) == "insufficient_quota"
+
+def _retry_wait_seconds(limiter: ModelRateLimiter, error: openai.APIError, attempt: int) -> float:
+    """
+    Returns how long the caller should sleep before retrying a failed request, or re-raises the error if it is final.
+
+    A 429 pauses every caller of the model for the retry-after period instead (the next acquire waits), so 0 is returned.
+    """
+    if attempt >= OPENAI_RATE_LIMIT_RETRIES or (isinstance(error, openai.RateLimitError) and _is_quota_exhausted(error)):
+        raise error
+    if not isinstance(error, openai.RateLimitError):
+        wait_seconds = min(RATE_LIMIT_BACKOFF_MAX_SECONDS, RATE_LIMIT_BACKOFF_BASE_SECONDS * 2 ** attempt) * (0.5 + random.random() / 2)
+        logger.warning(f"{limiter.model_name} request failed ({type(error).__name__}: {error}), retrying in {wait_seconds:.1f}s "
+                       f"(retry {attempt + 1}/{OPENAI_RATE_LIMIT_RETRIES}).")
+        return wait_seconds
+    wait_seconds = _retry_after_seconds(error, attempt)
+    logger.warning(f"{limiter.model_name} rate limit hit, pausing its requests for {wait_seconds:.1f}s "
+                   f"(retry {attempt + 1}/{OPENAI_RATE_LIMIT_RETRIES}).")
+    limiter.pause(wait_seconds)
+    now_ns = time.time_ns()
+    record_span("rate_limited_response", now_ns, now_ns, model=limiter.model_name, retry_after_seconds=round(wait_seconds, 3))
+    return 0.0
+
+def _usage_tokens(message) -> Optional[int]:
+    usage_metadata = getattr(message, "usage_metadata", None)
+    return usage_metadata.get("total_tokens") if usage_metadata else None
+
+# --- Rate-Limited Calls ---
+
+def invoke_with_rate_limit(llm, messages, **kwargs):
+    """Calls llm.invoke(messages) within the model's rate limits, waiting out 429 responses as instructed by the server and retrying transient errors."""
+    limiter = get_rate_limiter(_model_name(llm))
+    estimated_tokens = _estimate_request_tokens(messages)
+    for attempt in range(OPENAI_RATE_LIMIT_RETRIES + 1):
+        limiter.acquire(estimated_tokens)
+        try:
+            response = llm.invoke(messages, **kwargs)
+        except (openai.RateLimitError, *TRANSIENT_ERRORS) as e:
+            # A rejected request consumed no tokens, so its share is returned before the retry takes a new one
+            limiter.record_usage(estimated_tokens, 0)
+            time.sleep(_retry_wait_seconds(limiter, e, attempt))
+            continue
+        limiter.record_usage(estimated_tokens, _usage_tokens(response))
+        return response
+
+async def ainvoke_with_rate_limit(llm, messages, **kwargs):
+    """Awaits llm.ainvoke(messages) within the model's rate limits, waiting out 429 responses without blocking the event loop."""
+    limiter = get_rate_limiter(_model_name(llm))
+    estimated_tokens = _estimate_request_tokens(messages)
+    for attempt in range(OPENAI_RATE_LIMIT_RETRIES + 1):
+        await limiter.aacquire(estimated_tokens)
+        try:
+            response = await llm.ainvoke(messages, **kwargs)
+        except (openai.RateLimitError, *TRANSIENT_ERRORS) as e:
+            # A rejected request consumed no tokens, so its share is returned before the retry takes a new one
+            limiter.record_usage(estimated_tokens, 0)
+            await asyncio.sleep(_retry_wait_seconds(limiter, e, attempt))
+            continue
+        limiter.record_usage(estimated_tokens, _usage_tokens(response))
+        return response
+
+def stream_with_rate_limit(llm, messages, **kwargs):
+    """Streams llm.stream(messages) within the model's rate limits; a 429 is only retried before anything was received."""
+    limiter = get_rate_limiter(_model_name(llm))
+    estimated_tokens = _estimate_request_tokens(messages)
+    for attempt in range(OPENAI_RATE_LIMIT_RETRIES + 1):
+        limiter.acquire(estimated_tokens)
+        received_any = False
+        actual_tokens = None
+        stream = llm.stream(messages, **kwargs)
+        try:
+            for message_chunk in stream:
+                received_any = True
+                actual_tokens = _usage_tokens(message_chunk) or actual_tokens
+                yield message_chunk
+        except (openai.RateLimitError, *TRANSIENT_ERRORS) as e:
+            if received_any:
+                raise
+            limiter.record_usage(estimated_tokens, 0)
+            time.sleep(_retry_wait_seconds(limiter, e, attempt))
+            continue
+        finally:
+            stream.close()  # Also stops the underlying response when the caller aborts the stream early
+            # Runs when the caller stops early as well; without a reported usage the estimate stands
+            limiter.record_usage(estimated_tokens, actual_tokens if actual_tokens is not None else estimated_tokens)
+        return
+
+async def astream_with_rate_limit(llm, messages, **kwargs):
+    """Async counterpart of stream_with_rate_limit, iterating llm.astream(messages)."""
+    limiter = get_rate_limiter(_model_name(llm))
+    estimated_tokens = _estimate_request_tokens(messages)
+    for attempt in range(OPENAI_RATE_LIMIT_RETRIES + 1):
+        await limiter.aacquire(estimated_tokens)
+        received_any = False
+        actual_tokens = None
+        stream = llm.astream(messages, **kwargs)
+        try:
+            async for message_chunk in stream:
+                received_any = True
+                actual_tokens = _usage_tokens(message_chunk) or actual_tokens
+                yield message_chunk
+        except (openai.RateLimitError, *TRANSIENT_ERRORS) as e:
+            if received_any:
+                raise
+            limiter.record_usage(estimated_tokens, 0)
+            await asyncio.sleep(_retry_wait_seconds(limiter, e, attempt))
+            continue
+        finally:
+            await stream.aclose()  # Also stops the underlying response when the caller aborts or cancels the stream
+            # Runs when the caller stops early as well; without a reported usage the estimate stands
+            limiter.record_usage(estimated_tokens, actual_tokens if actual_tokens is not None else estimated_tokens)
+        return
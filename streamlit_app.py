@@ -13,6 +13,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from get_sub import list_available_languages
 from Agent import translate_video_api, EXTRACTION_MODEL_NAME, TRANSLATION_MODEL_NAME
 from languages import LANGUAGES
+from subtitle_io import iter_cues
+from subtitles import SubtitleTrack
 
 def get_text(key: str, **kwargs) -> str:
     """Get translated text based on current language"""
@@ -110,46 +112,18 @@ def extract_video_id(url: str) -> str:
             return match.group(1)
     return None
 
+def _cues_to_player_subtitles(cues) -> List[Dict]:
+    """Convert subtitle cues to subtitle objects with timestamps in seconds for the video player"""
+    return [
+        {'index': cue.number, 'start': cue.start_ms / 1000, 'end': cue.end_ms / 1000, 'text': cue.text}
+        for cue in cues
+    ]
+
 def parse_srt_content(srt_content: str) -> List[Dict]:
     """Parse SRT content and return list of subtitle objects with timestamps in seconds"""
-    subtitles = []
     if not srt_content:
-        return subtitles
-    
-    # SRT pattern to match subtitle blocks
-    pattern = re.compile(
-        r'(\d+)\s*\n'
-        r'(\d{2}:\d{2}:\d{2},\d{3})\s*-->\s*'
-        r'(\d{2}:\d{2}:\d{2},\d{3})\s*\n'
-        r'((?:.+\n?)+)', 
-        re.MULTILINE
-    )
-    
-    def srt_time_to_seconds(time_str):
-        """Convert SRT time format (HH:MM:SS,mmm) to seconds"""
-        time_parts = time_str.replace(',', '.').split(':')
-        hours = int(time_parts[0])
-        minutes = int(time_parts[1])
-        seconds = float(time_parts[2])
-        return hours * 3600 + minutes * 60 + seconds
-    
-    for match in pattern.finditer(srt_content):
-        index = int(match.group(1))
-        start_time = srt_time_to_seconds(match.group(2))
-        end_time = srt_time_to_seconds(match.group(3))
-        text = match.group(4).strip()
-        
-        # Clean up text - remove extra line breaks and spaces
-        text = ' '.join(line.strip() for line in text.splitlines() if line.strip())
-        
-        subtitles.append({
-            'index': index,
-            'start': start_time,
-            'end': end_time,
-            'text': text
-        })
-    
-    return subtitles
+        return []
+    return _cues_to_player_subtitles(iter_cues(srt_content))
 
 def create_video_player_with_subtitles(video_url: str, video_id: str, subtitles_data: List[Dict]):
     """Create a video player with synchronized subtitle display"""
@@ -549,8 +523,11 @@ def main():
                                                 with open(final_srt_path, 'r', encoding='utf-8') as f:
                                                     translated_content = f.read()
                                                 
-                                                # Parse subtitles for video player
-                                                parsed_subtitles = parse_srt_content(translated_content)
+                                                # Subtitles for video player (the job already returns them parsed)
+                                                if result.get("translated_sub_list"):
+                                                    parsed_subtitles = _cues_to_player_subtitles(SubtitleTrack.from_dicts(result["translated_sub_list"]))
+                                                else:
+                                                    parsed_subtitles = parse_srt_content(translated_content)
                                                 
                                                 # Create tabs for different views
                                                 tab1, tab2, tab3 = st.tabs([
@@ -0,0 +1,130 @@
+import io
+import logging
+import os
+import re
+from typing import Iterable, Iterator, TextIO, Union
+
+from subtitles import Cue, SubtitleTrack, srt_time_to_ms, format_srt_block
+
+logger = logging.getLogger(__name__)
+
+# "00:00:01,500 --> 00:00:03,000" (SRT) or "00:01.500 --> 00:03.000 align:start" (WebVTT, cue settings are ignored)
+_TIMING_PATTERN = re.compile(r"((?:\d+:)?\d{1,2}:\d{1,2}(?:[,.]\d{1,3})?)\s*-->\s*((?:\d+:)?\d{1,2}:\d{1,2}(?:[,.]\d{1,3})?)")
+# WebVTT blocks that are not cues
+_VTT_METADATA_PREFIXES = ("WEBVTT", "NOTE", "STYLE", "REGION")
+
+SubtitleSource = Union[str, TextIO, Iterable[str]]
+
+def _lines(source: SubtitleSource) -> Iterable[str]:
+    """Iterates the lines of subtitle content given as a string, or of an open file or other iterable of lines."""
+    return io.StringIO(source) if isinstance(source, str) else source
+
+def iter_cues(source: SubtitleSource, single_line: bool = True) -> Iterator[Cue]:
+    """
+    Parses SRT or WebVTT content line by line, yielding each cue as soon as its block is complete.
+
+    Works in a single pass over a string or an open file without holding the content in memory. CRLF line endings
+    and a byte order mark are accepted, WebVTT header, NOTE, STYLE and REGION blocks are skipped, and malformed
+    blocks (a bad timing line, no text) are dropped without affecting the cues around them. A missing blank line
+    between two cues is tolerated.
+
+    Args:
+        source: Subtitle content, an open text file or any iterable of lines
+        single_line: Join multi-line cue text with spaces (as sent to the LLM) instead of keeping the line breaks
+
+    Yields:
+        Cue: Numbered as in the file; cues without a numeric identifier (WebVTT) continue from the previous number
+    """
+    separator = " " if single_line else "\n"
+    identifier = None
+    timing = None
+    text_lines = []
+    skipping_block = False
+    last_number = 0
+    malformed_blocks = 0
+
+    def build_cue():
+        nonlocal last_number
+        number = int(identifier) if identifier and identifier.isdigit() else last_number + 1
+        last_number = number
+        return Cue(number, timing[0], timing[1], separator.join(text_lines))
+
+    for line_number, line in enumerate(_lines(source)):
+        line = line.strip()
+        if line_number == 0:
+            line = line.lstrip("\ufeff").strip()
+        if skipping_block:
+            skipping_block = bool(line)
+            continue
+        if not line:
+            if timing is not None and text_lines:
+                yield build_cue()
+            elif timing is not None or identifier is not None:
+                malformed_blocks += 1
+            identifier, timing, text_lines = None, None, []
+            continue
+
+        if "-->" in line:
+            if timing is not None:
+                # The blank line before this cue is missing; a number right before the timing line belongs to it
+                next_identifier = text_lines.pop() if text_lines and text_lines[-1].isdigit() else None
+                if text_lines:
+                    yield build_cue()
+                identifier, text_lines = next_identifier, []
+            match = _TIMING_PATTERN.search(line)
+            if match is None:
+                malformed_blocks += 1
+                identifier, timing, text_lines = None, None, []
+                skipping_block = True
+                continue
+            timing = (srt_time_to_ms(match.group(1)), srt_time_to_ms(match.group(2)))
+        elif timing is not None:
+            text_lines.append(line)
+        elif identifier is None and line.startswith(_VTT_METADATA_PREFIXES):
+            skipping_block = True
+        else:
+            # Cue number (SRT) or cue identifier (WebVTT); a second one before any timing replaces a stray first
+            if identifier is not None:
+                malformed_blocks += 1
+            identifier = line
+
+    if timing is not None and text_lines:
+        yield build_cue()
+    if malformed_blocks:
+        logger.warning(f"Skipped {malformed_blocks} malformed subtitle blocks.")
+
+def parse_track(source: SubtitleSource) -> SubtitleTrack:
+    """Parses SRT or WebVTT content into a subtitle track with single-line cue texts."""
+    track = SubtitleTrack()
+    for cue in iter_cues(source):
+        track.append(cue.number, cue.start_ms, cue.end_ms, cue.text)
+    return track
+
+def read_track(path: str) -> SubtitleTrack:
+    """Reads and parses an SRT or WebVTT file in one pass, without loading the whole file first."""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        return parse_track(f)
+
+def convert_to_srt(source: SubtitleSource) -> str:
+    """Converts SRT or WebVTT content into SRT, keeping the line breaks within cues."""
+    return "\n".join(format_srt_block(cue.number, cue.start_ms, cue.end_ms, cue.text) for cue in iter_cues(source, single_line=False))
+
+def write_srt(path: str, cues: Union[SubtitleTrack, Iterable[Cue]]) -> int:
+    """
+    Writes cues to an SRT file block by block, so the file is never built as one string in memory.
+
+    Returns:
+        int: Number of cues written
+    """
+    output_dir = os.path.dirname(path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    blocks = cues.srt_blocks() if isinstance(cues, SubtitleTrack) else (
+        format_srt_block(cue.number, cue.start_ms, cue.end_ms, cue.text) for cue in cues
+    )
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for block in blocks:
+            f.write(block if not written else "\n" + block)
+            written += 1
+    return written
@@ -0,0 +1,180 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+# Typecode of the integer columns (cue numbers, timestamps in milliseconds)
+_INT_TYPECODE = "q"
+
+def srt_time_to_ms(srt_time: str) -> int:
+    """Converts an SRT timestamp (HH:MM:SS,mmm, or [HH:]MM:SS.mmm as in WebVTT) into milliseconds."""
+    if len(srt_time) == 12:
+        # Fast path for the canonical form, which is what nearly every cue uses
+        return int(srt_time[0:2]) * 3_600_000 + int(srt_time[3:5]) * 60_000 + int(srt_time[6:8]) * 1000 + int(srt_time[9:12])
+    hms, _, milliseconds = srt_time.strip().replace('.', ',').partition(',')
+    seconds = 0
+    for part in hms.split(':'):  # WebVTT leaves out the hours below one hour
+        seconds = seconds * 60 + int(part)
+    return seconds * 1000 + int(milliseconds.ljust(3, '0')[:3] if milliseconds else 0)
+
+def ms_to_srt_time(milliseconds: int) -> str:
+    """Converts milliseconds into an SRT timestamp (HH:MM:SS,mmm)."""
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return "%02d:%02d:%02d,%03d" % (hours, minutes, seconds, milliseconds)
+
+def format_srt_block(number: int, start_ms: int, end_ms: int, text: str) -> str:
+    """Formats one cue as an SRT block, including the blank line that ends it."""
+    return f"{number}\n{ms_to_srt_time(start_ms)} --> {ms_to_srt_time(end_ms)}\n{text}\n"
+
+class Cue:
+    """One subtitle cue, created on demand when a SubtitleTrack is iterated or indexed."""
+
+    __slots__ = ("number", "start_ms", "end_ms", "text")
+
+    def __init__(self, number: int, start_ms: int, end_ms: int, text: str):
+        self.number = number
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.text = text
+
+    @property
+    def index(self) -> str:
+        """The cue number as it appears in the SRT file and in the numbered lines sent to the LLM."""
+        return str(self.number)
+
+    @property
+    def start_time(self) -> str:
+        return ms_to_srt_time(self.start_ms)
+
+    @property
+    def end_time(self) -> str:
+        return ms_to_srt_time(self.end_ms)
+
+    def to_dict(self) -> Dict[str, str]:
+        """Returns the cue in the original list-of-dicts form ('index', 'start_time', 'end_time', 'text')."""
+        return {'index': self.index, 'start_time': self.start_time, 'end_time': self.end_time, 'text': self.text}
+
+class SubtitleTrack:
+    """
+    Columnar store of subtitle cues: numbers and millisecond timestamps in compact integer arrays, texts in a list.
+
+    Parsing, chunking and finalizing share one track. A translated track is a view created with with_texts(),
+    which shares the number and timestamp columns of the original and only holds its own texts.
+    """
+
+    __slots__ = ("numbers", "start_ms", "end_ms", "texts")
+
+    def __init__(self, numbers: Iterable[int] = (), start_ms: Iterable[int] = (), end_ms: Iterable[int] = (),
+                 texts: Iterable[str] = ()):
+        self.numbers = numbers if isinstance(numbers, array) else array(_INT_TYPECODE, numbers)
+        self.start_ms = start_ms if isinstance(start_ms, array) else array(_INT_TYPECODE, start_ms)
+        self.end_ms = end_ms if isinstance(end_ms, array) else array(_INT_TYPECODE, end_ms)
+        self.texts = texts if isinstance(texts, list) else list(texts)
+
+    def append(self, number: int, start_ms: int, end_ms: int, text: str) -> None:
+        self.numbers.append(number)
+        self.start_ms.append(start_ms)
+        self.end_ms.append(end_ms)
+        self.texts.append(text)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __bool__(self) -> bool:
+        return bool(self.texts)
+
+    def __getitem__(self, position: int) -> Cue:
+        return Cue(self.numbers[position], self.start_ms[position], self.end_ms[position], self.texts[position])
+
+    def __iter__(self) -> Iterator[Cue]:
+        for position in range(len(self.texts)):
+            yield self[position]
+
+    def index_at(self, position: int) -> str:
+        """The SRT index (cue number as a string) of the cue at a position."""
+        return str(self.numbers[position])
+
+    def numbered_line(self, position: int) -> str:
+        """The "N. text" line the cue at a position is sent to the LLM as."""
+        return f"{self.numbers[position]}. {self.texts[position]}"
+
+    def with_texts(self, texts: List[str]) -> "SubtitleTrack":
+        """Returns a track with the same cues and timing but other texts, sharing the number and timestamp arrays."""
+        if len(texts) != len(self.texts):
+            raise ValueError(f"Expected {len(self.texts)} texts, got {len(texts)}")
+        return SubtitleTrack(self.numbers, self.start_ms, self.end_ms, texts)
+
+    def srt_blocks(self, positions: Iterable[int] = None) -> Iterator[str]:
+        """Yields the SRT block of every cue (or of the cues at the given positions)."""
+        for position in range(len(self.texts)) if positions is None else positions:
+            yield format_srt_block(self.numbers[position], self.start_ms[position], self.end_ms[position], self.texts[position])
+
+    def to_srt(self) -> str:
+        """Converts the track into an SRT formatted string."""
+        return "\n".join(self.srt_blocks())
+
+    def to_dicts(self) -> List[Dict[str, str]]:
+        """Returns the cues in the original list-of-dicts form, e.g. for callers that serialize them."""
+        return [cue.to_dict() for cue in self]
+
+    def to_json(self) -> Dict[str, list]:
+        """Returns the columns as JSON serializable lists (for checkpoints and batch job manifests)."""
+        return {"numbers": self.numbers.tolist(), "start_ms": self.start_ms.tolist(), "end_ms": self.end_ms.tolist(), "texts": self.texts}
+
+    @classmethod
+    def from_json(cls, data: Union[Dict[str, list], List[Dict[str, str]], "SubtitleTrack", None]) -> Optional["SubtitleTrack"]:
+        """Rebuilds a track from to_json() output; also accepts the list of dicts persisted by earlier versions."""
+        if data is None or isinstance(data, SubtitleTrack):
+            return data
+        if isinstance(data, list):
+            return cls.from_dicts(data)
+        return cls(data["numbers"], data["start_ms"], data["end_ms"], data["texts"])
+
+    @classmethod
+    def from_dicts(cls, cues: Iterable[Dict[str, str]]) -> "SubtitleTrack":
+        """Builds a track from dicts with 'index', 'start_time', 'end_time' and 'text'."""
+        track = cls()
+        for cue in cues:
+            track.append(int(cue['index']), srt_time_to_ms(cue['start_time']), srt_time_to_ms(cue['end_time']), cue['text'])
+        return track
+
+class SubtitleChunks(Sequence[str]):
+    """
+    The chunks of a track as a sequence of numbered chunk texts, rendered on access instead of stored.
+
+    positions holds the track positions that are translated (e.g. without repeated lines) in order, and
+    chunk i covers positions[bounds[i]:bounds[i + 1]].
+    """
+
+    __slots__ = ("track", "positions", "bounds")
+
+    def __init__(self, track: SubtitleTrack, positions: Iterable[int], bounds: Iterable[int]):
+        self.track = track
+        self.positions = positions if isinstance(positions, array) else array(_INT_TYPECODE, positions)
+        self.bounds = bounds if isinstance(bounds, array) else array(_INT_TYPECODE, bounds)
+
+    def __len__(self) -> int:
+        return max(0, len(self.bounds) - 1)
+
+    def __getitem__(self, chunk_index):
+        if isinstance(chunk_index, slice):
+            return [self[i] for i in range(*chunk_index.indices(len(self)))]
+        if chunk_index < 0:
+            chunk_index += len(self)
+        if not 0 <= chunk_index < len(self):
+            raise IndexError("chunk index out of range")
+        return "\n".join(self.track.numbered_line(position) for position in self.chunk_positions(chunk_index))
+
+    def chunk_positions(self, chunk_index: int) -> Sequence[int]:
+        """The track positions of the cues in a chunk."""
+        return self.positions[self.bounds[chunk_index]:self.bounds[chunk_index + 1]]
+
+    def to_json(self) -> Dict[str, list]:
+        return {"positions": self.positions.tolist(), "bounds": self.bounds.tolist()}
+
+    @classmethod
+    def from_json(cls, data: Union[Dict[str, list], List[str], "SubtitleChunks", None], track: SubtitleTrack) -> Optional[Sequence[str]]:
+        """Rebuilds the chunks of a track; a list of chunk texts persisted by earlier versions is returned as it is."""
+        if data is None or isinstance(data, (SubtitleChunks, list)):
+            return data
+        return cls(track, data["positions"], data["bounds"])
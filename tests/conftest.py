@@ -0,0 +1,164 @@
+import os
+import sys
+import threading
+import time
+
+# The modules live at the repository root and read their settings from the environment on import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+# Tests run offline: no cache, checkpoint, run log or trace of a real run may be read or written
+# (tests that need a cache or a checkpoint store get a temporary one from the fixtures below)
+for variable, value in {
+    "TRANSLATION_CACHE_ENABLED": "false",
+    "CHECKPOINT_ENABLED": "false",
+    "AGENT_RUN_LOG_PATH": "",
+    "AGENT_TRACE_DIR": "",
+    "OTEL_EXPORTER_OTLP_ENDPOINT": "",
+    "AGENT_EXTRACTION_MODE": "direct",
+    "CASCADE_MODEL": "",
+    "OPENAI_RPM_LIMIT": "0",
+    "OPENAI_TPM_LIMIT": "0",
+}.items():
+    os.environ[variable] = value
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import tool
+from pydantic import PrivateAttr
+
+import Agent
+import checkpoints
+import translation_cache
+
+# Chunk and line repair requests carry their numbered lines after these headings (CHUNK_TRANSLATION_HUMAN_PROMPT, LINE_REPAIR_HUMAN_PROMPT)
+LINE_HEADINGS = ("Current Subtitle Chunk", "Lines to Translate")
+ECHO_TRANSLATION_MEMORY = "**Glossary:**\n- Hello: 你好"
+# Served in place of YouTube subtitles: 30 one-second cues, long enough to be cut into several chunks,
+# with a repeated "[Music]" cue every seventh second
+TEST_VIDEO_URL = "https://www.youtube.com/watch?v=testvideo01"
+TEST_CUE_COUNT = 30
+TEST_CHUNK_SIZE = 10
+TEST_SRT = "\n".join(f"{number}\n00:00:{number:02},000 --> 00:00:{number:02},900\n{'[Music]' if number % 7 == 0 else f'Line {number}'}\n"
+                     for number in range(1, TEST_CUE_COUNT + 1))
+
+class EchoChatModel(BaseChatModel):
+    """
+    Offline stand-in for ChatOpenAI.
+
+    Chunk and line repair requests are answered by echoing their numbered lines with a "[zh]" marker, every
+    other request (the translation memory) with ECHO_TRANSLATION_MEMORY. Counts its requests and how many ran at once,
+    and reports a word count as token usage, with a system prompt it has seen before counted as a cached prefix.
+    """
+
+    model_name: str = "echo"
+    latency_seconds: float = 0.0
+    requests: int = 0
+    peak_in_flight: int = 0
+    _in_flight: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _seen_prefixes: set = PrivateAttr(default_factory=set)
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo"
+
+    def _respond(self, human_text: str) -> str:
+        heading = next((heading for heading in LINE_HEADINGS if heading in human_text), None)
+        if heading is None:
+            return ECHO_TRANSLATION_MEMORY
+        translated_lines = []
+        for line in human_text.split(heading, 1)[1].splitlines():
+            number, separator, text = line.partition(". ")
+            if separator and number.isdigit():
+                translated_lines.append(f"{number}. [zh] {text}")
+        return "\n".join(translated_lines)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        with self._lock:
+            self.requests += 1
+            self._in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+        try:
+            time.sleep(self.latency_seconds)
+            content = self._respond(str(messages[-1].content))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content, usage_metadata=self._usage(messages, content)))])
+
+    def _usage(self, messages, content: str) -> dict:
+        prefix = str(messages[0].content)
+        with self._lock:
+            cached_tokens = len(prefix.split()) if prefix in self._seen_prefixes else 0
+            self._seen_prefixes.add(prefix)
+        input_tokens = sum(len(str(message.content).split()) for message in messages)
+        output_tokens = len(content.split())
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens,
+                "input_token_details": {"cache_read": cached_tokens}}
+
+class FencingChatModel(EchoChatModel):
+    """Wraps every answer in a markdown fence, so validation rejects it."""
+
+    def _respond(self, human_text: str) -> str:
+        return f"```\n{super()._respond(human_text)}\n```"
+
+@pytest.fixture
+def translation_llm():
+    """An EchoChatModel for tests that pass it to nodes as the job's translation model."""
+    return EchoChatModel()
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    """Enables the translation cache on a temporary database."""
+    test_cache = translation_cache.TranslationCache(str(tmp_path / "translation_cache.sqlite3"))
+    monkeypatch.setattr(translation_cache, "TRANSLATION_CACHE_ENABLED", True)
+    monkeypatch.setattr(translation_cache, "_default_cache", test_cache)
+    return test_cache
+
+@pytest.fixture
+def checkpoint_store(monkeypatch, tmp_path):
+    """Enables checkpoints on a temporary database."""
+    store = checkpoints.CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    monkeypatch.setattr(checkpoints, "CHECKPOINT_ENABLED", True)
+    monkeypatch.setattr(checkpoints, "_default_store", store)
+    return store
+
+@pytest.fixture
+def transcript(monkeypatch, tmp_path):
+    """Serves TEST_SRT through Agent's subtitle tools and writes the job's files to a temporary directory."""
+
+    @tool
+    def list_available_languages(video_url: str) -> list:
+        """Lists the languages of the test transcript."""
+        return [{"name": "English", "code": "en", "is_generated": False}]
+
+    @tool
+    def fetch_youtube_srt(video_url: str, language_code: str, output_srt_path: str) -> str:
+        """Writes TEST_SRT to output_srt_path."""
+        with open(output_srt_path, "w", encoding="utf-8") as f:
+            f.write(TEST_SRT)
+        return output_srt_path
+
+    monkeypatch.setenv("TRANSCRIPT_OUTPUT_DIR", str(tmp_path / "transcripts"))
+    monkeypatch.setattr(Agent, "CHUNK_SIZE", TEST_CHUNK_SIZE)
+    monkeypatch.setattr(Agent, "list_available_languages", list_available_languages)
+    monkeypatch.setattr(Agent, "fetch_youtube_srt", fetch_youtube_srt)
+
+@pytest.fixture
+def api_llm(monkeypatch):
+    """Makes translate_video_api use one EchoChatModel for every model it creates."""
+    llm = EchoChatModel()
+    monkeypatch.setattr(Agent, "get_chat_model", lambda *args, **kwargs: llm)
+    return llm
+
+@pytest.fixture
+def translate(transcript, api_llm):
+    """Returns a function translating TEST_SRT with translate_video_api, asserting that the job succeeded."""
+
+    def run(**kwargs):
+        result = Agent.translate_video_api(TEST_VIDEO_URL, "en", "zh-CN", **kwargs)
+        assert result["success"], result.get("error")
+        return result
+    return run
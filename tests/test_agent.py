@@ -0,0 +1,247 @@
+import asyncio
+import json
+import os
+import queue
+import threading
+
+from langchain_core.messages import AIMessageChunk
+
+import Agent
+import tracing
+from conftest import ECHO_TRANSLATION_MEMORY, TEST_CUE_COUNT, TEST_VIDEO_URL, EchoChatModel, FencingChatModel
+from llm_clients import LLMClients
+from subtitles import SubtitleTrack
+
+def use_models(monkeypatch, *models):
+    """Makes Agent create the given model for each of their model names."""
+    models_by_name = {model.model_name: model for model in models}
+    monkeypatch.setattr(Agent, "get_chat_model", lambda model, **kwargs: models_by_name[model])
+
+def translated_texts(result) -> list:
+    return [entry["text"] for entry in result["translated_sub_list"]]
+
+def expected_texts(result) -> list:
+    return [f"[zh] {entry['text']}" for entry in result["sub_list"]]
+
+def test_translation_does_not_depend_on_the_number_of_workers(translate, api_llm):
+    api_llm.latency_seconds = 0.01
+
+    single_worker = translate(max_concurrent_chunks=1)
+    four_workers = translate(max_concurrent_chunks=4)
+
+    assert single_worker["total_chunks"] > 1
+    assert translated_texts(single_worker) == expected_texts(single_worker)
+    assert translated_texts(four_workers) == translated_texts(single_worker)
+
+def test_no_more_chunks_than_workers_are_translated_at_once(translate, api_llm):
+    api_llm.latency_seconds = 0.05
+
+    result = translate(max_concurrent_chunks=2)
+
+    assert result["total_chunks"] > 2
+    assert api_llm.requests == 1 + result["total_chunks"]
+    assert api_llm.peak_in_flight == 2
+
+def test_a_retried_chunk_keeps_its_retry_state_to_itself(translate, monkeypatch):
+    class FencingModel(EchoChatModel):
+        """Wraps the first answer for the chunk holding line 6 in a markdown fence."""
+
+        fenced: bool = False
+
+        def _respond(self, human_text: str) -> str:
+            content = super()._respond(human_text)
+            if "6. Line 6" in human_text and not self.fenced:
+                self.fenced = True
+                return f"```\n{content}\n```"
+            return content
+    llm = FencingModel(latency_seconds=0.01)
+    monkeypatch.setattr(Agent, "get_chat_model", lambda *args, **kwargs: llm)
+    progress_threads = set()
+
+    result = translate(max_concurrent_chunks=4, progress_callback=lambda *args: progress_threads.add(threading.get_ident()))
+
+    # Only that chunk was requested twice, and every chunk ended up translated
+    assert llm.requests == 1 + result["total_chunks"] + 1
+    assert translated_texts(result) == expected_texts(result)
+    # Progress is only ever reported from the calling thread
+    assert progress_threads == {threading.get_ident()}
+
+def test_long_transcripts_build_the_translation_memory_section_by_section(translation_llm, monkeypatch):
+    monkeypatch.setattr(Agent, "CONTEXT_SECTION_CHARS", 100)
+    sub_list = SubtitleTrack(range(1, 41), [0] * 40, [1000] * 40, [f"Line number {number}" for number in range(1, 41)])
+
+    result = Agent.generate_translation_context_node({"sub_list": sub_list, "target_language": "zh-CN",
+                                                      "llm_clients": LLMClients(translation=translation_llm)})
+
+    # Several partial memories plus at least one merge
+    assert translation_llm.requests > 2
+    assert result["translation_memory"]
+
+def test_group_texts_by_size_keeps_order_and_folds_a_short_tail():
+    assert Agent._group_texts_by_size(["aaaa", "bbbb", "cc"], 9, "\n") == ["aaaa\nbbbb", "cc"]
+    # Merge groups need two partials each, so a single leftover joins the previous group
+    assert Agent._group_texts_by_size(["aaaa", "bbbb", "cc"], 9, "\n", min_items=2) == ["aaaa\nbbbb\ncc"]
+
+def test_dropped_lines_are_repaired_without_translating_the_chunk_again(translate, monkeypatch):
+    class DroppingModel(EchoChatModel):
+        """Leaves line 5 out of its chunk translation."""
+
+        def _respond(self, human_text: str) -> str:
+            content = super()._respond(human_text)
+            if "Current Subtitle Chunk" in human_text:
+                return "\n".join(line for line in content.splitlines() if not line.startswith("5. "))
+            return content
+    llm = DroppingModel()
+    monkeypatch.setattr(Agent, "get_chat_model", lambda *args, **kwargs: llm)
+
+    result = translate()
+
+    # One translation memory request, one request per chunk and one repair request for the single dropped line
+    assert llm.requests == 1 + result["total_chunks"] + 1
+    assert translated_texts(result) == expected_texts(result)
+
+def test_stray_lines_are_dropped_and_merged_lines_repaired():
+    original_lines = {"1": "Hello", "2": "World", "3": "Bye"}
+
+    good_lines, lines_to_repair = Agent._find_lines_to_repair(original_lines, "1. 你好\n世界\n3. 再见\n9. 多余")
+
+    assert good_lines == {"3": "再见"}
+    assert lines_to_repair == ["1", "2"]
+
+def test_sync_api_runs_inside_a_running_event_loop(translate):
+    async def call_from_coroutine():
+        return translate()
+
+    result = asyncio.run(call_from_coroutine())
+
+    assert translated_texts(result) == expected_texts(result)
+
+def test_direct_extraction_needs_no_extraction_model(translate, api_llm, monkeypatch):
+    created_models = []
+    monkeypatch.setattr(Agent, "get_chat_model", lambda model, **kwargs: created_models.append(model) or api_llm)
+
+    result = translate(extraction_model="extraction-model", translation_model="translation-model")
+
+    assert created_models == ["translation-model"]
+    assert len(result["sub_list"]) == TEST_CUE_COUNT
+    assert translated_texts(result) == expected_texts(result)
+
+def test_repeated_lines_are_translated_once_and_filled_in_everywhere(translate):
+    result = translate()
+
+    dedup_stats = result["dedup_stats"]
+    assert dedup_stats["duplicate_entries"] == 3
+    assert dedup_stats["unique_entries"] + dedup_stats["duplicate_entries"] == len(result["sub_list"])
+    assert translated_texts(result) == expected_texts(result)
+
+def test_deduplicate_sub_list_maps_repeats_to_their_first_occurrence():
+    track = SubtitleTrack([1, 2, 3, 4], [0, 1000, 2000, 3000], [900, 1900, 2900, 3900], ["[Music]", "Hello", "[Music]", "[Music]"])
+
+    unique_positions, duplicate_index_map, dedup_stats = Agent._deduplicate_sub_list(track)
+
+    assert unique_positions == [0, 1]
+    assert duplicate_index_map == {"3": "1", "4": "1"}
+    assert dedup_stats["duplicate_entries"] == 2
+    assert dedup_stats["tokens_saved"] > 0
+
+def test_results_hold_subtitles_as_plain_dicts(translate):
+    result = translate()
+
+    assert set(result["sub_list"][0]) == {"index", "start_time", "end_time", "text"}
+    assert [cue["index"] for cue in result["translated_sub_list"]] == [cue["index"] for cue in result["sub_list"]]
+    assert json.loads(json.dumps(result["translated_sub_list"])) == result["translated_sub_list"]
+
+def test_one_job_translates_into_several_languages(transcript, api_llm):
+    result = Agent.translate_video_multi_api(TEST_VIDEO_URL, "en", ["zh-CN", "ja", "zh-CN"])
+
+    assert result["success"], result.get("error")
+    assert list(result["results"]) == ["zh-CN", "ja"]
+    for language, final_srt_path in result["final_srt_paths"].items():
+        assert final_srt_path.endswith(f"_{language}.srt") and os.path.exists(final_srt_path)
+    # The transcript is analysed once, then localised and translated per language
+    assert api_llm.requests == 1 + 2 * (1 + result["total_chunks"])
+
+def test_streaming_reports_lines_and_gives_the_same_result(translate, monkeypatch):
+    non_streamed = translate()
+    monkeypatch.setattr(Agent, "STREAM_TRANSLATION", True)
+    events = []
+
+    streamed = translate(progress_callback=lambda step, progress, message: events.append(step))
+
+    assert translated_texts(streamed) == translated_texts(non_streamed)
+    assert "translate_line" in events
+    # The partial preview is replaced by the final file
+    assert not os.path.exists(Agent._translated_srt_path({"original_srt_path": streamed["original_srt_path"],
+                                                          "target_language": "zh-CN"}, partial=True))
+
+def test_streamed_lines_are_parsed_like_validated_ones():
+    translated_text = "1.  Hallo\n2.Welt\nweiter\n3. Nochmal"
+
+    class PiecewiseModel:
+        """Streams translated_text in pieces that split lines and numbers."""
+
+        def stream(self, messages, **kwargs):
+            for piece in (translated_text[:6], translated_text[6:17], translated_text[17:]):
+                yield AIMessageChunk(content=piece)
+    line_events = queue.Queue()
+
+    result, _ = Agent._stream_chunk_translation(PiecewiseModel(), [], "1. Hello\n2. World\n3. Again", 0, line_events)
+
+    streamed = {line_index: text for _, line_index, text in line_events.queue}
+    assert streamed == Agent._split_numbered_chunk(translated_text)[0]
+    assert result == translated_text
+
+def test_cascade_escalates_only_chunks_the_cheap_model_fails(translate, monkeypatch):
+    translation_model = EchoChatModel(model_name="translation-model")
+    use_models(monkeypatch, translation_model, FencingChatModel(model_name="cheap-model"))
+
+    result = translate(translation_model="translation-model", cascade_model="cheap-model")
+
+    cascade_stats = result["cascade_stats"]
+    assert cascade_stats["escalated_chunks"] == cascade_stats["chunks"] == result["total_chunks"]
+    assert cascade_stats["escalation_rate"] == 1.0
+    assert translated_texts(result) == expected_texts(result)
+    assert translation_model.requests > result["total_chunks"]
+
+def test_cascade_keeps_chunks_the_cheap_model_translates(translate, monkeypatch):
+    translation_model = EchoChatModel(model_name="translation-model")
+    cheap_model = EchoChatModel(model_name="cheap-model")
+    use_models(monkeypatch, translation_model, cheap_model)
+
+    result = translate(translation_model="translation-model", cascade_model="cheap-model")
+
+    assert result["cascade_stats"]["escalated_chunks"] == 0
+    assert translated_texts(result) == expected_texts(result)
+    # The translation model only wrote the translation memory
+    assert translation_model.requests == 1
+    assert cheap_model.requests == result["total_chunks"]
+
+def test_chunk_requests_share_a_cacheable_prefix(translate):
+    result = translate()
+
+    assert result["prompt_cache_stats"]["hit_rate"] > 0
+    first_request = Agent._build_chunk_messages("1. Hello.", ECHO_TRANSLATION_MEMORY, "zh-CN")
+    other_request = Agent._build_chunk_messages("2. Michelle Obama laughs.", ECHO_TRANSLATION_MEMORY, "zh-CN")
+    assert first_request[0].content == other_request[0].content
+
+def test_job_spans_are_collected_and_exported_as_a_chrome_trace(translate, tmp_path):
+    with tracing.start_trace("test_job", enabled=True) as trace:
+        result = translate()
+
+    span_names = [span.name for span in trace.spans()]
+    assert span_names.count("chunk") == result["total_chunks"]
+    assert {"llm_call", "finalize_translation_node"} <= set(span_names)
+    with open(tracing.export_chrome_trace(trace, str(tmp_path / "job.trace.json")), encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+    assert len([event for event in events if event["ph"] == "X"]) == len(span_names)
+
+def test_chunk_lines_are_merged_into_every_position_of_their_index():
+    track = SubtitleTrack([1, 2, 3], [0, 1000, 2000], [900, 1900, 2900], ["Yeah.", "Hello", "Yeah."])
+    positions_by_index = Agent._positions_by_index(track, {"3": "1"})
+    texts = list(track.texts)
+
+    chunk_lines = Agent._chunk_lines_by_position("1. [zh] Yeah.\n2. [zh] Hello\n[TRANSLATION FAILED]", 0, positions_by_index)
+    Agent._merge_chunk_lines(texts, chunk_lines)
+
+    assert positions_by_index == {"1": [0, 2], "2": [1]}
+    assert texts == ["[zh] Yeah.", "[zh] Hello", "[zh] Yeah."]
@@ -0,0 +1,65 @@
+import asyncio
+import gc
+import warnings
+
+import pytest
+
+import Agent
+from conftest import TEST_VIDEO_URL, EchoChatModel
+from llm_clients import LLMClients
+
+def atranslate(llm_clients, video_url=TEST_VIDEO_URL, **kwargs):
+    return Agent.atranslate_video_api(video_url, "en", "zh-CN", llm_clients=llm_clients, **kwargs)
+
+def test_concurrent_async_jobs_match_the_sync_api(translate):
+    expected = translate(llm_clients=LLMClients(translation=EchoChatModel()))
+
+    async def run_two_jobs():
+        # Two videos (with the same test transcript), since jobs for the same video download to the same file
+        return await asyncio.gather(atranslate(LLMClients(translation=EchoChatModel(latency_seconds=0.01))),
+                                    atranslate(LLMClients(translation=EchoChatModel(latency_seconds=0.01)),
+                                               "https://www.youtube.com/watch?v=testvideo02"))
+
+    for result in asyncio.run(run_two_jobs()):
+        assert result["success"], result.get("error")
+        assert result["translated_sub_list"] == expected["translated_sub_list"]
+        for node, totals in expected["usage"]["by_node"].items():
+            assert [result["usage"]["by_node"][node][key] for key in ("requests", "input_tokens", "output_tokens")] == \
+                   [totals[key] for key in ("requests", "input_tokens", "output_tokens")]
+
+def test_async_chunks_respect_max_concurrent_chunks(transcript):
+    llm = EchoChatModel(latency_seconds=0.05)
+
+    result = asyncio.run(atranslate(LLMClients(translation=llm), max_concurrent_chunks=2))
+
+    assert result["success"], result.get("error")
+    assert result["total_chunks"] > 2
+    assert llm.peak_in_flight == 2
+
+def test_cancelled_job_is_checkpointed_and_resumes(transcript, checkpoint_store, api_llm):
+    async def cancel_after_first_chunk():
+        task = asyncio.create_task(atranslate(LLMClients(translation=EchoChatModel(latency_seconds=0.05)),
+                                              job_id="job-async", max_concurrent_chunks=1))
+        while not (checkpoint_store.get_job("job-async") or {}).get("completed_chunks"):
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    with warnings.catch_warnings(record=True) as caught_warnings:
+        warnings.simplefilter("always")
+        asyncio.run(cancel_after_first_chunk())
+        gc.collect()
+
+    assert not [warning for warning in caught_warnings if "never awaited" in str(warning.message)]
+    job = checkpoint_store.get_job("job-async")
+    assert job["status"] == "cancelled"
+    completed_chunk_count = len(job["completed_chunks"])
+
+    resumed = Agent.resume_translation_job("job-async")
+
+    assert resumed["success"], resumed.get("error")
+    assert 0 < completed_chunk_count < resumed["total_chunks"]
+    # The resumed job only translates the chunks the cancelled run did not finish
+    assert api_llm.requests == resumed["total_chunks"] - completed_chunk_count
+    assert [cue["text"] for cue in resumed["translated_sub_list"]] == [f"[zh] {cue['text']}" for cue in resumed["sub_list"]]
@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+
+import Agent
+import batch_jobs
+from conftest import TEST_VIDEO_URL, EchoChatModel, FencingChatModel
+
+def video(target_language):
+    return {"video_url": TEST_VIDEO_URL, "source_language_code": "en", "target_language": target_language}
+
+@pytest.fixture
+def batch_llm(monkeypatch, tmp_path):
+    """Answers local batch requests with an EchoChatModel of its own, so they are counted apart from online requests."""
+    monkeypatch.setattr(batch_jobs, "BATCH_JOBS_DIR", str(tmp_path / "batch_jobs"))
+    llm = EchoChatModel()
+    monkeypatch.setattr(batch_jobs, "get_chat_model", lambda *args, **kwargs: llm)
+    return llm
+
+def test_batch_job_submits_uncached_chunks_and_collects_every_video(translate, cache, api_llm, batch_llm, tmp_path):
+    online = translate()
+
+    manifest = batch_jobs.create_batch_job([video("zh-CN"), video("ja")], backend="local", jobs_dir=str(tmp_path / "jobs"))
+
+    # The zh-CN chunks are already cached by the online run
+    assert manifest["status"] == "submitted"
+    assert manifest["request_count"] == online["total_chunks"]
+    with open(os.path.join(manifest["job_dir"], batch_jobs.REQUESTS_FILE_NAME), encoding="utf-8") as f:
+        assert all(json.loads(line)["custom_id"].startswith("video-1-") for line in f)
+    online_requests = api_llm.requests
+
+    result = batch_jobs.collect_batch_job(manifest["job_dir"])
+
+    assert result["success"] and result["status"] == "collected"
+    assert [video_result["batch_chunks"] for video_result in result["videos"]] == [0, online["total_chunks"]]
+    assert batch_llm.requests == online["total_chunks"]
+    assert api_llm.requests == online_requests
+    with open(online["final_srt_path"], encoding="utf-8") as f:
+        online_srt = f.read()
+    for video_result in result["videos"]:
+        with open(video_result["final_srt_path"], encoding="utf-8") as f:
+            assert f.read() == online_srt
+    assert batch_jobs.get_batch_job_status(manifest["job_dir"]) == "collected"
+
+def test_rejected_batch_responses_are_translated_online(transcript, api_llm, monkeypatch, tmp_path):
+    monkeypatch.setattr(batch_jobs, "get_chat_model", lambda *args, **kwargs: FencingChatModel())
+    manifest = batch_jobs.create_batch_job([video("zh-CN")], backend="local", jobs_dir=str(tmp_path / "jobs"))
+
+    result = batch_jobs.collect_batch_job(manifest["job_dir"])
+
+    assert result["success"]
+    video_result = result["videos"][0]
+    assert video_result["batch_chunks"] == video_result["total_chunks"]
+    # One translation memory request, then one online retry per fenced batch response
+    assert api_llm.requests == 1 + video_result["total_chunks"]
+    with open(video_result["final_srt_path"], encoding="utf-8") as f:
+        assert "```" not in f.read()
+
+def test_prepared_chunks_are_finished_from_translations_made_elsewhere(transcript, api_llm):
+    prepared = Agent.prepare_chunk_translations(TEST_VIDEO_URL, "en", "zh-CN")
+    translator = EchoChatModel()
+    translations = {chunk_index: translator.invoke(messages).content for chunk_index, messages in prepared["chunk_messages"].items()}
+    requests_before = api_llm.requests
+
+    # The prepared state survives a round trip through a JSON manifest
+    finished = Agent.finish_chunk_translations(json.loads(json.dumps(prepared["state"])), translations)
+
+    assert len(translations) == finished["total_chunks"]
+    assert api_llm.requests == requests_before
+    with open(finished["final_srt_path"], encoding="utf-8") as f:
+        assert f.read().count("[zh] ") == len(prepared["state"]["sub_list"]["texts"])
+
+def test_batch_requests_go_to_the_cascade_model_and_its_failures_are_escalated(transcript, monkeypatch, tmp_path):
+    translation_model = EchoChatModel(model_name="translation-model")
+    cheap_model = EchoChatModel(model_name="cheap-model")
+    monkeypatch.setattr(Agent, "get_chat_model", lambda model, **kwargs: {"translation-model": translation_model, "cheap-model": cheap_model}[model])
+    batch_models = []
+    monkeypatch.setattr(batch_jobs, "get_chat_model", lambda model, **kwargs: batch_models.append(model) or FencingChatModel(model_name=model))
+    manifest = batch_jobs.create_batch_job([video("zh-CN")], translation_model="translation-model", cascade_model="cheap-model",
+                                           backend="local", jobs_dir=str(tmp_path / "jobs"))
+
+    result = batch_jobs.collect_batch_job(manifest["job_dir"])
+
+    assert result["success"]
+    assert batch_models == ["cheap-model"]
+    video_result = result["videos"][0]
+    # One translation memory request, then one escalated online translation per rejected batch response
+    assert translation_model.requests == 1 + video_result["total_chunks"]
+    assert cheap_model.requests == 0
+    with open(video_result["final_srt_path"], encoding="utf-8") as f:
+        assert "```" not in f.read()
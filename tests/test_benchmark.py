@@ -0,0 +1,29 @@
+import os
+
+import Agent
+import benchmark
+
+def test_benchmark_is_deterministic_and_leaves_no_state_behind():
+    tools = (Agent.list_available_languages, Agent.fetch_youtube_srt)
+    output_dir = os.environ.get("TRANSCRIPT_OUTPUT_DIR")
+    options = {"failure_rate": 0.1, "fence_rate": 0.2, "drop_rate": 0.1, "max_concurrent_chunks": 4, "trace_memory": False}
+
+    first = benchmark.run_benchmark(200, **options)
+    second = benchmark.run_benchmark(200, **options)
+
+    for key in ("chunks", "llm_requests", "translation_retries", "repair_requests", "rate_limit_retries",
+                "injected_fences", "injected_dropped_lines"):
+        assert first[key] == second[key], key
+    assert first["injected_fences"] > 0 and first["repair_requests"] > 0
+    assert first["translation_retries"] == first["injected_fences"]
+    assert (Agent.list_available_languages, Agent.fetch_youtube_srt) == tools
+    assert os.environ.get("TRANSCRIPT_OUTPUT_DIR") == output_dir
+
+def test_report_has_a_row_per_run():
+    report = benchmark.format_report([{"cues": 100, "chunks": 3, "wall_seconds": 0.5, "cues_per_second": 200.0,
+                                       "peak_memory_mb": None, "max_rss_mb": 80.0, "llm_requests": 4,
+                                       "translation_retries": 0, "repair_requests": 0, "rate_limit_retries": 0}])
+
+    header, row = report.splitlines()
+    assert header.split()[:2] == ["cues", "chunks"]
+    assert row.split()[:2] == ["100", "3"] and "-" in row.split()
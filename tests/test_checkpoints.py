@@ -0,0 +1,57 @@
+import Agent
+from checkpoints import CheckpointStore
+from conftest import TEST_VIDEO_URL, EchoChatModel
+
+class OutageModel(EchoChatModel):
+    """Echo model whose connection is lost for good from its fail_from-th request on."""
+
+    fail_from: int = 1
+
+    def _respond(self, human_text: str) -> str:
+        if self.requests >= self.fail_from:
+            raise RuntimeError("Connection lost")
+        return super()._respond(human_text)
+
+def test_store_keeps_params_state_and_finished_chunks(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    store.create_job("job", {"video_url": "url"})
+    store.save_state("job", {"translation_memory": "memory"})
+    store.save_chunk("job", 1, "2. 你好")
+    store.set_status("job", "failed", "boom")
+
+    job = CheckpointStore(str(tmp_path / "checkpoints.sqlite3")).get_job("job")
+
+    assert (job["status"], job["error"], job["params"]) == ("failed", "boom", {"video_url": "url"})
+    assert job["state"] == {"translation_memory": "memory"}
+    assert job["completed_chunks"] == {1: "2. 你好"}
+    assert [(listed["job_id"], listed["completed_chunk_count"]) for listed in store.list_jobs("failed")] == [("job", 1)]
+    store.create_job("job", {"video_url": "url"})
+    assert store.get_job("job")["completed_chunks"] == {}
+    store.delete_job("job")
+    assert store.get_job("job") is None
+
+def test_failed_job_resumes_with_only_the_unfinished_chunks(translate, checkpoint_store, api_llm, monkeypatch):
+    # The memory request and two chunk requests succeed, then the connection is lost
+    outage_llm = OutageModel(fail_from=4)
+    monkeypatch.setattr(Agent, "get_chat_model", lambda *args, **kwargs: outage_llm)
+    failed = Agent.translate_video_api(TEST_VIDEO_URL, "en", "zh-CN", max_concurrent_chunks=1, job_id="job-1")
+    assert not failed["success"]
+    job = checkpoint_store.get_job("job-1")
+    assert job["status"] == "failed"
+    assert len(job["completed_chunks"]) == 2
+    assert job["state"]["translation_memory"]
+
+    monkeypatch.setattr(Agent, "get_chat_model", lambda *args, **kwargs: api_llm)
+    resumed = Agent.resume_translation_job("job-1")
+
+    assert resumed["success"], resumed.get("error")
+    assert [cue["text"] for cue in resumed["translated_sub_list"]] == [f"[zh] {cue['text']}" for cue in resumed["sub_list"]]
+    # Neither the finished chunks nor the translation memory are requested again
+    assert api_llm.requests == resumed["total_chunks"] - 2
+    assert checkpoint_store.get_job("job-1")["status"] == "completed"
+    assert len(checkpoint_store.get_job("job-1")["completed_chunks"]) == resumed["total_chunks"]
+
+def test_unknown_job_cannot_be_resumed(checkpoint_store):
+    result = Agent.resume_translation_job("missing")
+
+    assert not result["success"] and "missing" in result["error"]
@@ -0,0 +1,65 @@
+from chunk_planner import count_tokens, plan_chunks, summarize_chunk_sizes
+
+def cues(count, gaps_ms=None, text="Our guest talks about the new book"):
+    """Returns start times, end times and numbered lines of count one-second cues, separated by gaps_ms (default 100 ms)."""
+    start_ms, end_ms, lines = [], [], []
+    time_ms = 0
+    for number in range(count):
+        start_ms.append(time_ms)
+        end_ms.append(time_ms + 1000)
+        lines.append(f"{number + 1}. {text}")
+        time_ms += 1000 + (gaps_ms or {}).get(number, 100)
+    return start_ms, end_ms, lines
+
+def tokens_of(lines):
+    return sum(count_tokens(line) + 1 for line in lines)
+
+def test_chunks_cover_every_entry_within_the_token_budget():
+    start_ms, end_ms, lines = cues(100)
+    budget = tokens_of(lines[:8])
+
+    ranges, token_counts = plan_chunks(start_ms, end_ms, lines, token_budget=budget)
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == 100
+    assert all(previous_end == start for (_, previous_end), (start, _) in zip(ranges, ranges[1:]))
+    assert max(token_counts) <= budget
+    assert sum(token_counts) == tokens_of(lines)
+
+def test_max_entries_caps_chunks_below_the_budget():
+    start_ms, end_ms, lines = cues(25)
+
+    ranges, _ = plan_chunks(start_ms, end_ms, lines, token_budget=100_000, max_entries=10)
+
+    assert ranges == [(0, 10), (10, 20), (20, 25)]
+
+def test_full_chunks_are_cut_at_the_longest_pause():
+    # Pauses after the 7th and the 8th cue, the second one longer
+    start_ms, end_ms, lines = cues(20, gaps_ms={6: 2000, 7: 3000})
+
+    ranges, _ = plan_chunks(start_ms, end_ms, lines, token_budget=tokens_of(lines[:10]), pause_seconds=1.5)
+
+    assert ranges[0] == (0, 8)
+
+def test_pauses_before_the_chunk_is_filled_are_ignored():
+    start_ms, end_ms, lines = cues(20, gaps_ms={1: 5000})
+
+    ranges, _ = plan_chunks(start_ms, end_ms, lines, token_budget=tokens_of(lines[:10]), pause_seconds=1.5)
+
+    assert ranges[0] == (0, 10)
+
+def test_an_entry_over_the_budget_forms_its_own_chunk():
+    start_ms, end_ms, lines = cues(3)
+    lines[1] = "2. " + "very long line " * 50
+
+    ranges, token_counts = plan_chunks(start_ms, end_ms, lines, token_budget=40)
+
+    assert (1, 2) in ranges
+    assert token_counts[ranges.index((1, 2))] > 40
+
+def test_chunk_size_summary():
+    stats = summarize_chunk_sizes([100, 200, 300], [5, 10, 15])
+
+    assert stats["chunks"] == 3 and stats["tokens_total"] == 600
+    assert (stats["tokens_min"], stats["tokens_max"], stats["tokens_median"]) == (100, 300, 200)
+    assert (stats["entries_min"], stats["entries_max"]) == (5, 15)
+    assert summarize_chunk_sizes([], []) == {"chunks": 0}
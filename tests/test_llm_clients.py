@@ -0,0 +1,30 @@
+import pytest
+
+import Agent
+import llm_clients
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    llm_clients.clear_chat_models()
+    yield
+    llm_clients.clear_chat_models()
+
+def test_clients_are_shared_per_model_and_settings():
+    client = llm_clients.get_chat_model("o3-mini")
+
+    assert llm_clients.get_chat_model("o3-mini") is client
+    assert llm_clients.get_chat_model("o3-mini", temperature=0.5) is not client
+    assert llm_clients.get_chat_model("gpt-4o-mini") is not client
+    assert client.max_retries == 0
+
+def test_job_clients_only_hold_the_models_the_job_needs():
+    direct = Agent.create_llm_clients("o3-mini", cascade_model_name="", extraction_mode="direct")
+    assert direct.translation is llm_clients.get_chat_model("o3-mini")
+    assert direct.cascade is None and direct.extraction is None
+
+    # A cascade onto the translation model itself is no cascade
+    assert Agent.create_llm_clients("o3-mini", cascade_model_name="o3-mini").cascade is None
+
+    with_cascade = Agent.create_llm_clients("o3-mini", cascade_model_name="gpt-4o-mini", extraction_mode="llm")
+    assert with_cascade.cascade is llm_clients.get_chat_model("gpt-4o-mini")
+    assert with_cascade.extraction is not None
@@ -0,0 +1,122 @@
+import httpx
+import openai
+import pytest
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from langchain_openai import ChatOpenAI
+
+import rate_limiter
+
+COMPLETION = {
+    "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "test-model",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "1. Hallo"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13}
+}
+
+# Long enough for an estimate of several hundred tokens
+LONG_PROMPT = [HumanMessage(content="Hello there " * 300)]
+
+class UsageFirstModel:
+    """Streaming stand-in whose first chunk already reports the usage of the whole response."""
+
+    model_name = "model-stream"
+
+    def stream(self, messages, **kwargs):
+        yield AIMessageChunk(content="1. Hallo", usage_metadata={"input_tokens": 10, "output_tokens": 3, "total_tokens": 13})
+        yield AIMessageChunk(content="\n2. Welt")
+
+@pytest.fixture
+def fake_api():
+    """Builds clients like Agent does, answering through a handler with the queued (status, headers) responses."""
+    responses, requests = [], []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        status, headers = responses.pop(0) if responses else (200, {})
+        if status == 200:
+            return httpx.Response(200, json=COMPLETION)
+        return httpx.Response(status, headers=headers, json={"error": {"message": "slow down", "type": "requests", "code": None}})
+
+    def chat_model(model: str) -> ChatOpenAI:
+        return ChatOpenAI(model=model, max_retries=0, http_client=httpx.Client(transport=httpx.MockTransport(handle)))
+    return responses, requests, chat_model
+
+def test_rate_limiter_owns_the_retries(fake_api):
+    responses, requests, chat_model = fake_api
+    responses.append((429, {"retry-after-ms": "10"}))
+    limiter = rate_limiter.configure_rate_limit("model-429")
+
+    response = rate_limiter.invoke_with_rate_limit(chat_model("model-429"), [HumanMessage(content="1. Hello")])
+
+    assert response.content == "1. Hallo"
+    # One 429 seen by the limiter (which paused the model), then one successful retry: no hidden SDK retries
+    assert len(requests) == 2
+    assert limiter.utilisation()["rate_limit_errors"] == 1
+
+def test_server_errors_are_retried_with_backoff(fake_api, monkeypatch):
+    responses, requests, chat_model = fake_api
+    responses.append((500, {}))
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_BACKOFF_BASE_SECONDS", 0.01)
+    limiter = rate_limiter.configure_rate_limit("model-500")
+
+    assert rate_limiter.invoke_with_rate_limit(chat_model("model-500"), [HumanMessage(content="1. Hello")]).content == "1. Hallo"
+    assert len(requests) == 2
+    assert limiter.utilisation()["rate_limit_errors"] == 0
+
+def test_exhausted_quota_is_not_retried(fake_api, monkeypatch):
+    responses, requests, chat_model = fake_api
+    monkeypatch.setattr(rate_limiter, "OPENAI_RATE_LIMIT_RETRIES", 3)
+    responses.append((429, {}))
+    rate_limiter.configure_rate_limit("model-quota")
+    # The 429 body names the exhausted quota
+    monkeypatch.setattr(rate_limiter, "_is_quota_exhausted", lambda error: True)
+
+    with pytest.raises(openai.RateLimitError):
+        rate_limiter.invoke_with_rate_limit(chat_model("model-quota"), [HumanMessage(content="1. Hello")])
+    assert len(requests) == 1
+
+def test_request_bucket_delays_requests_over_the_limit():
+    limiter = rate_limiter.ModelRateLimiter("model-rpm", rpm_limit=60)
+    for _ in range(60):
+        assert limiter.acquire(1) < 0.05
+    # The 61st request needs one refilled slot: a second at 60 requests per minute
+    assert 0.8 < limiter.acquire(1) < 1.5
+    assert limiter.utilisation()["throttled_requests"] == 1
+
+def test_token_bucket_is_corrected_by_the_reported_usage():
+    limiter = rate_limiter.ModelRateLimiter("model-tpm", tpm_limit=6000)
+    assert limiter.acquire(6000) < 0.05
+    # The request used far fewer tokens than estimated, which frees the bucket again
+    limiter.record_usage(6000, 100)
+
+    assert limiter.acquire(5000) < 0.05
+    assert limiter.utilisation()["tpm_utilisation"] > 0.8
+    # 900 tokens are left and the bucket refills 100 tokens per second, so 1000 take about a second
+    assert 0.5 < limiter.acquire(1000) < 2.0
+
+def test_rate_limit_error_pauses_every_caller_of_the_model():
+    limiter = rate_limiter.ModelRateLimiter("model-pause", rpm_limit=1000)
+    limiter.pause(0.3)
+
+    assert limiter.utilisation()["paused_seconds"] > 0
+    assert 0.2 < limiter.acquire(1) < 1.0
+    assert limiter.utilisation()["rate_limit_errors"] == 1
+
+def test_rejected_requests_are_not_charged_to_the_token_bucket(fake_api):
+    responses, requests, chat_model = fake_api
+    responses.append((429, {"retry-after-ms": "10"}))
+    limiter = rate_limiter.configure_rate_limit("model-refund", tpm_limit=60000)
+
+    rate_limiter.invoke_with_rate_limit(chat_model("model-refund"), LONG_PROMPT)
+
+    assert len(requests) == 2
+    # Only the 13 tokens of the answered request stay charged, not the estimate of the rejected one
+    assert limiter.token_bucket.available > 60000 - 100
+
+def test_streams_closed_early_correct_the_token_bucket():
+    limiter = rate_limiter.configure_rate_limit("model-stream", tpm_limit=60000)
+    stream = rate_limiter.stream_with_rate_limit(UsageFirstModel(), LONG_PROMPT)
+
+    assert next(stream).content == "1. Hallo"
+    stream.close()
+
+    assert limiter.token_bucket.available > 60000 - 100
@@ -0,0 +1,102 @@
+import logging
+
+import pytest
+
+from subtitle_io import convert_to_srt, iter_cues, parse_track, read_track, write_srt
+from subtitles import SubtitleChunks, SubtitleTrack
+
+SRT = """1
+00:00:01,000 --> 00:00:02,500
+Hello there.
+
+2
+00:00:03,000 --> 00:00:04,000
+Second line
+with a break.
+"""
+
+VTT = """WEBVTT
+Kind: captions
+
+NOTE This is a comment
+spanning two lines
+
+STYLE
+::cue { color: white }
+
+intro
+00:01.000 --> 00:02.500 align:start position:10%
+Hello there.
+
+00:03.000 --> 00:04.000
+Second line
+with a break.
+"""
+
+def cue_tuples(source, single_line=True):
+    return [(cue.number, cue.start_ms, cue.end_ms, cue.text) for cue in iter_cues(source, single_line)]
+
+EXPECTED = [(1, 1000, 2500, "Hello there."), (2, 3000, 4000, "Second line with a break.")]
+
+def test_srt_and_vtt_parse_to_the_same_cues():
+    assert cue_tuples(SRT) == EXPECTED
+    assert cue_tuples(VTT) == EXPECTED
+
+def test_byte_order_mark_and_crlf_line_endings_are_accepted():
+    assert cue_tuples("﻿" + SRT.replace("\n", "\r\n")) == EXPECTED
+
+def test_a_missing_blank_line_between_cues_is_tolerated():
+    srt = "1\n00:00:01,000 --> 00:00:02,500\nHello there.\n2\n00:00:03,000 --> 00:00:04,000\nSecond line\nwith a break.\n"
+
+    assert cue_tuples(srt) == EXPECTED
+
+def test_malformed_blocks_are_skipped_without_losing_their_neighbours(caplog):
+    srt = ("1\n00:00:01,000 --> 00:00:02,500\nHello there.\n\n"
+           "2\n00:00:02,600 --> garbage\nBroken timing.\n\n"
+           "3\n00:00:02,700 --> 00:00:02,800\n\n"
+           "4\n00:00:03,000 --> 00:00:04,000\nSecond line\nwith a break.\n")
+
+    with caplog.at_level(logging.WARNING, logger="subtitle_io"):
+        cues = cue_tuples(srt)
+
+    assert cues == [EXPECTED[0], (4, 3000, 4000, "Second line with a break.")]
+    assert "Skipped 2 malformed subtitle blocks" in caplog.text
+
+def test_multi_line_cues_keep_their_breaks_when_asked():
+    assert cue_tuples(SRT, single_line=False)[1][3] == "Second line\nwith a break."
+    assert convert_to_srt(VTT) == SRT
+
+def test_files_are_read_and_written_cue_by_cue(tmp_path):
+    path = tmp_path / "subtitles.vtt"
+    path.write_text("﻿" + VTT, encoding="utf-8")
+    track = read_track(str(path))
+
+    written = write_srt(str(tmp_path / "out" / "subtitles.srt"), track)
+
+    assert written == 2
+    assert (tmp_path / "out" / "subtitles.srt").read_text(encoding="utf-8") == track.to_srt()
+    assert parse_track(track.to_srt()).to_dicts() == track.to_dicts()
+
+def test_track_round_trips_through_json_and_dicts():
+    track = parse_track(SRT)
+
+    assert SubtitleTrack.from_json(track.to_json()).to_dicts() == track.to_dicts()
+    assert SubtitleTrack.from_json(track.to_dicts()).to_dicts() == track.to_dicts()
+    assert track.to_dicts()[0] == {"index": "1", "start_time": "00:00:01,000", "end_time": "00:00:02,500", "text": "Hello there."}
+
+def test_translated_track_shares_the_timing_columns():
+    track = parse_track(SRT)
+    translated = track.with_texts(["你好。", "第二行"])
+
+    assert translated.start_ms is track.start_ms and translated.numbers is track.numbers
+    assert [cue.text for cue in translated] == ["你好。", "第二行"]
+    with pytest.raises(ValueError):
+        track.with_texts(["only one"])
+
+def test_chunks_render_numbered_lines_of_their_positions():
+    track = SubtitleTrack([1, 2, 3, 4], [0, 1, 2, 3], [1, 2, 3, 4], ["a", "b", "a", "c"])
+    chunks = SubtitleChunks(track, [0, 1, 3], [0, 2, 3])
+
+    assert list(chunks) == ["1. a\n2. b", "4. c"]
+    assert chunks[-1] == "4. c"
+    assert list(SubtitleChunks.from_json(chunks.to_json(), track)) == list(chunks)
@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import tracing
+
+def test_spans_nest_across_threads_started_in_context():
+    with tracing.start_trace("job", enabled=True, job_id="job-1") as trace:
+        with tracing.span("prepare") as prepare_span:
+            tracing.set_span_attributes(entries=3)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [tracing.submit_in_context(executor, tracing.set_span_attributes, done=True,
+                                                 span_name="chunk", span_attributes={"chunk_index": index}) for index in range(2)]
+            for future in futures:
+                future.result()
+
+    spans = {span.name: span for span in trace.spans()}
+    root = spans["job"]
+    assert root.parent_id is None and root.attributes == {"job_id": "job-1"}
+    assert prepare_span.parent_id == root.span_id and prepare_span.attributes == {"entries": 3}
+    chunk_spans = [span for span in trace.spans() if span.name == "chunk"]
+    assert sorted(span.attributes["chunk_index"] for span in chunk_spans) == [0, 1]
+    assert all(span.parent_id == root.span_id and span.attributes["done"] and "queued_ms" in span.attributes for span in chunk_spans)
+
+def test_errors_are_recorded_and_traced_functions_keep_working():
+    @tracing.traced()
+    def failing():
+        raise ValueError("boom")
+
+    with tracing.start_trace("job", enabled=True) as trace:
+        with pytest.raises(ValueError):
+            failing()
+
+    failed_span = [span for span in trace.spans() if span.name == "failing"][0]
+    assert failed_span.error == "ValueError: boom"
+    assert trace.to_otlp()["resourceSpans"][0]["scopeSpans"][0]["spans"][1]["status"]["code"] == 2
+
+def test_nothing_is_recorded_outside_of_a_trace():
+    with tracing.start_trace("job", enabled=False) as trace:
+        with tracing.span("prepare") as prepare_span:
+            tracing.record_span("wait", 0, 1)
+
+    assert trace is None and prepare_span is None
+    assert tracing.export_trace(None, "job") is None
@@ -0,0 +1,130 @@
+import time
+
+import pytest
+
+import Agent
+import translation_cache
+from conftest import EchoChatModel
+from llm_clients import LLMClients
+from subtitles import SubtitleTrack
+from translation_cache import TranslationCache, make_cache_key
+
+KEY_PARTS = ("zh-CN", "model", "v1", "memory", "prefix_cache", "indexed")
+
+@pytest.mark.parametrize("changed_part", range(len(KEY_PARTS)))
+def test_cache_key_covers_everything_that_shapes_a_translation(changed_part):
+    changed_parts = list(KEY_PARTS)
+    changed_parts[changed_part] += "-changed"
+
+    assert make_cache_key("chunk", "1. Hello", *KEY_PARTS) == make_cache_key("chunk", "1. Hello", *KEY_PARTS)
+    assert make_cache_key("chunk", "1. Hello", *changed_parts) != make_cache_key("chunk", "1. Hello", *KEY_PARTS)
+    assert make_cache_key("line", "1. Hello", *KEY_PARTS) != make_cache_key("chunk", "1. Hello", *KEY_PARTS)
+
+def test_chunks_are_assembled_from_cached_lines_after_rechunking(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_chunk("1. Hello\n2. World", "1. 你好\n2. 世界", *KEY_PARTS)
+    cache.put_chunk("3. Thanks", "3. 谢谢", *KEY_PARTS)
+
+    assert cache.get_chunk("1. Hello\n2. World", *KEY_PARTS) == "1. 你好\n2. 世界"
+    assert cache.get_chunk("2. World\n3. Thanks", *KEY_PARTS) == "2. 世界\n3. 谢谢"
+    assert cache.get_chunk("3. Thanks\n4. Bye", *KEY_PARTS) is None
+    assert cache.get_chunk("1. Hello\n2. World", "ja", *KEY_PARTS[1:]) is None
+
+def test_cached_lines_are_only_reused_under_the_same_chunk_glossary(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_chunk("1. Hello Bob\n2. World", "1. 你好，鲍勃\n2. 世界", *KEY_PARTS, "- Bob: 鲍勃")
+
+    assert cache.get_chunk("2. World\n1. Hello Bob", *KEY_PARTS, "- Bob: 鲍勃") == "2. 世界\n1. 你好，鲍勃"
+    # A chunk whose request injects other glossary entries is translated again
+    assert cache.get_chunk("2. World\n1. Hello Bob", *KEY_PARTS, "- World: 世间") is None
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite3"), max_entries=3)
+    for key in ("a", "b", "c"):
+        cache.put(key, "line", key.upper())
+        time.sleep(0.01)
+    # The hit is only touched in memory, and must still protect "a" when the next write evicts
+    assert cache.get("a") == "A"
+    time.sleep(0.01)
+
+    cache.put("d", "line", "D")
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in ("a", "c", "d")] == ["A", "C", "D"]
+    assert cache.stats()["lines"] == 3
+
+def test_byte_limit_is_enforced(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite3"), max_bytes=25)
+    for key in ("a", "b", "c"):
+        cache.put(key, "line", key * 10)
+        time.sleep(0.01)
+
+    assert cache.stats()["bytes"] <= 25
+    assert cache.get("a") is None and cache.get("c") == "c" * 10
+
+def test_pending_hits_are_written_on_flush(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = TranslationCache(path)
+    cache.put("a", "line", "A")
+    time.sleep(0.01)
+    cache.get("a")
+
+    cache.flush()
+
+    created_at, last_accessed = TranslationCache(path)._conn.execute(
+        "SELECT created_at, last_accessed FROM translations WHERE key = 'a'"
+    ).fetchone()
+    assert last_accessed > created_at
+
+def test_second_run_is_served_from_the_cache(translate, cache, monkeypatch):
+    first_run = translate()
+    assert cache.stats()["chunks"] == first_run["total_chunks"]
+
+    second_llm = EchoChatModel()
+    monkeypatch.setattr(Agent, "get_chat_model", lambda *args, **kwargs: second_llm)
+    second_run = translate()
+
+    assert second_llm.requests == 0
+    assert second_run["translated_sub_list"] == first_run["translated_sub_list"]
+
+def test_stored_translation_memory_is_reused_until_invalidated(cache):
+    llm = EchoChatModel()
+    state = {"sub_list": SubtitleTrack.from_dicts([{"index": "1", "start_time": "00:00:00,000", "end_time": "00:00:01,000",
+                                                    "text": "Hello"}]),
+             "target_language": "zh-CN", "llm_clients": LLMClients(translation=llm)}
+
+    generated = Agent.generate_translation_context_node(state)
+    reused = Agent.generate_translation_context_node(state)
+    assert llm.requests == 1
+    assert reused == generated
+    assert cache.stats()["translation_memories"] == 1
+
+    assert translation_cache.invalidate_translation_memory(state["sub_list"], target_language="ja") == 0
+    assert translation_cache.invalidate_translation_memory(state["sub_list"], target_language="zh-CN") == 1
+    Agent.generate_translation_context_node(state)
+    assert llm.requests == 2
+
+def test_another_prompt_layout_misses_the_cache(translate, cache, api_llm, monkeypatch):
+    translate()
+    requests_before = api_llm.requests
+    monkeypatch.setattr(Agent, "PROMPT_LAYOUT", "classic")
+
+    result = translate()
+
+    # The stored translation memory is reused, every chunk is translated again
+    assert api_llm.requests - requests_before == result["total_chunks"]
+
+def test_clear_removes_translations_and_memories(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_chunk("1. Hello", "1. 你好", *KEY_PARTS)
+    cache.put_translation_memory("hash", "zh-CN", "model", "v1", "memory")
+
+    cache.clear()
+
+    assert cache.stats() == {"chunks": 0, "lines": 0, "bytes": 0, "translation_memories": 0}
+
+def test_cache_is_off_when_disabled(monkeypatch):
+    monkeypatch.setattr(translation_cache, "TRANSLATION_CACHE_ENABLED", False)
+
+    assert translation_cache.get_translation_cache() is None
+    assert translation_cache.invalidate_translation_memory() == 0
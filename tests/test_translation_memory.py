@@ -0,0 +1,46 @@
+import translation_memory
+from translation_memory import IndexedTranslationMemory, memory_for_chunk
+
+TRANSLATION_MEMORY = """**Basis:**
+A late-night talk show interview, recorded in front of a studio audience.
+
+**Glossary:**
+- Michelle Obama: 米歇尔·奥巴马
+- 30 Rock: 洛克菲勒广场30号
+- White House: 白宫
+- Chicago: 芝加哥
+
+**Voices Description:**
+- Host: playful, quick, teasing.
+- Guest: warm, relaxed, self-deprecating.
+
+**Thinking:**
+Notes of the model that wrote the memory."""
+
+def test_chunks_get_the_summary_and_only_their_glossary_entries():
+    summary, glossary = memory_for_chunk(TRANSLATION_MEMORY, "1. Michelle Obama remembers a trip to Chicago.")
+
+    assert glossary == ["- Michelle Obama: 米歇尔·奥巴马", "- Chicago: 芝加哥"]
+    assert "Voices Description" in summary and "playful" in summary
+    assert "白宫" not in summary and "Thinking" not in summary
+
+def test_glossary_terms_match_whole_words_aliases_and_plurals():
+    memory = IndexedTranslationMemory("**Glossary:**\n- Rock (Rock music): 摇滚\n- Cat / Kitty: 猫\n- 東京: Tokyo")
+
+    assert memory.glossary_for("Everyone at 30 Rockefeller") == []
+    assert memory.glossary_for("Two cats and a kitty") == ["- Cat / Kitty: 猫"]
+    assert memory.glossary_for("They love rock music.") == ["- Rock (Rock music): 摇滚"]
+    # Scripts without spaces match inside words
+    assert memory.glossary_for("東京タワー") == ["- 東京: Tokyo"]
+
+def test_summary_is_capped():
+    memory = IndexedTranslationMemory("**Basis:**\n" + "A long description. " * 50 + "\n**Glossary:**\n- A: B", summary_chars=200)
+
+    assert memory.is_indexed
+    assert len(memory.summary()) <= 200
+
+def test_memory_without_a_glossary_or_in_full_mode_is_sent_whole(monkeypatch):
+    assert memory_for_chunk("Just some notes.", "1. Hello") == ("Just some notes.", [])
+
+    monkeypatch.setattr(translation_memory, "MEMORY_INJECTION", "full")
+    assert memory_for_chunk(TRANSLATION_MEMORY, "1. Michelle Obama") == (TRANSLATION_MEMORY, [])
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+import usage_tracker
+from usage_tracker import UsageTracker, append_run_log, estimate_cost
+
+def test_summary_aggregates_per_node_model_and_chunk():
+    tracker = UsageTracker()
+    tracker.record("generate_translation_context", "o3-mini", {"requests": 1, "input_tokens": 1000, "output_tokens": 200})
+    tracker.record("translate_chunk", "o3-mini", {"requests": 1, "input_tokens": 500, "cached_input_tokens": 400, "output_tokens": 100}, chunk_index=0)
+    tracker.record("repair_translation", "gpt-4o-mini", {"requests": 1, "input_tokens": 100, "output_tokens": 10}, chunk_index=0)
+
+    summary = tracker.summary()
+
+    assert summary["total"]["requests"] == 3 and summary["total"]["input_tokens"] == 1600
+    assert set(summary["by_node"]) == {"generate_translation_context", "translate_chunk", "repair_translation"}
+    assert summary["by_chunk"][0]["requests"] == 2
+    assert summary["by_model"]["gpt-4o-mini"]["output_tokens"] == 10
+    assert summary["total"]["cost_usd"] == pytest.approx(sum(totals["cost_usd"] for totals in summary["by_node"].values()))
+
+def test_cached_input_tokens_are_billed_at_the_cached_price():
+    # o3-mini: $1.10 input, $0.55 cached input, $4.40 output per million tokens
+    assert estimate_cost("o3-mini", {"input_tokens": 1_000_000, "cached_input_tokens": 500_000, "output_tokens": 0}) == pytest.approx(1.10 / 2 + 0.55 / 2)
+    assert estimate_cost("gpt-4o-mini-2024-07-18", {"output_tokens": 1_000_000}) == pytest.approx(0.60)
+    assert estimate_cost("unknown-model", {"input_tokens": 1}) is None
+
+def test_unknown_prices_make_the_total_unknown():
+    tracker = UsageTracker()
+    tracker.record("translate_chunk", "o3-mini", {"requests": 1, "input_tokens": 10})
+    tracker.record("translate_chunk", "unknown-model", {"requests": 1, "input_tokens": 10})
+
+    summary = tracker.summary()
+
+    assert summary["total"]["cost_usd"] is None
+    assert summary["by_model"]["o3-mini"]["cost_usd"] is not None
+
+def test_trackers_combine_and_jobs_are_logged(tmp_path):
+    first, second = UsageTracker(), UsageTracker()
+    first.record("translate_chunk", "o3-mini", {"requests": 1})
+    second.record("translate_chunk", "o3-mini", {"requests": 2})
+    log_path = tmp_path / "logs" / "run_log.jsonl"
+
+    append_run_log({"job_id": "job", "usage": UsageTracker.combine([first, second]).summary()}, str(log_path))
+    append_run_log({"job_id": "disabled"}, "")
+
+    records = [json.loads(line) for line in log_path.read_text(encoding="utf-8").splitlines()]
+    assert [record["job_id"] for record in records] == ["job"]
+    assert records[0]["usage"]["total"]["requests"] == 3 and "logged_at" in records[0]
+    assert usage_tracker.RUN_LOG_PATH == ""
+
+def test_jobs_report_their_usage_per_node(translate):
+    result = translate()
+
+    by_node = result["usage"]["by_node"]
+    assert by_node["generate_translation_context"]["requests"] == 1
+    assert by_node["translate_chunk"]["requests"] == result["total_chunks"]
+    assert result["usage"]["total"]["input_tokens"] > 0
@@ -0,0 +1,252 @@
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+import uuid
+from typing import Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Tracing parameters (tracing is off unless a trace directory or an OTLP endpoint is configured)
+# Directory every traced job writes its Chrome trace-event JSON to (open it in chrome://tracing or ui.perfetto.dev)
+TRACE_DIR = os.environ.get("AGENT_TRACE_DIR", "").strip()
+# OTLP/HTTP collector the spans of every traced job are sent to as JSON, e.g. http://localhost:4318
+OTLP_ENDPOINT = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "").strip()
+OTLP_TIMEOUT_SECONDS = 5
+SERVICE_NAME = os.environ.get("OTEL_SERVICE_NAME", "llm-youtube-sub-translation-agent")
+TRACING_ENABLED = bool(TRACE_DIR or OTLP_ENDPOINT)
+
+class Span:
+    """One timed operation of a trace with its attributes, its parent span and the thread it ran on."""
+
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "thread_id", "thread_name", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, object], start_ns: int = None):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns = None
+        current_thread = threading.current_thread()
+        self.thread_id = current_thread.ident
+        self.thread_name = current_thread.name
+        self.attributes = {key: value for key, value in attributes.items() if value is not None}
+        self.error = None
+
+    def set_attributes(self, **attributes) -> None:
+        self.attributes.update({key: value for key, value in attributes.items() if value is not None})
+
+class Trace:
+    """The finished spans of one job, exportable as Chrome trace events or as an OTLP/JSON request."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._spans: List[Span] = []
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return sorted(self._spans, key=lambda span: span.start_ns)
+
+    def to_chrome_trace(self) -> Dict[str, object]:
+        """Returns the trace in the Chrome trace-event format (complete "X" events, one row per thread)."""
+        process_id = os.getpid()
+        thread_rows: Dict[int, int] = {}
+        events = [{"name": "process_name", "ph": "M", "pid": process_id, "tid": 0, "args": {"name": self.name}}]
+        for span in self.spans():
+            if span.thread_id not in thread_rows:
+                thread_rows[span.thread_id] = len(thread_rows) + 1
+                events.append({"name": "thread_name", "ph": "M", "pid": process_id, "tid": thread_rows[span.thread_id],
+                               "args": {"name": span.thread_name}})
+            args = dict(span.attributes, span_id=span.span_id, parent_id=span.parent_id)
+            if span.error:
+                args["error"] = span.error
+            events.append({
+                "name": span.name, "cat": span.name.split(".")[0], "ph": "X", "pid": process_id, "tid": thread_rows[span.thread_id],
+                "ts": span.start_ns / 1000, "dur": ((span.end_ns or span.start_ns) - span.start_ns) / 1000, "args": args
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace_id": self.trace_id}}
+
+    def to_otlp(self) -> Dict[str, object]:
+        """Returns the trace as an OTLP/JSON ExportTraceServiceRequest."""
+        spans = []
+        for span in self.spans():
+            otlp_span = {
+                "traceId": self.trace_id, "spanId": span.span_id, "name": span.name, "kind": 1,
+                "startTimeUnixNano": str(span.start_ns), "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                "attributes": _otlp_attributes(dict(span.attributes, **{"thread.name": span.thread_name})),
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1}
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            spans.append(otlp_span)
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}]
+        }]}
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+# --- Helper Functions ---
+
+def _otlp_attributes(attributes: Dict[str, object]) -> List[Dict[str, object]]:
+    otlp_attributes = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            otlp_value = {"boolValue": value}
+        elif isinstance(value, int):
+            otlp_value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            otlp_value = {"doubleValue": value}
+        else:
+            otlp_value = {"stringValue": str(value)}
+        otlp_attributes.append({"key": key, "value": otlp_value})
+    return otlp_attributes
+
+# --- Tracing API ---
+
+@contextlib.contextmanager
+def start_trace(name: str, enabled: bool = TRACING_ENABLED, **attributes) -> Iterator[Optional[Trace]]:
+    """Collects the spans of everything run inside the block (also in threads started via submit_in_context) under a root span."""
+    if not enabled:
+        yield None
+        return
+    trace = Trace(name)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        with span(name, **attributes):
+            yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+@contextlib.contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Times the block as a child of the current span; does nothing outside of a trace."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    new_span = Span(name, parent.span_id if parent else None, attributes)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        new_span.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.add(new_span)
+
+def traced(name: str = None):
+    """Decorator that runs every call of the function (or coroutine function) in a span named after it."""
+    def decorator(function):
+        span_name = name or function.__name__
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def set_span_attributes(**attributes) -> None:
+    """Adds attributes to the current span, if there is one."""
+    current_span = _current_span.get()
+    if current_span is not None:
+        current_span.set_attributes(**attributes)
+
+def record_span(name: str, start_ns: int, end_ns: int, **attributes) -> None:
+    """Records an operation that was only measured after the fact (e.g. a wait) as a child of the current span."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    finished_span = Span(name, parent.span_id if parent else None, attributes, start_ns)
+    finished_span.end_ns = end_ns
+    trace.add(finished_span)
+
+def submit_in_context(executor, function, *args, span_name: str = None, span_attributes: Dict[str, object] = None, **kwargs):
+    """
+    Submits function(*args, **kwargs) to a thread pool so that it keeps the caller's trace and parent span.
+
+    With span_name the call runs in its own span, whose queued_ms attribute is the time the task waited for a worker.
+    """
+    context = contextvars.copy_context()
+    submitted_ns = time.time_ns()
+
+    def run():
+        if span_name is None:
+            return function(*args, **kwargs)
+        with span(span_name, **(span_attributes or {})) as task_span:
+            if task_span is not None:
+                task_span.set_attributes(queued_ms=round((task_span.start_ns - submitted_ns) / 1e6, 3))
+            return function(*args, **kwargs)
+    return executor.submit(context.run, run)
+
+# --- Export ---
+
+def export_chrome_trace(trace: Trace, path: str) -> str:
+    """Writes the trace as Chrome trace-event JSON and returns the path."""
+    trace_dir = os.path.dirname(path)
+    if trace_dir:
+        os.makedirs(trace_dir, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace.to_chrome_trace(), f, ensure_ascii=False, default=str)
+    return path
+
+def export_otlp(trace: Trace, endpoint: str = OTLP_ENDPOINT) -> None:
+    """Sends the trace to an OTLP/HTTP collector as JSON."""
+    url = endpoint.rstrip("/")
+    if not url.endswith("/v1/traces"):
+        url += "/v1/traces"
+    request = urllib.request.Request(url, data=json.dumps(trace.to_otlp(), default=str).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(request, timeout=OTLP_TIMEOUT_SECONDS) as response:
+        response.read()
+
+def export_trace(trace: Optional[Trace], file_name: str) -> Optional[str]:
+    """Exports a finished trace to AGENT_TRACE_DIR and OTEL_EXPORTER_OTLP_ENDPOINT, returning the Chrome trace path if one was written."""
+    if trace is None:
+        return None
+    trace_path = None
+    if TRACE_DIR:
+        try:
+            trace_path = export_chrome_trace(trace, os.path.join(TRACE_DIR, f"{file_name}.trace.json"))
+            logger.info(f"Chrome trace written to: {trace_path}")
+        except Exception as e:
+            # A broken trace export must never fail the translation itself
+            logger.warning(f"Could not write Chrome trace: {e}")
+    if OTLP_ENDPOINT:
+        try:
+            export_otlp(trace)
+            logger.info(f"Trace {trace.trace_id} sent to OTLP collector at {OTLP_ENDPOINT}.")
+        except Exception as e:
+            logger.warning(f"Could not send trace to OTLP collector at {OTLP_ENDPOINT}: {e}")
+    return trace_path
@@ -0,0 +1,352 @@
+import atexit
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+from subtitles import SubtitleTrack, ms_to_srt_time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Cache parameters
+# Set TRANSLATION_CACHE_ENABLED to "false" to always call the LLM
+TRANSLATION_CACHE_ENABLED = os.environ.get("TRANSLATION_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+DEFAULT_TRANSLATION_CACHE_PATH = os.path.join(".cache", "translation_cache.sqlite3")
+TRANSLATION_CACHE_PATH = os.environ.get("TRANSLATION_CACHE_PATH", DEFAULT_TRANSLATION_CACHE_PATH)
+# Least recently used entries are evicted once either limit is exceeded
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.environ.get("TRANSLATION_CACHE_MAX_ENTRIES", "200000"))
+TRANSLATION_CACHE_MAX_MB = int(os.environ.get("TRANSLATION_CACHE_MAX_MB", "256"))
+# Cache hits only touch their last access time in memory; touches are written out with the next write or once this many are pending
+TRANSLATION_CACHE_TOUCH_FLUSH_SIZE = 256
+
+_NUMBERED_LINE_PATTERN = re.compile(r"(\d+)\.\s*(.*)")
+
+# --- Helper Functions ---
+
+def hash_text(text: str) -> str:
+    """Returns the SHA-256 hex digest of a string."""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def make_cache_key(kind: str, source_text: str, target_language: str, model_name: str, prompt_version: str,
+                   translation_memory: str, prompt_layout: str, memory_injection: str, chunk_glossary: str = "") -> str:
+    """Builds a content-addressed key from everything that influences a translation."""
+    parts = [kind, hash_text(source_text), target_language or "", model_name or "", prompt_version or "",
+             hash_text(translation_memory), prompt_layout or "", memory_injection or "", hash_text(chunk_glossary)]
+    return hash_text("\x1f".join(parts))
+
+def hash_sub_list(sub_list: SubtitleTrack) -> str:
+    """Returns a stable hash of a parsed subtitle track (index, timing and text of every cue)."""
+    digest = hashlib.sha256()
+    if not sub_list:
+        return digest.hexdigest()
+    for number, start_ms, end_ms, text in zip(sub_list.numbers, sub_list.start_ms, sub_list.end_ms, sub_list.texts):
+        digest.update(f"{number}\x1f{ms_to_srt_time(start_ms)}\x1f{ms_to_srt_time(end_ms)}\x1f{text}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+def _split_numbered_lines(text: str) -> Dict[str, str]:
+    """Parses 'N. text' lines into an {index: text} dict, ignoring anything else."""
+    lines = {}
+    for line in (text or "").splitlines():
+        match = _NUMBERED_LINE_PATTERN.match(line.strip())
+        if match:
+            lines[match.group(1)] = match.group(2)
+    return lines
+
+class TranslationCache:
+    """
+    SQLite-backed cache of validated chunk and line translations with LRU eviction.
+
+    Chunks are looked up by the exact numbered chunk text. Individual lines are cached as well,
+    so a chunk can still be served when chunk boundaries change between runs, as long as every
+    line in it was translated before under the same language, model, prompt and memory, and with
+    the same glossary entries injected into its chunk's request.
+    """
+
+    def __init__(self, path: str = TRANSLATION_CACHE_PATH, max_entries: int = TRANSLATION_CACHE_MAX_ENTRIES,
+                 max_bytes: int = TRANSLATION_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(path)
+        if cache_dir and not os.path.exists(cache_dir):
+            logger.info(f"Creating translation cache directory: {cache_dir}")
+            os.makedirs(cache_dir, exist_ok=True)
+
+        # One connection shared by all worker threads, serialized through self._lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_accessed ON translations (last_accessed)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS translation_memories (
+                sub_list_hash TEXT NOT NULL,
+                target_language TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                memory TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL,
+                PRIMARY KEY (sub_list_hash, target_language, model_name, prompt_version)
+            )
+        """)
+        self._conn.commit()
+        # Running totals of the translations table, so writes only scan it when a limit is actually exceeded
+        self._read_totals()
+        # Last access times of cache hits not yet written to the database, by key
+        self._pending_touches: Dict[str, float] = {}
+        logger.info(f"Translation cache opened at: {path}")
+
+    def _read_totals(self) -> None:
+        """Loads the entry count and byte total of the translations table into the running counters."""
+        self._entry_count, self._total_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM translations"
+        ).fetchone()
+
+    def _get_locked(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM translations WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._pending_touches[key] = time.time()
+        return row[0]
+
+    def _put_locked(self, key: str, kind: str, value: str, now: float) -> None:
+        size = len(value.encode("utf-8"))
+        row = self._conn.execute("SELECT size FROM translations WHERE key = ?", (key,)).fetchone()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO translations (key, kind, value, size, created_at, last_accessed) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, kind, value, size, now, now)
+        )
+        self._pending_touches.pop(key, None)
+        if row is None:
+            self._entry_count += 1
+            self._total_bytes += size
+        else:
+            self._total_bytes += size - row[0]
+
+    def _flush_touches_locked(self) -> None:
+        """Writes pending last access times; the caller commits."""
+        if self._pending_touches:
+            self._conn.executemany("UPDATE translations SET last_accessed = ? WHERE key = ?",
+                                   [(accessed_at, key) for key, accessed_at in self._pending_touches.items()])
+            self._pending_touches.clear()
+
+    def _over_limits(self) -> bool:
+        return self._entry_count > self.max_entries or self._total_bytes > self.max_bytes
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached value for a key and marks it as recently used."""
+        with self._lock:
+            value = self._get_locked(key)
+            if len(self._pending_touches) >= TRANSLATION_CACHE_TOUCH_FLUSH_SIZE:
+                self._flush_touches_locked()
+                self._conn.commit()
+            return value
+
+    def put(self, key: str, kind: str, value: str) -> None:
+        """Stores a value, replacing any previous value for the key."""
+        with self._lock:
+            self._put_locked(key, kind, value, time.time())
+            self._flush_touches_locked()
+            self._conn.commit()
+            over_limits = self._over_limits()
+        if over_limits:
+            self.evict()
+
+    def flush(self) -> None:
+        """Writes the last access times of cache hits that are still pending."""
+        with self._lock:
+            self._flush_touches_locked()
+            self._conn.commit()
+
+    def get_chunk(self, numbered_chunk_text: str, target_language: str, model_name: str, prompt_version: str,
+                  translation_memory: str, prompt_layout: str, memory_injection: str, chunk_glossary: str = "") -> Optional[str]:
+        """Returns a cached translation for a numbered chunk, assembled from cached lines if needed."""
+        key_parts = (target_language, model_name, prompt_version, translation_memory, prompt_layout, memory_injection)
+        cached_chunk = self.get(make_cache_key("chunk", numbered_chunk_text, *key_parts))
+        if cached_chunk is not None:
+            return cached_chunk
+
+        source_lines = _split_numbered_lines(numbered_chunk_text)
+        if not source_lines:
+            return None
+        translated_lines = []
+        for index, source_text in source_lines.items():
+            cached_line = self.get(make_cache_key("line", source_text, *key_parts, chunk_glossary))
+            if cached_line is None:
+                return None
+            translated_lines.append(f"{index}. {cached_line}")
+        return "\n".join(translated_lines)
+
+    def put_chunk(self, numbered_chunk_text: str, translated_chunk_text: str, target_language: str, model_name: str,
+                  prompt_version: str, translation_memory: str, prompt_layout: str, memory_injection: str,
+                  chunk_glossary: str = "") -> None:
+        """
+        Stores a validated chunk translation and each of its lines in one transaction, then enforces the size limits.
+
+        chunk_glossary is the glossary injected into the chunk's request: a line is only reused in a chunk that gets the same glossary.
+        """
+        key_parts = (target_language, model_name, prompt_version, translation_memory, prompt_layout, memory_injection)
+        source_lines = _split_numbered_lines(numbered_chunk_text)
+        translated_lines = _split_numbered_lines(translated_chunk_text)
+        now = time.time()
+        with self._lock:
+            self._put_locked(make_cache_key("chunk", numbered_chunk_text, *key_parts), "chunk", translated_chunk_text, now)
+            for index, source_text in source_lines.items():
+                if index in translated_lines:
+                    self._put_locked(make_cache_key("line", source_text, *key_parts, chunk_glossary), "line", translated_lines[index], now)
+            self._flush_touches_locked()
+            self._conn.commit()
+            over_limits = self._over_limits()
+        if over_limits:
+            self.evict()
+
+    def evict(self) -> int:
+        """Deletes least recently used entries until the cache is within its entry and byte limits."""
+        with self._lock:
+            self._flush_touches_locked()
+            # Other processes may share the file, so the running counters are re-read before deciding
+            self._read_totals()
+            if not self._over_limits():
+                self._conn.commit()
+                return 0
+
+            evicted = 0
+            rows = self._conn.execute("SELECT key, size FROM translations ORDER BY last_accessed ASC")
+            keys_to_delete = []
+            for key, size in rows:
+                if not self._over_limits():
+                    break
+                keys_to_delete.append((key,))
+                self._entry_count -= 1
+                self._total_bytes -= size
+                evicted += 1
+            self._conn.executemany("DELETE FROM translations WHERE key = ?", keys_to_delete)
+            self._conn.commit()
+        logger.info(f"Evicted {evicted} least recently used entries from translation cache.")
+        return evicted
+
+    def get_translation_memory(self, sub_list_hash: str, target_language: str, model_name: str,
+                               prompt_version: str) -> Optional[str]:
+        """Returns the stored translation memory for a transcript, target language and model, if any."""
+        key = (sub_list_hash, target_language or "", model_name or "", prompt_version or "")
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT memory FROM translation_memories WHERE sub_list_hash = ? AND target_language = ? AND model_name = ? AND prompt_version = ?",
+                key
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE translation_memories SET last_accessed = ? WHERE sub_list_hash = ? AND target_language = ? AND model_name = ? AND prompt_version = ?",
+                (time.time(),) + key
+            )
+            self._conn.commit()
+            return row[0]
+
+    def put_translation_memory(self, sub_list_hash: str, target_language: str, model_name: str,
+                               prompt_version: str, memory: str) -> None:
+        """Stores the translation memory generated for a transcript, target language and model."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translation_memories (sub_list_hash, target_language, model_name, prompt_version, memory, created_at, last_accessed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sub_list_hash, target_language or "", model_name or "", prompt_version or "", memory, now, now)
+            )
+            self._conn.commit()
+
+    def invalidate_translation_memory(self, sub_list_hash: str = None, target_language: str = None,
+                                      model_name: str = None) -> int:
+        """
+        Deletes stored translation memories matching every given filter and returns how many were removed.
+
+        Calling it without filters removes all stored translation memories.
+        """
+        conditions, params = [], []
+        for column, value in (("sub_list_hash", sub_list_hash), ("target_language", target_language), ("model_name", model_name)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        query = "DELETE FROM translation_memories"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            deleted = self._conn.execute(query, params).rowcount
+            self._conn.commit()
+        logger.info(f"Invalidated {deleted} stored translation memories.")
+        return deleted
+
+    def clear(self) -> None:
+        """Removes every cached translation."""
+        with self._lock:
+            self._conn.execute("DELETE FROM translations")
+            self._conn.execute("DELETE FROM translation_memories")
+            self._conn.commit()
+            self._pending_touches.clear()
+            self._entry_count, self._total_bytes = 0, 0
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of cached chunks, lines and translation memories and the cached translation size in bytes."""
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, COUNT(*), COALESCE(SUM(size), 0) FROM translations GROUP BY kind").fetchall()
+            memory_count = self._conn.execute("SELECT COUNT(*) FROM translation_memories").fetchone()[0]
+        stats = {"chunks": 0, "lines": 0, "bytes": 0, "translation_memories": memory_count}
+        for kind, count, size in rows:
+            stats[f"{kind}s"] = count
+            stats["bytes"] += size
+        return stats
+
+_default_cache: Optional[TranslationCache] = None
+_default_cache_lock = threading.Lock()
+
+def get_translation_cache() -> Optional[TranslationCache]:
+    """Returns the process-wide translation cache, or None if caching is disabled or unavailable."""
+    global _default_cache
+    if not TRANSLATION_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = TranslationCache()
+                atexit.register(_default_cache.flush)
+            except Exception as e:
+                logger.error(f"Could not open translation cache at {TRANSLATION_CACHE_PATH}: {e}", exc_info=True)
+                return None
+        return _default_cache
+
+def invalidate_translation_memory(sub_list: SubtitleTrack = None, target_language: str = None,
+                                  model_name: str = None) -> int:
+    """
+    Deletes stored translation memories so the next run regenerates them.
+
+    Args:
+        sub_list: Only invalidate memories generated for this parsed subtitle track (optional)
+        target_language: Only invalidate memories for this target language (optional)
+        model_name: Only invalidate memories generated by this model (optional)
+
+    Returns:
+        int: Number of translation memories removed (0 if caching is disabled)
+    """
+    translation_cache = get_translation_cache()
+    if translation_cache is None:
+        return 0
+    sub_list_hash = hash_sub_list(sub_list) if sub_list is not None else None
+    return translation_cache.invalidate_translation_memory(sub_list_hash, target_language, model_name)
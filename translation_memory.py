@@ -0,0 +1,177 @@
+import functools
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Memory injection parameters
+# "indexed" sends every chunk a capped memory summary plus only the glossary entries whose terms occur in it,
+# "full" pastes the whole translation memory into every chunk request (the original behaviour)
+MEMORY_INJECTION = os.environ.get("AGENT_MEMORY_INJECTION", "indexed").strip().lower()
+# Upper bound on the characters of the memory summary sent with every chunk (basis, voices, tips, ...)
+MEMORY_SUMMARY_CHARS = int(os.environ.get("AGENT_MEMORY_SUMMARY_CHARS", "2000"))
+# Sections left out of the summary: the glossary is injected per chunk and the free thinking is only useful while writing the memory
+GLOSSARY_SECTION_NAMES = ("glossary", "key terms")
+SUMMARY_EXCLUDED_SECTION_NAMES = GLOSSARY_SECTION_NAMES + ("thinking", "free thinking")
+
+# "**Basis:**", "**Glossary**:", "## Tips" (text after a bold heading on the same line belongs to the section)
+_SECTION_HEADING_PATTERN = re.compile(r"^\s*(?:#{1,6}\s*)?\*\*\s*([^*:\n]{1,60}?)\s*:?\s*\*\*\s*:?\s*(.*)$|^\s*#{1,6}\s*([^:#\n]{1,60}?)\s*:?\s*$")
+# "- Term: Translation", "* **Term** - Translation", "1. Term → Translation"
+_GLOSSARY_ENTRY_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*(.+?)\s*(?::|：|->|→|=| - | – | — )\s*(.+?)\s*$")
+# Scripts written without spaces between words cannot be matched on word boundaries
+_UNSPACED_SCRIPT_PATTERN = re.compile(r"[⺀-鿿가-힯豈-﫿ｦ-ﾟ]")
+
+class GlossaryEntry:
+    """One glossary line of a translation memory with the source terms it is looked up by."""
+
+    __slots__ = ("terms", "text")
+
+    def __init__(self, terms: List[str], text: str):
+        self.terms = terms
+        self.text = text
+
+class IndexedTranslationMemory:
+    """
+    A translation memory parsed into its sections, with the glossary held in a term index.
+
+    Chunk requests get summary() (every section except the glossary and the free thinking, capped in size)
+    and glossary_for(chunk_text), the glossary entries whose source terms occur in the chunk.
+    """
+
+    def __init__(self, memory_text: str, summary_chars: int = MEMORY_SUMMARY_CHARS):
+        self.memory_text = memory_text
+        self.sections = _split_sections(memory_text)
+        self.glossary: List[GlossaryEntry] = []
+        for section_name, section_text in self.sections:
+            if section_name.lower() in GLOSSARY_SECTION_NAMES:
+                self.glossary.extend(_parse_glossary(section_text))
+        self._summary = _build_summary(self.sections, summary_chars)
+
+        # Term index: lower-cased source term -> entry, plus one alternation per matching mode for a single scan per chunk
+        self._term_index: Dict[str, GlossaryEntry] = {}
+        bounded_terms, unbounded_terms = [], []
+        for entry in self.glossary:
+            for term in entry.terms:
+                key = term.lower()
+                if key in self._term_index:
+                    continue
+                self._term_index[key] = entry
+                (unbounded_terms if _UNSPACED_SCRIPT_PATTERN.search(term) else bounded_terms).append(term)
+        self._bounded_pattern = _compile_term_pattern(bounded_terms, r"(?<!\w)(", r")(?:s|es|'s)?(?!\w)")
+        self._unbounded_pattern = _compile_term_pattern(unbounded_terms, "(", ")")
+
+    @property
+    def is_indexed(self) -> bool:
+        """False when no glossary could be parsed, in which case the memory should be sent as a whole."""
+        return bool(self.glossary)
+
+    def summary(self) -> str:
+        """Returns the memory without its glossary and free thinking, capped at the configured size."""
+        return self._summary
+
+    def glossary_for(self, chunk_text: str) -> List[str]:
+        """Returns the glossary lines whose source terms occur in the chunk, in glossary order."""
+        matched_entries = {}
+        for pattern in (self._bounded_pattern, self._unbounded_pattern):
+            if pattern is None:
+                continue
+            for match in pattern.finditer(chunk_text):
+                entry = self._term_index.get(match.group(1).lower())
+                if entry is not None:
+                    matched_entries[id(entry)] = entry
+        return [entry.text for entry in self.glossary if id(entry) in matched_entries]
+
+# --- Helper Functions ---
+
+def _split_sections(memory_text: str) -> List[Tuple[str, str]]:
+    """Splits a memory into (heading, body) pairs; text before the first heading gets an empty heading."""
+    sections: List[Tuple[str, List[str]]] = [("", [])]
+    for line in memory_text.splitlines():
+        match = _SECTION_HEADING_PATTERN.match(line)
+        if match:
+            heading = (match.group(1) or match.group(3) or "").strip()
+            sections.append((heading, [match.group(2)] if match.group(2) else []))
+        else:
+            sections[-1][1].append(line)
+    return [(heading, "\n".join(lines).strip()) for heading, lines in sections if heading or "".join(lines).strip()]
+
+def _clean_term(term: str) -> str:
+    return term.strip().strip("*_`\"'“”‘’[]").strip()
+
+def _parse_glossary(section_text: str) -> List[GlossaryEntry]:
+    """Parses glossary lines; "Term (Alias)" and "Term / Alias" are looked up by every alias."""
+    entries = []
+    for line in section_text.splitlines():
+        match = _GLOSSARY_ENTRY_PATTERN.match(line)
+        if not match:
+            continue
+        source_term = _clean_term(match.group(1))
+        terms = []
+        for alias in re.split(r"\s*/\s*|\s*\(\s*|\s*\)\s*", source_term):
+            alias = _clean_term(alias)
+            if alias and alias not in terms:
+                terms.append(alias)
+        if terms:
+            entries.append(GlossaryEntry(terms, f"- {source_term}: {match.group(2)}"))
+    return entries
+
+def _build_summary(sections: List[Tuple[str, str]], summary_chars: int) -> str:
+    """Joins the sections that are not injected per chunk, cutting the text off once summary_chars is reached."""
+    summary_lines = []
+    length = 0
+    for heading, body in sections:
+        if heading.lower() in SUMMARY_EXCLUDED_SECTION_NAMES:
+            continue
+        for line in ([f"**{heading}:**"] if heading else []) + body.splitlines():
+            if summary_chars > 0 and length + len(line) + 1 > summary_chars:
+                remaining_chars = summary_chars - length - 4
+                if remaining_chars > 40:
+                    summary_lines.append(line[:remaining_chars].rstrip() + "...")
+                return "\n".join(summary_lines).strip()
+            summary_lines.append(line)
+            length += len(line) + 1
+        summary_lines.append("")
+    return "\n".join(summary_lines).strip()
+
+def _compile_term_pattern(terms: List[str], prefix: str, suffix: str) -> Optional[re.Pattern]:
+    if not terms:
+        return None
+    # Longest terms first, so "New York City" wins over "New York"
+    alternation = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    return re.compile(prefix + alternation + suffix, re.IGNORECASE)
+
+@functools.lru_cache(maxsize=32)
+def index_translation_memory(memory_text: str) -> IndexedTranslationMemory:
+    """Parses and indexes a translation memory once; every chunk of a job reuses the same index."""
+    indexed_memory = IndexedTranslationMemory(memory_text)
+    if indexed_memory.is_indexed:
+        logger.info(f"Indexed translation memory: {len(indexed_memory.glossary)} glossary entries, "
+                    f"summary of {len(indexed_memory.summary())}/{len(memory_text)} characters.")
+    else:
+        logger.warning("No glossary found in the translation memory, sending it whole with every chunk.")
+    return indexed_memory
+
+def memory_for_chunk(memory_text: str, chunk_text: str) -> Tuple[str, List[str]]:
+    """
+    Splits a translation memory into what one chunk request needs.
+
+    Args:
+        memory_text: The full translation memory of the job
+        chunk_text: The subtitle text the request translates (or repairs)
+
+    Returns:
+        tuple: (memory part shared by every chunk, glossary lines for this chunk). With AGENT_MEMORY_INJECTION="full"
+        or when the memory has no parsable glossary, the shared part is the whole memory and the glossary is empty.
+    """
+    if MEMORY_INJECTION != "indexed" or not memory_text:
+        return memory_text, []
+    indexed_memory = index_translation_memory(memory_text)
+    if not indexed_memory.is_indexed:
+        return memory_text, []
+    return indexed_memory.summary(), indexed_memory.glossary_for(chunk_text)
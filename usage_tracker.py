@@ -0,0 +1,140 @@
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Usage accounting parameters
+# JSONL file every finished job appends its usage, cost and timing to (empty disables the run log)
+DEFAULT_RUN_LOG_PATH = os.path.join(".cache", "run_log.jsonl")
+RUN_LOG_PATH = os.environ.get("AGENT_RUN_LOG_PATH", DEFAULT_RUN_LOG_PATH).strip()
+# USD per million tokens as (input, cached input, output); models are matched exactly first, then by the longest prefix
+# (so dated snapshots like "gpt-4o-mini-2024-07-18" use their family's price)
+MODEL_PRICING = {
+    "o3-mini": (1.10, 0.55, 4.40),
+    "o4-mini": (1.10, 0.275, 4.40),
+    "o3": (2.00, 0.50, 8.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+}
+# Prices of other models or updated prices, as JSON: {"model": [input, cached_input, output], ...}
+try:
+    MODEL_PRICING.update({model: tuple(prices) for model, prices in json.loads(os.environ.get("AGENT_MODEL_PRICING") or "{}").items()})
+except (ValueError, TypeError, AttributeError) as e:
+    logger.warning(f"Ignoring invalid AGENT_MODEL_PRICING: {e}")
+USAGE_KEYS = ("requests", "input_tokens", "cached_input_tokens", "output_tokens", "latency_seconds")
+
+_run_log_lock = threading.Lock()
+
+class UsageTracker:
+    """
+    Collects the token usage and latency of every LLM call of one job.
+
+    Calls are recorded with the node that made them, the model and (for chunk translations and repairs) the chunk
+    index; summary() aggregates them per node, model and chunk and estimates the cost from MODEL_PRICING.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: List[Dict[str, object]] = []
+        self.started_at = time.monotonic()
+
+    def record(self, node: str, model_name: str, usage: Dict[str, float], chunk_index: int = None) -> None:
+        """Records one LLM call (usage as returned by Agent._usage_from_message)."""
+        call = {key: usage.get(key, 0) for key in USAGE_KEYS}
+        call.update(node=node, model=model_name, chunk_index=chunk_index)
+        with self._lock:
+            self._calls.append(call)
+
+    def calls(self) -> List[Dict[str, object]]:
+        """Returns a copy of the recorded calls."""
+        with self._lock:
+            return list(self._calls)
+
+    @classmethod
+    def combine(cls, trackers: Iterable["UsageTracker"]) -> "UsageTracker":
+        """Returns a tracker holding the calls of all given trackers, timed from the earliest of them."""
+        combined_tracker = cls()
+        for tracker in trackers:
+            combined_tracker._calls.extend(tracker.calls())
+            combined_tracker.started_at = min(combined_tracker.started_at, tracker.started_at)
+        return combined_tracker
+
+    def summary(self) -> Dict[str, object]:
+        """Returns the totals of the job, and per node, model and chunk, each with its estimated cost in USD."""
+        calls = self.calls()
+        by_node, by_model, by_chunk = {}, {}, {}
+        for call in calls:
+            _add_call(by_node.setdefault(call["node"], _empty_totals()), call)
+            _add_call(by_model.setdefault(call["model"], _empty_totals()), call)
+            if call["chunk_index"] is not None:
+                _add_call(by_chunk.setdefault(call["chunk_index"], _empty_totals()), call)
+        total = _empty_totals()
+        for call in calls:
+            _add_call(total, call)
+        for totals in [total, *by_node.values(), *by_model.values(), *by_chunk.values()]:
+            totals["latency_seconds"] = round(totals["latency_seconds"], 3)
+            totals["cost_usd"] = round(totals["cost_usd"], 6) if totals["cost_usd"] is not None else None
+        return {
+            "wall_seconds": round(time.monotonic() - self.started_at, 3),
+            "total": total,
+            "by_node": by_node,
+            "by_model": by_model,
+            "by_chunk": {chunk_index: by_chunk[chunk_index] for chunk_index in sorted(by_chunk)}
+        }
+
+# --- Helper Functions ---
+
+def _empty_totals() -> Dict[str, Optional[float]]:
+    return dict({key: 0 for key in USAGE_KEYS}, cost_usd=0.0)
+
+def _add_call(totals: Dict[str, Optional[float]], call: Dict[str, object]) -> None:
+    for key in USAGE_KEYS:
+        totals[key] += call[key]
+    call_cost = estimate_cost(call["model"], call)
+    # The cost is unknown as soon as one call used a model without a price
+    totals["cost_usd"] = None if totals["cost_usd"] is None or call_cost is None else totals["cost_usd"] + call_cost
+
+def _model_prices(model_name: str) -> Optional[tuple]:
+    if model_name in MODEL_PRICING:
+        return MODEL_PRICING[model_name]
+    matching_models = [model for model in MODEL_PRICING if model_name and model_name.startswith(model + "-")]
+    return MODEL_PRICING[max(matching_models, key=len)] if matching_models else None
+
+def estimate_cost(model_name: str, usage: Dict[str, float]) -> Optional[float]:
+    """Estimates the USD cost of the given usage (cached input tokens are part of input_tokens), or None for unknown models."""
+    prices = _model_prices(model_name)
+    if prices is None:
+        return None
+    input_price, cached_input_price, output_price = prices
+    cached_input_tokens = usage.get("cached_input_tokens", 0)
+    uncached_input_tokens = max(0, usage.get("input_tokens", 0) - cached_input_tokens)
+    return (uncached_input_tokens * input_price + cached_input_tokens * cached_input_price
+            + usage.get("output_tokens", 0) * output_price) / 1_000_000
+
+def append_run_log(record: Dict[str, object], path: str = RUN_LOG_PATH) -> None:
+    """Appends one job record to the JSONL run log; failures are logged and never raised."""
+    if not path:
+        return
+    try:
+        log_dir = os.path.dirname(path)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        line = json.dumps(dict(record, logged_at=datetime.datetime.now(datetime.timezone.utc).isoformat()),
+                          ensure_ascii=False, default=str)
+        with _run_log_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except Exception as e:
+        # A broken run log must never fail the translation itself
+        logger.warning(f"Could not append to run log {path}: {e}")